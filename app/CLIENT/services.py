@@ -1,3 +1,5 @@
+import hashlib
+import os
 import requests
 
 host = 'http://127.0.0.1:8000'
@@ -69,3 +71,72 @@ def create_task(task_type, schedule_time, receiver_email, title):
         print("Task scheduled successfully")
     else:
         print("Failed to schedule task:", r.status_code, resp)
+
+
+def _file_sha256(path):
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def upload_file(path):
+    """
+    Upload a file, skipping the transfer when the server already has its content.
+
+    The file's hash and size are sent first; if the content is already stored
+    the server creates the file from it. Otherwise the bytes are sent as parts
+    of the upload session the server opened for it.
+    """
+    try:
+        with open(TOKEN_FILE) as f:
+            token = f.read().strip()
+    except FileNotFoundError:
+        print("Token file not found. Please log in first.")
+        return None
+
+    headers = {"Authorization": f"Bearer {token}"}
+    payload = {
+        "filename": os.path.basename(path),
+        "size_bytes": os.path.getsize(path),
+        "file_hash": _file_sha256(path),
+        "hash_algorithm": "sha256"
+    }
+
+    try:
+        r = requests.post(f"{host}/files/preflight", json=payload, headers=headers, timeout=10)
+    except requests.exceptions.RequestException as e:
+        print("Error sending request:", e)
+        return None
+    if r.status_code != 200:
+        print("Preflight failed:", r.status_code, r.text)
+        return None
+
+    resp = r.json()
+    if resp["status"] == "exists":
+        print("Server already has this content, no upload needed")
+        return resp["file"]
+
+    upload = resp["upload"]
+    url = f"{host}/files/uploads/{upload['upload_id']}"
+    print(f"Uploading {payload['size_bytes']} bytes in {upload['part_count']} parts")
+    try:
+        with open(path, "rb") as f:
+            for part_number in range(1, upload["part_count"] + 1):
+                chunk = f.read(upload["part_size"])
+                part_headers = {**headers, "X-Content-SHA256": hashlib.sha256(chunk).hexdigest()}
+                r = requests.put(f"{url}/parts/{part_number}", data=chunk, headers=part_headers, timeout=60)
+                if r.status_code != 200:
+                    print(f"Part {part_number} failed:", r.status_code, r.text)
+                    return None
+        r = requests.post(f"{url}/complete", headers=headers, timeout=60)
+    except requests.exceptions.RequestException as e:
+        print("Error sending request:", e)
+        return None
+
+    if r.status_code != 200:
+        print("Upload failed:", r.status_code, r.text)
+        return None
+    print("File uploaded successfully")
+    return r.json()
@@ -1,8 +1,10 @@
 import os
+import struct
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
 from app.Encryption_Services.keyGenerator import KeyHandler
+from app.FileManager.storageBackend import StorageBackend, getStorage, keyFor
 from app.utils.logger import SingletonLogger
 
 logger = SingletonLogger().get_logger()
@@ -18,25 +20,275 @@ logger = SingletonLogger().get_logger()
     Security: We cant just put our encryption and decryption in with our api route, youd be hakced in the first hour, with passwint raw bytes over network. Big NONO 
 
 """
+# Segmented on-disk format (version 2)
+#
+#   header  = magic | version | segment_size | nonce_prefix
+#   body    = segment_0 | segment_1 | ... | segment_n     (each = ciphertext + 16 byte tag)
+#
+# Every segment is its own AES-GCM message. Its nonce is nonce_prefix + segment index
+# + a "last segment" flag and the header is part of the associated data, so segments
+# cannot be reordered, dropped or truncated without failing authentication, and any
+# one of them can be decrypted on its own (which is what makes Range downloads cheap).
+# Files without the magic are the legacy single shot format using FileModel.nonce.
+SEGMENT_MAGIC = b"TAAENC"
+FORMAT_VERSION = 2
+SEGMENT_SIZE = 64 * 1024
+TAG_SIZE = 16
+HEADER = struct.Struct(">6sBI7s")
+
+
+def _segment_nonce(prefix: bytes, index: int, last: bool) -> bytes:
+    return prefix + struct.pack(">IB", index, 1 if last else 0)
+
+
+def encrypted_size(plaintext_size: int, segment_size: int = SEGMENT_SIZE) -> int:
+    """Size on disk of a segmented file holding plaintext_size bytes (an empty file still has one segment)."""
+    segments = max(-(-plaintext_size // segment_size), 1)
+    return HEADER.size + plaintext_size + segments * TAG_SIZE
+
+
+class SegmentedEncryptor():
+    """
+    Incremental encryptor for the segmented format.
+
+    Feed plaintext in any chunk size through update(); ciphertext comes back one
+    full segment at a time (the header is emitted with the first output), and
+    finalize() seals whatever is left as the last segment. Only a single segment
+    is buffered, so memory stays flat regardless of file size.
+
+    Multipart uploads encrypt each part separately: they pass the session's nonce
+    prefix, the index of the part's first segment and with_header=False, and
+    only the final part is finalized with last=True.
+    """
+    def __init__(
+            self,
+            cipher: AESGCM,
+            user_id: str,
+            segment_size: int = SEGMENT_SIZE,
+            nonce: bytes | None = None,
+            first_segment: int = 0,
+            with_header: bool = True
+        ):
+        self.nonce = nonce or os.urandom(7)
+        self.segment_size = segment_size
+        self._aesgcm = cipher
+        self.header = HEADER.pack(SEGMENT_MAGIC, FORMAT_VERSION, segment_size, self.nonce)
+        self._aad = self.header + str(user_id).encode()
+        self._buffer = bytearray()
+        self._index = first_segment
+        self._header_sent = not with_header
+        # set by EncryptionService when the cipher is an envelope data key
+        self.wrapped_key = None
+        self.key_version = None
+
+    def _seal(self, segment: bytes, last: bool) -> bytes:
+        nonce = _segment_nonce(self.nonce, self._index, last)
+        self._index += 1
+        return self._aesgcm.encrypt(nonce, segment, self._aad)
+
+    def _take_header(self) -> bytes:
+        if self._header_sent:
+            return b""
+        self._header_sent = True
+        return self.header
+
+    def update(self, chunk: bytes) -> bytes:
+        self._buffer += chunk
+        out = [self._take_header()]
+        # always keep at least one byte back: the final segment must carry the last flag
+        while len(self._buffer) > self.segment_size:
+            out.append(self._seal(bytes(self._buffer[:self.segment_size]), last=False))
+            del self._buffer[:self.segment_size]
+        return b"".join(out)
+
+    def finalize(self, last: bool = True) -> bytes:
+        """Seal the remaining buffered plaintext, as the file's last segment unless last=False."""
+        out = self._take_header() + self._seal(bytes(self._buffer), last=last)
+        self._buffer.clear()
+        return out
+
+
+class SegmentedReader():
+    """Random access decryption of a segmented file, one segment at a time."""
+    def __init__(
+            self,
+            file_path: str,
+            cipher: AESGCM,
+            user_id: str,
+            header: bytes,
+            storage: StorageBackend | None = None
+        ):
+        _, _, self.segment_size, self._prefix = HEADER.unpack(header)
+        self.file_path = file_path
+        self._storage = storage or getStorage()
+        self._key = keyFor(file_path)
+        self._aesgcm = cipher
+        self._aad = header + str(user_id).encode()
+
+        stored = self._storage.stat(self._key)
+        if stored is None:
+            raise FileNotFoundError(file_path)
+        body = stored.size - HEADER.size
+        stored_segment = self.segment_size + TAG_SIZE
+        full, rest = divmod(body, stored_segment)
+        if rest and rest < TAG_SIZE:
+            raise ValueError("Encrypted file is truncated")
+        self.segment_count = full + (1 if rest else 0)
+        if self.segment_count < 1:
+            # even an empty plaintext is stored as one (empty, last) segment
+            raise ValueError("Encrypted file is truncated")
+        self.size = full * self.segment_size + (rest - TAG_SIZE if rest else 0)
+
+    def iter_range(self, start: int = 0, end: int | None = None):
+        """Yield plaintext for the inclusive byte range [start, end], decrypting only the segments it covers."""
+        if self.size == 0:
+            # nothing to yield, but the empty last segment's tag is still checked
+            self._open(0, self._storage.read(self._key, HEADER.size, TAG_SIZE), 0, -1)
+            return
+        if end is None or end >= self.size:
+            end = self.size - 1
+        if start > end:
+            return
+
+        stored_segment = self.segment_size + TAG_SIZE
+        first, last = start // self.segment_size, end // self.segment_size
+        # one ranged read covering every segment needed, cut back into segments as it streams
+        chunks = self._storage.getRange(
+            self._key,
+            HEADER.size + first * stored_segment,
+            HEADER.size + (last + 1) * stored_segment - 1
+        )
+        buffer = bytearray()
+        index = first
+        for chunk in chunks:
+            buffer += chunk
+            while len(buffer) >= stored_segment and index <= last:
+                yield self._open(index, bytes(buffer[:stored_segment]), start, end)
+                del buffer[:stored_segment]
+                index += 1
+        if index <= last:
+            # the file's final segment is shorter than the rest
+            yield self._open(index, bytes(buffer), start, end)
+
+    def _open(self, index: int, stored: bytes, start: int, end: int) -> bytes:
+        nonce = _segment_nonce(self._prefix, index, index == self.segment_count - 1)
+        plaintext = self._aesgcm.decrypt(nonce, stored, self._aad)
+
+        offset = index * self.segment_size
+        lo = max(start - offset, 0)
+        hi = min(end - offset + 1, len(plaintext))
+        return plaintext[lo:hi]
+
+
+class LegacyReader():
+    """Same interface as SegmentedReader for single shot files (whole file is decrypted up front)."""
+    def __init__(self, plaintext: bytes):
+        self._plaintext = plaintext
+        self.size = len(plaintext)
+
+    def iter_range(self, start: int = 0, end: int | None = None):
+        if end is None or end >= self.size:
+            end = self.size - 1
+        for offset in range(start, end + 1, SEGMENT_SIZE):
+            yield self._plaintext[offset:min(offset + SEGMENT_SIZE, end + 1)]
+
+
 class EncryptionService():
     @staticmethod
-    def encrypt(file_path: str, user_id: str, db: Session):
-        key = KeyHandler.getKey(user_id, db)
-        if not key:
+    def _cipher(user_id: str, db: Session) -> AESGCM:
+        """The user's AESGCM, from the key cache when possible."""
+        cipher = KeyHandler.getCipher(user_id, db)
+        if cipher is None:
             raise Exception("No encryption key available for user")
+        return cipher
 
-        if not isinstance(key, bytes):
-            raise Exception("Encryption key is not in bytes format")
-        
-        if len(key) != 32:
-            raise Exception("Invalid key length (must be 32 bytes for AES-256)")
+    @staticmethod
+    def _data_cipher(user_id: str, db: Session, wrapped_key: str | None, key_version: int | None) -> AESGCM:
+        """AESGCM for a file's content: its unwrapped data key, or the user key itself for pre-envelope files."""
+        if wrapped_key is None:
+            return EncryptionService._cipher(user_id, db)
+        key_cipher = KeyHandler.getCipher(user_id, db, key_version)
+        if key_cipher is None:
+            raise Exception("No encryption key available for user")
+        return AESGCM(KeyHandler.unwrapDataKey(wrapped_key, key_cipher, user_id))
+
+    @staticmethod
+    def stream_encryptor(user_id: str, db: Session) -> SegmentedEncryptor:
+        """
+        Return a SegmentedEncryptor under a fresh data key, for single pass uploads.
+
+        The data key wrapped by the user's current key is left on the encryptor as
+        .wrapped_key / .key_version for the caller to store with the file.
+        """
+        current = KeyHandler.getCurrent(user_id, db)
+        if current is None:
+            raise Exception("No encryption key available for user")
+        key_cipher, key_version = current
+
+        data_key = AESGCM.generate_key(bit_length=256)
+        encryptor = SegmentedEncryptor(AESGCM(data_key), user_id)
+        encryptor.wrapped_key = KeyHandler.wrapDataKey(data_key, key_cipher, user_id)
+        encryptor.key_version = key_version
+        return encryptor
+
+    @staticmethod
+    def part_encryptor(
+            user_id: str,
+            db: Session,
+            nonce: bytes,
+            first_segment: int,
+            wrapped_key: str,
+            key_version: int
+        ) -> SegmentedEncryptor:
+        """Encryptor for one multipart upload part, writing segments from first_segment onwards without a header."""
+        cipher = EncryptionService._data_cipher(user_id, db, wrapped_key, key_version)
+        return SegmentedEncryptor(cipher, user_id, nonce=nonce, first_segment=first_segment, with_header=False)
+
+    @staticmethod
+    def read_header(file_path: str, storage: StorageBackend | None = None) -> bytes | None:
+        """Return the segmented format header of a file, or None for legacy single shot files."""
+        header = (storage or getStorage()).read(keyFor(file_path), 0, HEADER.size)
+        if len(header) == HEADER.size and header.startswith(SEGMENT_MAGIC) and header[6] == FORMAT_VERSION:
+            return header
+        return None
+
+    @staticmethod
+    def open_reader(
+            file_path: str,
+            user_id: str,
+            db: Session,
+            nonce,
+            wrapped_key: str | None = None,
+            key_version: int | None = None,
+            storage: StorageBackend | None = None
+        ):
+        """
+        Return a reader with .size and .iter_range(start, end) for either format.
+
+        The key is looked up here so the returned reader no longer needs the db
+        session, which matters for StreamingResponse bodies that run after the
+        request's session has been closed. storage defaults to the configured
+        backend (multipart uploads pass the local staging area).
+        """
+        storage = storage or getStorage()
+        header = EncryptionService.read_header(file_path, storage)
+        if header is None:
+            plaintext = EncryptionService.decrypt(file_path, user_id, db, nonce, wrapped_key, key_version, storage)
+            if plaintext is None:
+                raise ValueError("Decryption failed")
+            return LegacyReader(plaintext)
+        cipher = EncryptionService._data_cipher(user_id, db, wrapped_key, key_version)
+        return SegmentedReader(file_path, cipher, str(user_id), header, storage)
+
+    @staticmethod
+    def encrypt(file_path: str, user_id: str, db: Session):
+        aesgcm = EncryptionService._cipher(user_id, db)
 
         # Read plaintext
         with open(file_path, 'rb') as f:
             data = f.read()
 
         # Encrypt
-        aesgcm = AESGCM(key)
         nonce = os.urandom(12)
         aad = str(user_id).encode()
         
@@ -48,17 +300,29 @@ class EncryptionService():
         return nonce
 
     @staticmethod
-    def decrypt(file_path: str, user_id: str, db: Session, nonce)-> bytes:
+    def decrypt(
+            file_path: str,
+            user_id: str,
+            db: Session,
+            nonce,
+            wrapped_key: str | None = None,
+            key_version: int | None = None,
+            storage: StorageBackend | None = None
+        )-> bytes:
         """Again need to add some error handlers here"""
-        key = KeyHandler.getKey(user_id, db)
+        storage = storage or getStorage()
+        aesgcm = EncryptionService._data_cipher(user_id, db, wrapped_key, key_version)
+        header = EncryptionService.read_header(file_path, storage)
+        if header is not None:
+            # segmented file, callers of decrypt want the whole plaintext (e.g. email attachments)
+            reader = SegmentedReader(file_path, aesgcm, str(user_id), header, storage)
+            return b"".join(reader.iter_range())
         try:
-            with open(file_path,'rb')as f:
-                encrypted_data = f.read() 
+            encrypted_data = storage.read(keyFor(file_path))
         except Exception as e:
             raise HTTPException(status_code=500, detail={e})
         
         # get data prepared 
-        aesgcm = AESGCM(key)
         aad = user_id.encode('utf-8')
 
         # try to derypted
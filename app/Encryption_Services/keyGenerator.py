@@ -1,11 +1,100 @@
+import os
+import threading
+import time
+from collections import OrderedDict
 from sqlalchemy.orm import Session
+from app.config import KEY_CACHE_ENABLED, KEY_CACHE_SIZE, KEY_CACHE_TTL_SECONDS
 from app.models.user import UserModel
 from app.utils.logger import SingletonLogger
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 
 logger = SingletonLogger().get_logger()
 
+
+class KeyCache:
+    """
+    Bounded LRU + TTL cache of decoded user keys and their ready to use AESGCM objects.
+
+    Entries are stored per "user_id:version" (a given key version never changes)
+    plus one "user_id" entry pointing at the current version. The cache lives
+    per process (API workers and Celery workers each have their own), so
+    invalidate() only reaches the local copy; the TTL bounds how long another
+    process keeps treating an old version as current.
+    Set KEY_CACHE_ENABLED=0 (or key_cache.enabled = False) to bypass it in tests.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, enabled: bool = True):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._entries: OrderedDict[str, tuple[float, bytes, AESGCM, int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, cache_key: str) -> tuple[bytes, AESGCM, int] | None:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[cache_key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(cache_key)
+            self.hits += 1
+            return entry[1], entry[2], entry[3]
+
+    def put(self, cache_key: str, key: bytes, version: int) -> tuple[bytes, AESGCM, int]:
+        cipher = AESGCM(key)
+        if not self.enabled:
+            return key, cipher, version
+        with self._lock:
+            self._entries[cache_key] = (time.monotonic() + self.ttl_seconds, key, cipher, version)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return key, cipher, version
+
+    def invalidate(self, user_id: str | None = None) -> None:
+        """Drop every cached version of one user's key, or everything when user_id is None."""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+                return
+            prefix = f"{user_id}:"
+            for cache_key in [k for k in self._entries if k == user_id or k.startswith(prefix)]:
+                del self._entries[cache_key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+key_cache = KeyCache(KEY_CACHE_SIZE, KEY_CACHE_TTL_SECONDS, KEY_CACHE_ENABLED)
+
+
 class KeyHandler:
+    """
+    User keys are key-encryption keys: files are encrypted with their own data
+    key, and only the data key is wrapped by the user key (envelope encryption).
+
+    A user has up to three key versions at once:
+        key_version       encryption_key           current
+        key_version + 1   pending_encryption_key   being rotated to
+        key_version - 1   previous_encryption_key  kept after a rotation for stragglers
+    """
 
     @staticmethod
     def addKeyToDatabase(key_hex: str, db: Session, user_id: int) -> bool:
@@ -13,7 +102,7 @@ class KeyHandler:
         if not user:
             logger.error("Failed to find user %s while storing encryption key", user_id)
             return False
-        
+
         user.encryption_key = key_hex
         db.commit()
         logger.info("Encryption key stored successfully for user %s", user_id)
@@ -26,30 +115,91 @@ class KeyHandler:
         key_hex = key_bytes.hex()
 
         logger.info("Generated new encryption key for user %s", user_id)
-        
+
         success = KeyHandler.addKeyToDatabase(key_hex, db, user_id)
         if not success:
             raise Exception("Failed to store newly generated encryption key in database")
-        
+
+        KeyHandler.invalidate(user_id)
         return key_hex
 
     @staticmethod
-    def getKey(user_id: int, db: Session) -> bytes:
+    def invalidate(user_id) -> None:
+        """Forget the cached keys for a user (key created, rotated or user deleted)."""
+        key_cache.invalidate(str(user_id))
+
+    @staticmethod
+    def _cachedEntry(user_id, db: Session, version: int | None = None) -> tuple[bytes, AESGCM, int] | None:
+        cache_key = str(user_id) if version is None else f"{user_id}:{version}"
+        cached = key_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        loaded = KeyHandler._loadKey(user_id, db, version)
+        if loaded is None:
+            return None
+        key, loaded_version = loaded
+        if len(key) != 32:
+            raise Exception("Invalid key length (must be 32 bytes for AES-256)")
+        return key_cache.put(cache_key, key, loaded_version)
+
+    @staticmethod
+    def getCipher(user_id: int, db: Session, version: int | None = None) -> AESGCM | None:
+        """Ready to use AESGCM for a version of the user's key (current if None), from the key cache when possible."""
+        entry = KeyHandler._cachedEntry(user_id, db, version)
+        return entry[1] if entry else None
+
+    @staticmethod
+    def getCurrent(user_id: int, db: Session) -> tuple[AESGCM, int] | None:
+        """(AESGCM, version) of the user's current key, used to wrap new data keys."""
+        entry = KeyHandler._cachedEntry(user_id, db)
+        return (entry[1], entry[2]) if entry else None
+
+    @staticmethod
+    def getKey(user_id: int, db: Session, version: int | None = None) -> bytes:
+        entry = KeyHandler._cachedEntry(user_id, db, version)
+        return entry[0] if entry else None
+
+    @staticmethod
+    def wrapDataKey(data_key: bytes, key_cipher: AESGCM, user_id: str) -> str:
+        """Encrypt a per-file data key under a user key, returned as hex (nonce + ciphertext + tag)."""
+        nonce = os.urandom(12)
+        return (nonce + key_cipher.encrypt(nonce, data_key, b"dek:" + str(user_id).encode())).hex()
+
+    @staticmethod
+    def unwrapDataKey(wrapped_hex: str, key_cipher: AESGCM, user_id: str) -> bytes:
+        wrapped = bytes.fromhex(wrapped_hex)
+        return key_cipher.decrypt(wrapped[:12], wrapped[12:], b"dek:" + str(user_id).encode())
+
+    @staticmethod
+    def _loadKey(user_id: int, db: Session, version: int | None = None) -> tuple[bytes, int] | None:
         user = db.query(UserModel).filter(UserModel.id == user_id).first()
         if not user:
             logger.error("User %s not found when retrieving encryption key", user_id)
             return None
 
+        current_version = user.key_version or 1
         if not user.encryption_key:
             key_hex = KeyHandler.createKey(user_id, db)
-            return bytes.fromhex(key_hex)
+            return bytes.fromhex(key_hex), current_version
+
+        if version is None or version == current_version:
+            stored = user.encryption_key
+        elif version == current_version + 1:
+            stored = user.pending_encryption_key
+        elif version == current_version - 1:
+            stored = user.previous_encryption_key
+        else:
+            stored = None
+        if not stored:
+            raise Exception(f"Key version {version} is not available for user {user_id}")
+        version = current_version if version is None else version
 
-        if isinstance(user.encryption_key, bytes):
+        if isinstance(stored, bytes):
             logger.warning(" raw bytes key detected for user %s - using directly", user_id)
-            return user.encryption_key
+            return stored, version
         else:
             try:
-                return bytes.fromhex(user.encryption_key)
+                return bytes.fromhex(stored), version
             except (TypeError, ValueError) as e:
                 logger.error("Invalid encryption_key format in DB for user %s: %s", user_id, e)
-                raise
\ No newline at end of file
+                raise
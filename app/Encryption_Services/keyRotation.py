@@ -0,0 +1,241 @@
+"""
+User key rotation.
+
+Files are encrypted with their own data key and only the wrapped data key
+depends on the user key, so rotating a user key rewraps a few dozen bytes per
+file instead of re-encrypting its content. Files stored before envelope
+encryption (wrapped_key is None) were encrypted with the user key itself;
+rotation turns that old user key into their data key, so they need no
+re-encryption either.
+
+Rotating a user:
+    1. a pending key (version key_version + 1) is generated, unless a previous
+       interrupted run already left one
+    2. files, blobs and open upload sessions not yet on the pending version are
+       rewrapped in keyset-paginated batches, committing after each batch
+    3. the pending key is promoted in one transaction once a pass finds nothing
+       left to rewrap; the old key is kept as previous_encryption_key for rows
+       written by processes whose key cache still has it as current
+
+Every step is idempotent, so an interrupted rotation is resumed by running it
+again. Other processes may keep treating the old key as current for up to
+KEY_CACHE_TTL_SECONDS, which is why a user is not rotated again within that
+window (the key they would wrap with would be two versions old by then).
+"""
+
+from datetime import datetime, timedelta
+from uuid import uuid4
+from sqlalchemy import or_, func
+from sqlalchemy.orm import Session
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from app.config import KEY_CACHE_TTL_SECONDS
+from app.models.user import UserModel
+from app.models.file import FileModel, BlobModel, UploadSession
+from app.models.key_rotation import KeyRotationJob, KeyRotationUser
+from app.Encryption_Services.keyGenerator import KeyHandler
+from app.utils.logger import SingletonLogger
+from app.dependencies.constants import (
+    KEY_ROTATION_BATCH_SIZE,
+    KEY_ROTATION_PENDING,
+    KEY_ROTATION_RUNNING,
+    KEY_ROTATION_COMPLETED,
+    KEY_ROTATION_FAILED,
+    KEY_ROTATION_SKIPPED,
+    UPLOAD_SESSION_OPEN,
+)
+
+logger = SingletonLogger().get_logger()
+
+# every table holding a wrapped data key
+WRAPPED_KEY_MODELS = (FileModel, BlobModel, UploadSession)
+
+
+def createJob(db: Session, user_ids: list[str] | None = None) -> KeyRotationJob:
+    """Create a rotation job over user_ids, or over every user that has a key."""
+    query = db.query(UserModel.id).filter(UserModel.encryption_key.isnot(None))
+    if user_ids:
+        query = query.filter(UserModel.id.in_(user_ids))
+    ids = [row.id for row in query.all()]
+
+    job = KeyRotationJob(id=str(uuid4()), status=KEY_ROTATION_PENDING, total_users=len(ids))
+    db.add(job)
+    db.add_all(KeyRotationUser(job_id=job.id, user_id=user_id, status=KEY_ROTATION_PENDING) for user_id in ids)
+    db.commit()
+    db.refresh(job)
+    logger.info("Key rotation job %s created for %d users", job.id, len(ids))
+    return job
+
+
+def unfinishedUsers(db: Session, job_id: str) -> list[str]:
+    """Users of a job still to be rotated, i.e. what a resume has to dispatch."""
+    rows = db.query(KeyRotationUser.user_id).filter(
+        KeyRotationUser.job_id == job_id,
+        KeyRotationUser.status.in_((KEY_ROTATION_PENDING, KEY_ROTATION_RUNNING, KEY_ROTATION_FAILED))
+    ).all()
+    return [row.user_id for row in rows]
+
+
+def _pendingRows(db: Session, model, user_id: str, new_version: int, after_id: str):
+    query = db.query(model).filter(
+        model.user_id == user_id,
+        model.id > after_id,
+        or_(model.key_version.is_(None), model.key_version != new_version)
+    )
+    if model is UploadSession:
+        query = query.filter(UploadSession.status == UPLOAD_SESSION_OPEN)
+    return query.order_by(model.id).limit(KEY_ROTATION_BATCH_SIZE).all()
+
+
+def _rewrapPass(db: Session, user_id: str, current_version: int, new_version: int, progress: KeyRotationUser) -> int:
+    """Rewrap every row not yet on new_version, one committed batch at a time. Returns rows rewrapped."""
+    new_cipher = KeyHandler.getCipher(user_id, db, new_version)
+    rewrapped = 0
+    for model in WRAPPED_KEY_MODELS:
+        after_id = ""
+        while rows := _pendingRows(db, model, user_id, new_version, after_id):
+            for row in rows:
+                if row.wrapped_key is None:
+                    # encrypted with the user key itself, which now becomes its data key
+                    data_key = KeyHandler.getKey(user_id, db, current_version)
+                else:
+                    key_cipher = KeyHandler.getCipher(user_id, db, row.key_version)
+                    data_key = KeyHandler.unwrapDataKey(row.wrapped_key, key_cipher, user_id)
+                row.wrapped_key = KeyHandler.wrapDataKey(data_key, new_cipher, user_id)
+                row.key_version = new_version
+            after_id = rows[-1].id
+            rewrapped += len(rows)
+            progress.rewrapped += len(rows)
+            db.commit()
+    return rewrapped
+
+
+def _remaining(db: Session, user_id: str, new_version: int) -> int:
+    total = 0
+    for model in WRAPPED_KEY_MODELS:
+        query = db.query(func.count()).select_from(model).filter(
+            model.user_id == user_id,
+            or_(model.key_version.is_(None), model.key_version != new_version)
+        )
+        if model is UploadSession:
+            query = query.filter(UploadSession.status == UPLOAD_SESSION_OPEN)
+        total += query.scalar()
+    return total
+
+
+def rotateUser(db: Session, job_id: str, user_id: str) -> str:
+    """
+    Rotate one user's key as part of job_id. Safe to call again after a crash.
+
+    Returns:
+        str: the final KeyRotationUser status
+    """
+    progress = db.query(KeyRotationUser).filter(
+        KeyRotationUser.job_id == job_id,
+        KeyRotationUser.user_id == user_id
+    ).first()
+    if progress is None:
+        raise ValueError(f"User {user_id} is not part of key rotation job {job_id}")
+    if progress.status in (KEY_ROTATION_COMPLETED, KEY_ROTATION_SKIPPED):
+        return progress.status
+
+    user = db.query(UserModel).filter(UserModel.id == user_id).first()
+    if user is None or not user.encryption_key:
+        progress.status = KEY_ROTATION_SKIPPED
+        db.commit()
+        return progress.status
+    if (
+        not user.pending_encryption_key
+        and user.key_rotated_at
+        and datetime.utcnow() - user.key_rotated_at < timedelta(seconds=KEY_CACHE_TTL_SECONDS)
+    ):
+        progress.status = KEY_ROTATION_SKIPPED
+        progress.error = "Rotated less than KEY_CACHE_TTL_SECONDS ago"
+        db.commit()
+        return progress.status
+
+    progress.status = KEY_ROTATION_RUNNING
+    progress.error = None
+    if not user.pending_encryption_key:
+        user.pending_encryption_key = AESGCM.generate_key(bit_length=256).hex()
+    db.commit()
+
+    current_version = user.key_version or 1
+    new_version = current_version + 1
+    try:
+        while True:
+            _rewrapPass(db, user_id, current_version, new_version, progress)
+            # lock the user row so the check and the promotion see the same rows
+            user = db.query(UserModel).filter(UserModel.id == user_id).with_for_update().first()
+            if _remaining(db, user_id, new_version):
+                # uploads landed under the old key while we were rewrapping
+                db.commit()
+                continue
+            user.previous_encryption_key = user.encryption_key
+            user.encryption_key = user.pending_encryption_key
+            user.pending_encryption_key = None
+            user.key_version = new_version
+            user.key_rotated_at = datetime.utcnow()
+            progress.status = KEY_ROTATION_COMPLETED
+            db.commit()
+            break
+    except Exception as e:
+        db.rollback()
+        progress.status = KEY_ROTATION_FAILED
+        progress.error = str(e)
+        db.commit()
+        logger.exception("Key rotation failed for user %s in job %s: %s", user_id, job_id, e)
+        return progress.status
+    finally:
+        KeyHandler.invalidate(user_id)
+
+    logger.info("Rotated key of user %s to version %d (%d keys rewrapped)", user_id, new_version, progress.rewrapped)
+    return progress.status
+
+
+def refreshJob(db: Session, job_id: str) -> KeyRotationJob | None:
+    """Close the job once none of its users are pending or running."""
+    job = db.query(KeyRotationJob).filter(KeyRotationJob.id == job_id).first()
+    if job is None:
+        return None
+    counts = dict(
+        db.query(KeyRotationUser.status, func.count())
+        .filter(KeyRotationUser.job_id == job_id)
+        .group_by(KeyRotationUser.status)
+        .all()
+    )
+    if counts.get(KEY_ROTATION_PENDING, 0) + counts.get(KEY_ROTATION_RUNNING, 0) == 0:
+        job.status = KEY_ROTATION_FAILED if counts.get(KEY_ROTATION_FAILED) else KEY_ROTATION_COMPLETED
+        job.finished_at = datetime.utcnow()
+    else:
+        job.status = KEY_ROTATION_RUNNING
+    db.commit()
+    return job
+
+
+def jobProgress(db: Session, job_id: str) -> dict | None:
+    job = db.query(KeyRotationJob).filter(KeyRotationJob.id == job_id).first()
+    if job is None:
+        return None
+    counts = dict(
+        db.query(KeyRotationUser.status, func.count())
+        .filter(KeyRotationUser.job_id == job_id)
+        .group_by(KeyRotationUser.status)
+        .all()
+    )
+    rewrapped = db.query(func.coalesce(func.sum(KeyRotationUser.rewrapped), 0)).filter(
+        KeyRotationUser.job_id == job_id
+    ).scalar()
+    failures = db.query(KeyRotationUser.user_id, KeyRotationUser.error).filter(
+        KeyRotationUser.job_id == job_id,
+        KeyRotationUser.status == KEY_ROTATION_FAILED
+    ).limit(100).all()
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "total_users": job.total_users,
+        "users": counts,
+        "rewrapped_keys": rewrapped,
+        "failures": [{"user_id": f.user_id, "error": f.error} for f in failures],
+        "created_at": job.created_at,
+        "finished_at": job.finished_at,
+    }
@@ -1,15 +1,37 @@
+import os
 from API.FolderHandler import FolderHandler
 from API.DuplicateFinder import DuplicateFinder
+from API.HashIndex import HashIndex, DEFAULT_INDEX_NAME
 class FileHasherAPI:
-    def __init__(self, folder_path):
-        self.folder_handler = FolderHandler(folder_path)
-        self.duplicates_handler = DuplicateFinder()
+    def __init__(self, folder_path, workers=None, index_path=None, use_index=True):
+        """
+        With use_index (the default) hashes are kept in a SQLite sidecar,
+        index_path or <folder>/.filehash_index.sqlite, and re-scans only
+        rehash files whose size, mtime or inode changed.
+        """
+        self.folder_path = folder_path
+        self.folder_handler = FolderHandler(folder_path, workers)
+        self.duplicates_handler = DuplicateFinder(workers=workers)
+        self.index = None
+        self.last_scan = None
+        if use_index:
+            self.index = HashIndex(index_path or os.path.join(folder_path, DEFAULT_INDEX_NAME), workers)
 
     def get_hashes(self):
-        """Return dict of {file_path: file_hash}"""
-        return self.folder_handler.hash_folder()
+        """Return dict of {file_hash: [file_paths]}"""
+        if self.index is None:
+            return self.folder_handler.hash_folder()
+        self.last_scan = self.index.update(self.folder_path)
+        return self.index.hashes()
+
+    def changed_since(self, scan_id):
+        """Yield Change(path, status, file_hash, scan_id) for files added, changed or removed after scan_id"""
+        return self.index.changed_since(scan_id)
+
+    def iter_duplicates(self):
+        """Yield DuplicateGroup(file_hash, size, paths) as each group is confirmed"""
+        return self.duplicates_handler.iter_duplicates(self.folder_path)
 
     def get_duplicates(self):
         """Return dict of duplicates {hash: [file_paths]}"""
-        hashes = self.get_hashes()
-        return self.duplicates_handler.find_duplicates(hashes)
+        return {group.file_hash: group.paths for group in self.iter_duplicates()}
@@ -1,20 +1,136 @@
+"""
+Duplicate detection in three stages, each one only looking at what the
+previous stage could not rule out:
+
+    1. size       files with a unique size cannot have a duplicate (no reads)
+    2. edges      hash of the first/last few KB, only for size collisions
+    3. full hash  SHA-256 of the whole file, only for edge hash collisions
+
+Stages 2 and 3 run on a process pool and are pipelined: a size group moves on
+to full hashing as soon as all its edge hashes are in, and duplicate groups
+are yielded as soon as they are confirmed.
+"""
+
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import NamedTuple
+
+from API.HashFile import full_hash, edge_hash
+from API.ScanFolder import ScanFolder
+
+
+class DuplicateGroup(NamedTuple):
+    """Files with identical content."""
+    file_hash: str
+    size: int
+    paths: list
+
+
 class DuplicateFinder:
+    def __init__(self, edge_bytes=4096, workers=None, min_size=1):
+        self.edge_bytes = edge_bytes
+        self.workers = workers or os.cpu_count() or 2
+        # empty files are all "duplicates" of each other, skipped by default
+        self.min_size = min_size
+        self.stats = {}
+
     @staticmethod
     def find_duplicates(hash_dict):
-        duplicates = {}  
-        total_duplicates = 0
-
-        for file_hash, files in hash_dict.items():
-            if len(files) > 1:
-                duplicates[file_hash] = files
-                print("found duplicates")
-                for file in files:
-                    print(f"file: {file}")
-                total_duplicates += len(files) - 1
-
-        if not duplicates:
-            print("No duplicates found")
-        else:
-            print(f"Found {total_duplicates} duplicate files")
-
-        return duplicates  
+        """Keep only the {hash: [file_paths]} entries that have more than one file."""
+        return {file_hash: files for file_hash, files in hash_dict.items() if len(files) > 1}
+
+    def _group_by_size(self, folder_path):
+        by_size = defaultdict(list)
+        seen_inodes = set()
+        for entry in ScanFolder.iter_files(folder_path):
+            try:
+                st = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            # hard links are the same file, not duplicates
+            if (st.st_dev, st.st_ino) in seen_inodes:
+                continue
+            seen_inodes.add((st.st_dev, st.st_ino))
+            self.stats["files_scanned"] += 1
+            if st.st_size >= self.min_size:
+                by_size[st.st_size].append(entry.path)
+        return {size: paths for size, paths in by_size.items() if len(paths) > 1}
+
+    def iter_duplicates(self, folder_path):
+        """
+        Yield a DuplicateGroup for every set of identical files under folder_path.
+
+        Progress counters (files scanned, files hashed per stage, bytes read)
+        are kept in self.stats.
+        """
+        self.stats = {
+            "files_scanned": 0,
+            "size_candidates": 0,
+            "edge_hashed": 0,
+            "full_hashed": 0,
+            "bytes_read": 0,
+            "duplicate_groups": 0,
+        }
+        candidates = self._group_by_size(folder_path)
+        self.stats["size_candidates"] = sum(len(paths) for paths in candidates.values())
+        if not candidates:
+            return
+
+        size_of = {path: size for size, paths in candidates.items() for path in paths}
+        # outstanding hash jobs per group, a group is settled when its count hits 0
+        pending_edges = {}
+        edge_groups = defaultdict(lambda: defaultdict(list))
+        pending_full = {}
+        full_groups = defaultdict(lambda: defaultdict(list))
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            running = {}
+
+            def submit_full(key, paths):
+                pending_full[key] = len(paths)
+                for path in paths:
+                    running[pool.submit(full_hash, path)] = ("full", key)
+
+            for size, paths in candidates.items():
+                if size <= 2 * self.edge_bytes:
+                    # the edges would be the whole file, hash it fully straight away
+                    submit_full((size, None), paths)
+                    continue
+                pending_edges[size] = len(paths)
+                for path in paths:
+                    running[pool.submit(edge_hash, path, self.edge_bytes)] = ("edge", size)
+
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, key = running.pop(future)
+                    path, digest = future.result()
+
+                    if stage == "edge":
+                        self.stats["edge_hashed"] += 1
+                        self.stats["bytes_read"] += 2 * self.edge_bytes
+                        if digest is not None:
+                            edge_groups[key][digest].append(path)
+                        pending_edges[key] -= 1
+                        if pending_edges[key]:
+                            continue
+                        # size group settled: only edge collisions go on to full hashing
+                        del pending_edges[key]
+                        for edge, paths in edge_groups.pop(key, {}).items():
+                            if len(paths) > 1:
+                                submit_full((key, edge), paths)
+                        continue
+
+                    self.stats["full_hashed"] += 1
+                    self.stats["bytes_read"] += size_of[path]
+                    if digest is not None:
+                        full_groups[key][digest].append(path)
+                    pending_full[key] -= 1
+                    if pending_full[key]:
+                        continue
+                    del pending_full[key]
+                    for file_hash, paths in full_groups.pop(key, {}).items():
+                        if len(paths) > 1:
+                            self.stats["duplicate_groups"] += 1
+                            yield DuplicateGroup(file_hash, key[0], sorted(paths))
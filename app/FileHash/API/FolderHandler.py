@@ -1,25 +1,34 @@
 import os
-from API.HashFile import HashHandler
+from concurrent.futures import ProcessPoolExecutor
+from API.HashFile import full_hash
 from API.ScanFolder import ScanFolder
 
 class FolderHandler:
-    def __init__(self, folder_path):
+    def __init__(self, folder_path, workers=None):
         self.folder_path = folder_path
+        self.workers = workers or os.cpu_count() or 2
+        self.errors = []
+
+    def iter_hashes(self):
+        """Yield (file_path, sha256) for every file in the folder, hashed on a process pool."""
+        self.errors = []
+        paths = (entry.path for entry in ScanFolder.iter_files(self.folder_path))
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            for file_path, file_hash in pool.map(full_hash, paths, chunksize=16):
+                if file_hash is None:
+                    self.errors.append(file_path)
+                    continue
+                yield file_path, file_hash
 
     def hash_folder(self):
         """
-        Hash all files in folder and return dict: {file_path: hash}
+        Hash all files in folder and return dict: {hash: [file_paths]}
+
+        Unreadable files are skipped and listed in self.errors. To only find
+        duplicates use DuplicateFinder.iter_duplicates, which avoids hashing
+        most files at all.
         """
-        file_list = ScanFolder.scan_folder(self.folder_path)
         hash_dict = {}
-
-        for file in file_list:
-            try:
-                file_hash = HashHandler(file).hash_file()
-                hash_dict.setdefault(file_hash, []).append(file)
-                print(f"{file}: {file_hash}")
-            except Exception as e:
-                print(f"Error hashing {file}: {e}")
-
+        for file_path, file_hash in self.iter_hashes():
+            hash_dict.setdefault(file_hash, []).append(file_path)
         return hash_dict
-
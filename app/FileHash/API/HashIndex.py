@@ -0,0 +1,246 @@
+"""
+Persistent, incremental hash index (SQLite sidecar).
+
+Each indexed file is stored with its stat signature (size, mtime_ns, inode).
+A re-scan stats every file but only rehashes the ones whose signature changed,
+and marks files that disappeared as removed, so with little churn a scan costs
+roughly one stat per file instead of one full read.
+
+Every scan gets an increasing id and rows remember the scan that added,
+changed or removed them, which is what changed_since(scan_id) reports.
+Files modified within RACY_WINDOW_NS of the scan start may still be changing
+under the same mtime, so their signature is not trusted and they are rehashed
+next scan; a rehash that produces the same hash is not reported as a change.
+"""
+
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+from API.HashFile import full_hash
+from API.ScanFolder import ScanFolder
+
+DEFAULT_INDEX_NAME = ".filehash_index.sqlite"
+BATCH_SIZE = 500
+# fewer changed files than this in a batch are hashed in process, a pool isn't worth starting
+POOL_THRESHOLD = 8
+RACY_WINDOW_NS = 2 * 1_000_000_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    hash TEXT,
+    seen_scan INTEGER NOT NULL,
+    added_scan INTEGER NOT NULL,
+    changed_scan INTEGER NOT NULL,
+    removed_scan INTEGER
+);
+CREATE INDEX IF NOT EXISTS ix_files_hash ON files (hash) WHERE removed_scan IS NULL;
+CREATE INDEX IF NOT EXISTS ix_files_changed ON files (changed_scan);
+CREATE INDEX IF NOT EXISTS ix_files_removed ON files (removed_scan);
+CREATE TABLE IF NOT EXISTS scans (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    folder TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    added INTEGER DEFAULT 0,
+    changed INTEGER DEFAULT 0,
+    removed INTEGER DEFAULT 0,
+    unchanged INTEGER DEFAULT 0
+);
+"""
+
+
+class ScanResult(NamedTuple):
+    scan_id: int
+    added: int
+    changed: int
+    removed: int
+    unchanged: int
+
+
+class Change(NamedTuple):
+    path: str
+    status: str        # "added", "changed" or "removed"
+    file_hash: str | None
+    scan_id: int
+
+
+class HashIndex:
+    def __init__(self, index_path, workers=None):
+        self.index_path = index_path
+        self.workers = workers or os.cpu_count() or 2
+        self.db = sqlite3.connect(index_path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self._pool = None
+
+    def close(self):
+        self.db.close()
+
+    def _is_index_file(self, path):
+        # the sidecar (and its -wal/-shm files) must not index itself
+        return os.path.abspath(path).startswith(os.path.abspath(self.index_path))
+
+    def _known(self, paths):
+        placeholders = ",".join("?" * len(paths))
+        rows = self.db.execute(
+            f"SELECT path, size, mtime_ns, inode, hash FROM files "
+            f"WHERE removed_scan IS NULL AND path IN ({placeholders})",
+            paths
+        )
+        return {row[0]: row[1:] for row in rows}
+
+    def _hash_all(self, paths):
+        if len(paths) < POOL_THRESHOLD:
+            return [full_hash(path) for path in paths]
+        if self._pool is None:
+            # started on first need and kept for the rest of the scan
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return list(self._pool.map(full_hash, paths, chunksize=16))
+
+    def update(self, folder_path):
+        """
+        Bring the index up to date with folder_path and return what changed.
+
+        Returns:
+            ScanResult: scan id and counts of added, changed, removed and unchanged files
+        """
+        folder_path = os.path.abspath(folder_path)
+        started_ns = time.time_ns()
+        scan_id = self.db.execute(
+            "INSERT INTO scans (folder, started_at) VALUES (?, ?)", (folder_path, started_ns / 1e9)
+        ).lastrowid
+        counts = {"added": 0, "changed": 0, "unchanged": 0}
+
+        batch = []
+        try:
+            for entry in ScanFolder.iter_files(folder_path):
+                if self._is_index_file(entry.path):
+                    continue
+                try:
+                    st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                batch.append((entry.path, st.st_size, st.st_mtime_ns, st.st_ino))
+                if len(batch) >= BATCH_SIZE:
+                    self._apply(batch, scan_id, started_ns, counts)
+                    batch = []
+            if batch:
+                self._apply(batch, scan_id, started_ns, counts)
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+        # anything under the folder that this scan did not see is gone
+        removed = self.db.execute(
+            "UPDATE files SET removed_scan = ?, changed_scan = ? "
+            "WHERE removed_scan IS NULL AND seen_scan < ? AND (path = ? OR path LIKE ? ESCAPE '\\')",
+            (scan_id, scan_id, scan_id, folder_path, _like_prefix(folder_path))
+        ).rowcount
+        self.db.execute(
+            "UPDATE scans SET finished_at = ?, added = ?, changed = ?, removed = ?, unchanged = ? WHERE id = ?",
+            (time.time(), counts["added"], counts["changed"], removed, counts["unchanged"], scan_id)
+        )
+        self.db.commit()
+        return ScanResult(scan_id, counts["added"], counts["changed"], removed, counts["unchanged"])
+
+    def _apply(self, batch, scan_id, started_ns, counts):
+        known = self._known([path for path, _, _, _ in batch])
+        unchanged, to_hash = [], []
+        for path, size, mtime_ns, inode in batch:
+            previous = known.get(path)
+            if previous is not None and previous[:3] == (size, mtime_ns, inode) and previous[3] is not None:
+                unchanged.append((scan_id, path))
+            else:
+                to_hash.append((path, size, mtime_ns, inode))
+
+        self.db.executemany("UPDATE files SET seen_scan = ? WHERE path = ?", unchanged)
+        counts["unchanged"] += len(unchanged)
+
+        signatures = {path: (size, mtime_ns, inode) for path, size, mtime_ns, inode in to_hash}
+        for path, file_hash in self._hash_all(list(signatures)):
+            if file_hash is None:
+                # unreadable right now, keep the old entry rather than report it removed
+                self.db.execute("UPDATE files SET seen_scan = ? WHERE path = ?", (scan_id, path))
+                continue
+            size, mtime_ns, inode = signatures[path]
+            if mtime_ns >= started_ns - RACY_WINDOW_NS:
+                # may still be written to within the same mtime tick, don't trust the signature
+                mtime_ns = -1
+            previous = known.get(path)
+            if previous is None:
+                counts["added"] += 1
+                self.db.execute(
+                    "INSERT INTO files (path, size, mtime_ns, inode, hash, seen_scan, added_scan, changed_scan) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (path) DO UPDATE SET size = excluded.size, mtime_ns = excluded.mtime_ns, "
+                    "inode = excluded.inode, hash = excluded.hash, seen_scan = excluded.seen_scan, "
+                    "added_scan = excluded.added_scan, changed_scan = excluded.changed_scan, removed_scan = NULL",
+                    (path, size, mtime_ns, inode, file_hash, scan_id, scan_id, scan_id)
+                )
+            elif previous[3] == file_hash:
+                # touched but same content: refresh the signature, not a change
+                counts["unchanged"] += 1
+                self.db.execute(
+                    "UPDATE files SET size = ?, mtime_ns = ?, inode = ?, seen_scan = ? WHERE path = ?",
+                    (size, mtime_ns, inode, scan_id, path)
+                )
+            else:
+                counts["changed"] += 1
+                self.db.execute(
+                    "UPDATE files SET size = ?, mtime_ns = ?, inode = ?, hash = ?, seen_scan = ?, changed_scan = ? "
+                    "WHERE path = ?",
+                    (size, mtime_ns, inode, file_hash, scan_id, scan_id, path)
+                )
+        self.db.commit()
+
+    def changed_since(self, scan_id):
+        """Yield a Change for every file added, changed or removed by scans after scan_id."""
+        rows = self.db.execute(
+            "SELECT path, hash, added_scan, changed_scan, removed_scan FROM files "
+            "WHERE changed_scan > ? ORDER BY changed_scan, path",
+            (scan_id,)
+        )
+        for path, file_hash, added_scan, changed_scan, removed_scan in rows:
+            if removed_scan is not None:
+                status = "removed"
+            elif added_scan > scan_id:
+                status = "added"
+            else:
+                status = "changed"
+            yield Change(path, status, file_hash, changed_scan)
+
+    def hashes(self):
+        """Return dict of {file_hash: [file_paths]} for every file currently indexed"""
+        hash_dict = {}
+        for path, file_hash in self.db.execute(
+            "SELECT path, hash FROM files WHERE removed_scan IS NULL AND hash IS NOT NULL ORDER BY path"
+        ):
+            hash_dict.setdefault(file_hash, []).append(path)
+        return hash_dict
+
+    def last_scan(self):
+        """Id of the most recent finished scan, 0 if the index is empty."""
+        row = self.db.execute("SELECT MAX(id) FROM scans WHERE finished_at IS NOT NULL").fetchone()
+        return row[0] or 0
+
+    def purge_removed(self, before_scan):
+        """Forget removed entries older than before_scan; changed_since can no longer report them."""
+        deleted = self.db.execute(
+            "DELETE FROM files WHERE removed_scan IS NOT NULL AND removed_scan < ?", (before_scan,)
+        ).rowcount
+        self.db.commit()
+        return deleted
+
+
+def _like_prefix(folder_path):
+    escaped = folder_path.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped.rstrip(os.sep) + os.sep + "%"
@@ -1,13 +1,32 @@
 import os
+
+
 class ScanFolder:
     def __init__(self, folder_path):
         self.folder_path = folder_path
 
     def scan_folder(self):
-         
-         file_list = []
-         for root, dirs, files in os.walk(self):
-            for file in files:
-                file_path = os.path.join(root, file)
-                file_list.append(file_path)
-         return file_list
\ No newline at end of file
+        """Return a list of every file path under the folder."""
+        return [entry.path for entry in ScanFolder.iter_files(self.folder_path)]
+
+    @staticmethod
+    def iter_files(folder_path):
+        """
+        Yield an os.DirEntry for every regular file under folder_path.
+
+        Uses scandir, so the size of each file comes from the directory listing
+        (entry.stat() is cached) instead of a separate stat call. Symlinks are
+        not followed.
+        """
+        stack = [folder_path]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            yield entry
+            except OSError:
+                # unreadable directory, skip it rather than abort the whole scan
+                continue
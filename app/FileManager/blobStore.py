@@ -0,0 +1,173 @@
+"""
+Per-user content addressed blob storage.
+
+Each user's identical plaintexts (same file_hash) share one encrypted blob on
+disk. FileModel rows point at a BlobModel through blob_id and the blob keeps a
+reference count, so deleting a FileModel row only removes the ciphertext once
+the last row referencing it is gone.
+"""
+
+from collections import Counter
+from uuid import uuid4
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.file import FileModel, BlobModel
+from app.FileManager.storageBackend import getStorage, keyFor
+from app.utils.logger import SingletonLogger
+
+logger = SingletonLogger().get_logger()
+
+
+def findBlob(db: Session, user_id: str, content_hash: str) -> BlobModel | None:
+    return db.query(BlobModel).filter(
+        BlobModel.user_id == user_id,
+        BlobModel.content_hash == content_hash
+    ).first()
+
+
+def addReference(db: Session, user_id: str, content_hash: str) -> BlobModel | None:
+    """Atomically bump the ref count of an existing blob, None if there is no blob yet."""
+    result = db.execute(
+        update(BlobModel)
+        .where(BlobModel.user_id == user_id, BlobModel.content_hash == content_hash)
+        .values(ref_count=BlobModel.ref_count + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        return None
+    blob = findBlob(db, user_id, content_hash)
+    db.refresh(blob)
+    return blob
+
+
+def claimBlob(
+        db: Session,
+        user_id: str,
+        content_hash: str,
+        file_path: str,
+        nonce: bytes,
+        size_bytes: int,
+        wrapped_key: str | None = None,
+        key_version: int | None = None,
+        codec: str | None = None,
+        hash_algorithm: str | None = None
+    ) -> tuple[BlobModel, bool]:
+    """
+    Take a reference on the user's blob for content_hash.
+
+    If the blob already exists its ref count is incremented and the caller's
+    freshly written file_path is not needed. Otherwise file_path becomes the new
+    blob. Does not commit, so the reference and the FileModel row that uses it
+    land in the same transaction.
+
+    Returns:
+        tuple[BlobModel, bool]: (blob, True if file_path was adopted as a new blob)
+    """
+    blob = addReference(db, user_id, content_hash)
+    if blob is not None:
+        return blob, False
+
+    blob = BlobModel(
+        id=str(uuid4()),
+        user_id=user_id,
+        content_hash=content_hash,
+        hash_algorithm=hash_algorithm,
+        file_path=file_path,
+        nonce=nonce.hex(),
+        wrapped_key=wrapped_key,
+        key_version=key_version,
+        codec=codec,
+        size_bytes=size_bytes,
+        ref_count=1
+    )
+    try:
+        with db.begin_nested():
+            db.add(blob)
+    except IntegrityError:
+        # another upload of the same content created the blob first
+        blob = addReference(db, user_id, content_hash)
+        if blob is None:
+            raise
+        return blob, False
+    return blob, True
+
+
+def releaseFile(db: Session, file: FileModel) -> None:
+    """
+    Delete a FileModel row and drop its blob reference.
+
+    The ciphertext is removed from disk only when no other row references it,
+    and only after the transaction has committed.
+    """
+    orphaned_path = None
+    blob_id = file.blob_id
+    db.delete(file)
+    db.flush()
+
+    if blob_id is None:
+        # stored before dedup, the row owns its file outright
+        orphaned_path = file.file_path
+    else:
+        db.execute(
+            update(BlobModel)
+            .where(BlobModel.id == blob_id)
+            .values(ref_count=BlobModel.ref_count - 1)
+            .execution_options(synchronize_session=False)
+        )
+        blob = db.query(BlobModel).filter(BlobModel.id == blob_id).first()
+        db.refresh(blob)
+        if blob.ref_count <= 0:
+            orphaned_path = blob.file_path
+            db.delete(blob)
+
+    db.commit()
+
+    if orphaned_path and getStorage().delete(keyFor(orphaned_path)):
+        logger.info("Removed blob %s, no references left", orphaned_path)
+
+
+def releaseFiles(db: Session, files: list[FileModel], workers: int = 8) -> list[str]:
+    """
+    releaseFile for a batch: one DELETE for the rows, one ref count update per blob.
+
+    Stored files left without references are deleted after the commit.
+
+    Returns:
+        list[str]: file paths of the stored files that were removed
+    """
+    if not files:
+        return []
+    db.execute(
+        delete(FileModel)
+        .where(FileModel.id.in_([file.id for file in files]))
+        .execution_options(synchronize_session=False)
+    )
+
+    orphaned_paths = [file.file_path for file in files if file.blob_id is None]
+    released = Counter(file.blob_id for file in files if file.blob_id is not None)
+    for blob_id, count in released.items():
+        db.execute(
+            update(BlobModel)
+            .where(BlobModel.id == blob_id)
+            .values(ref_count=BlobModel.ref_count - count)
+            .execution_options(synchronize_session=False)
+        )
+    if released:
+        orphans = db.query(BlobModel.id, BlobModel.file_path).filter(
+            BlobModel.id.in_(list(released)),
+            BlobModel.ref_count <= 0
+        ).all()
+        orphaned_paths += [orphan.file_path for orphan in orphans]
+        db.execute(
+            delete(BlobModel)
+            .where(BlobModel.id.in_([orphan.id for orphan in orphans]))
+            .execution_options(synchronize_session=False)
+        )
+
+    db.commit()
+
+    if orphaned_paths:
+        getStorage().deleteMany([keyFor(path) for path in orphaned_paths], workers)
+        logger.info("Removed %d stored files, no references left", len(orphaned_paths))
+    return orphaned_paths
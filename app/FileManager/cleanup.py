@@ -0,0 +1,125 @@
+"""
+Cleanup of old stored files by scanning the storage (admin_cli cleanup-files).
+
+Stored files are streamed from the backend's listing (os.scandir under
+FILE_STORAGE_DIR for local storage, so sharded directories are walked and
+each entry is stat'ed once). The ones older than the cutoff are checked
+against the database in batches, and only those no FileModel or BlobModel row
+points at are deleted (in parallel, one DeleteObjects request on S3). A
+stored file that is still referenced is never touched, whatever its age: a
+dedup blob keeps the mtime of its first upload, and files that did expire are
+the file_cleanup task's job (retention.expireFiles), which goes through the
+blobs' ref counts.
+
+Deletes are paced by a RateLimiter (deletes per second) so a large cleanup
+doesn't monopolise the disk. In a dry run nothing is deleted and the stats
+report what would have been. Multipart staging files (.part) are never
+touched, they belong to upload sessions.
+"""
+
+import time
+from app.config import CLEANUP_DELETES_PER_SECOND, CLEANUP_WORKERS
+from app.models.database import SessionLocal
+from app.models.file import FileModel, BlobModel
+from app.FileManager.storageBackend import StorageBackend, StoredObject, getStorage, pathForKey
+from app.utils.throttle import RateLimiter
+from app.utils.logger import SingletonLogger
+from app.dependencies.constants import CLEANUP_BATCH_SIZE
+
+logger = SingletonLogger().get_logger()
+
+
+def _deleteBatch(
+        storage: StorageBackend,
+        batch: list[StoredObject],
+        stats: dict,
+        dry_run: bool,
+        limiter: RateLimiter,
+        workers: int,
+        session_factory
+    ) -> None:
+    paths = [pathForKey(stored.key) for stored in batch]
+    stats["matched"] += len(batch)
+    stats["batches"] += 1
+
+    # one query per table for the whole batch, in a short-lived session
+    with session_factory() as db:
+        referenced = {path for (path,) in db.query(FileModel.file_path).filter(FileModel.file_path.in_(paths))}
+        referenced.update(path for (path,) in db.query(BlobModel.file_path).filter(BlobModel.file_path.in_(paths)))
+    orphans = [stored for stored, path in zip(batch, paths) if path not in referenced]
+    stats["referenced"] += len(batch) - len(orphans)
+    if not orphans:
+        return
+
+    if dry_run:
+        stats["deleted"] += len(orphans)
+        stats["bytes_freed"] += sum(stored.size for stored in orphans)
+        return
+
+    limiter.consume(len(orphans))
+    existed = storage.deleteMany([stored.key for stored in orphans], workers)
+    for stored, was_deleted in zip(orphans, existed):
+        if was_deleted:
+            stats["deleted"] += 1
+            stats["bytes_freed"] += stored.size
+
+
+def cleanupStoredFiles(
+        older_than: float,
+        dry_run: bool = False,
+        batch_size: int = CLEANUP_BATCH_SIZE,
+        deletes_per_second: float = CLEANUP_DELETES_PER_SECOND,
+        workers: int = CLEANUP_WORKERS,
+        storage: StorageBackend | None = None,
+        session_factory=SessionLocal
+    ) -> dict:
+    """
+    Delete every stored file last modified before older_than (a unix timestamp) that no row references.
+
+    Returns:
+        dict: scanned, matched (older than the cutoff), referenced (kept because a
+        row points at them), deleted, bytes_freed, batches, errors,
+        duration_seconds and dry_run
+    """
+    storage = storage or getStorage()
+    limiter = RateLimiter(deletes_per_second, burst=max(batch_size, deletes_per_second))
+    stats = {
+        "scanned": 0,
+        "matched": 0,
+        "referenced": 0,
+        "deleted": 0,
+        "bytes_freed": 0,
+        "batches": 0,
+        "errors": 0,
+        "duration_seconds": 0.0,
+        "dry_run": dry_run,
+    }
+    started = time.perf_counter()
+
+    def flush(batch):
+        try:
+            _deleteBatch(storage, batch, stats, dry_run, limiter, workers, session_factory)
+        except Exception as e:
+            # a failed batch is retried by the next cleanup, keep going with the rest
+            stats["errors"] += 1
+            logger.exception("Cleanup batch of %d files failed: %s", len(batch), e)
+
+    batch = []
+    for stored in storage.list():
+        stats["scanned"] += 1
+        if stored.mtime >= older_than:
+            continue
+        batch.append(stored)
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    stats["duration_seconds"] = round(time.perf_counter() - started, 3)
+    logger.info(
+        "Cleanup%s: scanned %d, deleted %d unreferenced files (%d bytes), kept %d referenced in %.1fs",
+        " (dry run)" if dry_run else "",
+        stats["scanned"], stats["deleted"], stats["bytes_freed"], stats["referenced"], stats["duration_seconds"]
+    )
+    return stats
@@ -0,0 +1,155 @@
+"""
+Optional compression stage applied to uploads before encryption.
+
+Ciphertext does not compress, so anything worth compressing has to be
+compressed first. chooseCodec() decides per upload from its extension, its
+size and the byte entropy of the first chunk; the chosen codec is stored on
+FileModel.codec (None means stored as is) and reversed on download and when
+the file is attached to an email.
+
+zstd is used when the zstandard package is installed, zlib otherwise. The
+hash recorded for a file is always that of the original bytes.
+"""
+
+import math
+import os
+import zlib
+from app.config import (
+    COMPRESSION_ENABLED,
+    COMPRESSION_MIN_BYTES,
+    COMPRESSION_MAX_ENTROPY,
+    COMPRESSION_LEVEL,
+)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CODEC_ZLIB = "zlib"
+CODEC_ZSTD = "zstd"
+
+# bytes looked at by the entropy probe
+PROBE_SIZE = 64 * 1024
+
+# formats that are already compressed, probing them is wasted work
+COMPRESSED_EXTENSIONS = {
+    "png", "jpg", "jpeg", "gif", "webp", "zip", "gz", "tgz", "bz2", "xz", "zst",
+    "7z", "rar", "mp3", "mp4", "mkv", "mov", "avi", "docx", "xlsx", "pptx",
+}
+
+
+def defaultCodec() -> str:
+    return CODEC_ZSTD if zstandard is not None else CODEC_ZLIB
+
+
+def entropy(sample: bytes) -> float:
+    """Shannon entropy of sample in bits per byte (8.0 for random data)."""
+    if not sample:
+        return 0.0
+    total = len(sample)
+    counts = [sample.count(bytes((b,))) for b in set(sample)]
+    return -sum(c / total * math.log2(c / total) for c in counts)
+
+
+def chooseCodec(filename: str | None, size: int, sample: bytes) -> str | None:
+    """Codec to store an upload with, or None to store it uncompressed."""
+    if not COMPRESSION_ENABLED or size < COMPRESSION_MIN_BYTES:
+        return None
+    extension = os.path.splitext(filename or "")[1].lstrip(".").lower()
+    if extension in COMPRESSED_EXTENSIONS:
+        return None
+    if entropy(sample[:PROBE_SIZE]) > COMPRESSION_MAX_ENTROPY:
+        return None
+    return defaultCodec()
+
+
+class _Identity():
+    def compress(self, chunk: bytes) -> bytes:
+        return chunk
+
+    def decompress(self, chunk: bytes) -> bytes:
+        return chunk
+
+    def flush(self) -> bytes:
+        return b""
+
+
+def compressor(codec: str | None, level: int = COMPRESSION_LEVEL):
+    """Streaming compressor with compress(chunk) and flush()."""
+    if codec is None:
+        return _Identity()
+    if codec == CODEC_ZLIB:
+        return zlib.compressobj(level)
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("zstd compression requires the zstandard package")
+        return zstandard.ZstdCompressor(level=level).compressobj()
+    raise ValueError(f"Unknown codec {codec!r}")
+
+
+def decompressor(codec: str | None):
+    """Streaming decompressor with decompress(chunk) (and flush() for zlib)."""
+    if codec is None:
+        return _Identity()
+    if codec == CODEC_ZLIB:
+        return zlib.decompressobj()
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("File is zstd compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompressobj()
+    raise ValueError(f"Unknown codec {codec!r}")
+
+
+def decompressStream(codec: str | None, chunks):
+    """Yield the decompressed form of an iterable of compressed chunks."""
+    stream = decompressor(codec)
+    for chunk in chunks:
+        out = stream.decompress(chunk)
+        if out:
+            yield out
+    if hasattr(stream, "flush"):
+        out = stream.flush()
+        if out:
+            yield out
+
+
+def decompress(codec: str | None, data: bytes) -> bytes:
+    if codec is None:
+        return data
+    return b"".join(decompressStream(codec, (data,)))
+
+
+class DecompressingReader():
+    """
+    Reader interface (.size, .iter_range) over a compressed file's decrypting reader.
+
+    Compressed streams have no random access, so a range is served by
+    decompressing from the start and skipping up to it. Only files that
+    compress well (text, CSV, logs) are compressed, which keeps this cheap.
+    """
+    def __init__(self, reader, codec: str, size: int):
+        self._reader = reader
+        self._codec = codec
+        self.size = size
+
+    def iter_range(self, start: int = 0, end: int | None = None):
+        if end is None or end >= self.size:
+            end = self.size - 1
+        if self.size == 0 or start > end:
+            return
+        offset = 0
+        for chunk in decompressStream(self._codec, self._reader.iter_range()):
+            chunk_end = offset + len(chunk)
+            if chunk_end > start:
+                yield chunk[max(start - offset, 0):end - offset + 1]
+            offset = chunk_end
+            if offset > end:
+                return
+
+
+def wrapReader(reader, codec: str | None, size: int | None):
+    """The reader to serve a stored file from: reader itself unless the file is compressed."""
+    if codec is None:
+        return reader
+    return DecompressingReader(reader, codec, size)
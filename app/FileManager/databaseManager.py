@@ -1,3 +1,4 @@
+from datetime import datetime
 from uuid import uuid4
 from sqlalchemy.orm import Session
 from app.models.file import FileModel
@@ -11,7 +12,14 @@ def saveToDatabase(
         user_id: str,
         file_path: str,
         file_hash: str,
-        nonce: bytes
+        nonce: bytes,
+        blob_id: str | None = None,
+        wrapped_key: str | None = None,
+        key_version: int | None = None,
+        codec: str | None = None,
+        size_bytes: int | None = None,
+        hash_algorithm: str | None = None,
+        expires_at: datetime | None = None
     ):
     
     new_file = FileModel(
@@ -20,7 +28,14 @@ def saveToDatabase(
         user_id=user_id,
         file_path=file_path,
         file_hash=file_hash,
-        nonce=nonce.hex()
+        hash_algorithm=hash_algorithm,
+        nonce=nonce.hex(),
+        blob_id=blob_id,
+        wrapped_key=wrapped_key,
+        key_version=key_version,
+        codec=codec,
+        size_bytes=size_bytes,
+        expires_at=expires_at
     )
 
     db.add(new_file)
@@ -0,0 +1,106 @@
+"""
+Duplicate report over stored files, computed from FileModel.file_hash alone.
+
+Files with the same hash have the same content, so duplicates are found with
+one GROUP BY on the (user_id, file_hash) / file_hash indexes and no file is
+ever read. A group counts its stored copies as distinct file paths: rows that
+share a dedup blob occupy the disk once, so only the extra copies count as
+reclaimable. Across users every user has their own encrypted blob, which is
+what the admin report's reclaimable bytes measure.
+"""
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app.models.file import FileModel
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def _reclaimable():
+    copies = func.count(func.distinct(FileModel.file_path))
+    size = func.coalesce(func.max(FileModel.size_bytes), 0)
+    return copies, size, (copies - 1) * size
+
+
+def _groupQuery(user_id: str | None):
+    copies, size, reclaimable = _reclaimable()
+    query = select(
+        FileModel.file_hash,
+        func.count().label("files"),
+        copies.label("copies"),
+        func.count(func.distinct(FileModel.user_id)).label("users"),
+        size.label("size_bytes"),
+        reclaimable.label("reclaimable_bytes"),
+    ).where(FileModel.file_hash.is_not(None))
+    if user_id is not None:
+        query = query.where(FileModel.user_id == user_id)
+    return query.group_by(FileModel.file_hash).having(func.count() > 1)
+
+
+def duplicateSummary(db: Session, user_id: str | None = None) -> dict:
+    """Totals over every duplicate group of user_id, or of all users when None."""
+    groups = _groupQuery(user_id).subquery()
+    row = db.execute(select(
+        func.count(),
+        func.coalesce(func.sum(groups.c.files - 1), 0),
+        func.coalesce(func.sum(groups.c.reclaimable_bytes), 0),
+    ).select_from(groups)).one()
+    return {"groups": row[0], "duplicate_files": int(row[1]), "reclaimable_bytes": int(row[2])}
+
+
+def duplicateGroups(
+        db: Session,
+        user_id: str | None = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        offset: int = 0
+    ) -> list[dict]:
+    """
+    One page of duplicate groups, largest reclaimable size first.
+
+    Only the files of the groups on the page are loaded (an IN on file_hash),
+    so listing stays cheap however many files are stored.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    page = _groupQuery(user_id).order_by(
+        _reclaimable()[2].desc(), func.count().desc(), FileModel.file_hash
+    ).limit(limit).offset(max(offset, 0))
+    rows = db.execute(page).all()
+    if not rows:
+        return []
+
+    files_query = db.query(FileModel.id, FileModel.user_id, FileModel.filename, FileModel.file_hash).filter(
+        FileModel.file_hash.in_([row.file_hash for row in rows])
+    )
+    if user_id is not None:
+        files_query = files_query.filter(FileModel.user_id == user_id)
+    members = {}
+    for file_id, owner, filename, file_hash in files_query.order_by(FileModel.file_hash, FileModel.id):
+        members.setdefault(file_hash, []).append({"id": file_id, "user_id": owner, "filename": filename})
+
+    return [
+        {
+            "file_hash": row.file_hash,
+            "files": row.files,
+            "copies": row.copies,
+            "users": row.users,
+            "size_bytes": int(row.size_bytes),
+            "reclaimable_bytes": int(row.reclaimable_bytes),
+            "members": members.get(row.file_hash, []),
+        }
+        for row in rows
+    ]
+
+
+def duplicateReport(
+        db: Session,
+        user_id: str | None = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        offset: int = 0
+    ) -> dict:
+    return {
+        **duplicateSummary(db, user_id),
+        "limit": limit,
+        "offset": offset,
+        "items": duplicateGroups(db, user_id, limit, offset),
+    }
@@ -4,62 +4,239 @@ from app.models.database import get_db
 from app.FileManager.fileOperations import fileOperations
 from app.Encryption_Services.encryptionService import EncryptionService
 from app.FileManager.databaseManager import saveToDatabase
-from app.FileHash.API.HashFile import HashHandler
+from app.FileManager.blobStore import claimBlob, addReference, findBlob
+from app.FileManager.storageBackend import getStorage, keyFor
+from app.FileManager import retention
+from app.FileHash.API.HashFile import HashHandler, LEGACY_ALGORITHM
+from app.config import HASH_ALGORITHM
 from app.utils.logger import SingletonLogger
+from app.utils.executors import run_blocking, upload_budget, CRYPTO, DISK
 import os
+from datetime import datetime
 
 
-"""gotta make this a celery process or seperate thread"""
+"""blocking steps run on the app.utils.executors pools so the event loop stays free"""
 class fileManager:
     def __init__(self, db: Session = Depends(get_db)):
         self.db = db
         self.encryption = EncryptionService()
 
-    async def uploadFile(self, user_id: str, file: UploadFile):  
-        logger = SingletonLogger().get_logger()
+    def recordUpload(
+            self,
+            user_id: str,
+            original_filename: str,
+            file_path: str,
+            file_hash: str,
+            nonce: bytes,
+            size_bytes: int,
+            wrapped_key: str,
+            key_version: int,
+            codec: str | None = None,
+            hash_algorithm: str | None = None,
+            expires_at: datetime | None = None
+        ):
+        """Reference (or create) the user's blob for this content and insert the FileModel row in one transaction."""
         try:
-            fileOperations.validate_file(file)
+            blob, created = claimBlob(
+                self.db, user_id, file_hash, file_path, nonce, size_bytes, wrapped_key, key_version, codec,
+                hash_algorithm
+            )
+            new_file = saveToDatabase(
+                original_filename=original_filename,
+                user_id=user_id,
+                file_path=blob.file_path,
+                file_hash=file_hash,
+                db=self.db,
+                nonce=bytes.fromhex(blob.nonce),
+                blob_id=blob.id,
+                wrapped_key=blob.wrapped_key,
+                key_version=blob.key_version,
+                codec=blob.codec,
+                size_bytes=blob.size_bytes,
+                hash_algorithm=blob.hash_algorithm,
+                expires_at=expires_at
+            )
+        except Exception:
+            self.db.rollback()
+            fileOperations.remove_file(file_path)
+            raise
 
-            filename, file_path = fileOperations.save_file(file, user_id)
-            logger.info("File successfully saved to disk: %s", file_path)
+        if not created:
+            # same content is already stored for this user, the copy we just wrote isn't needed
+            fileOperations.remove_file(file_path)
+        return new_file
 
-            if not os.path.exists(file_path):
-                raise HTTPException(status_code=500, detail="Saved file not found on disk")
+    def _referenceExisting(
+            self,
+            user_id: str,
+            original_filename: str,
+            file_hash: str,
+            expires_at: datetime | None = None
+        ):
+        """Metadata only upload: point a new FileModel row at an existing blob, None if there is no blob."""
+        blob = addReference(self.db, user_id, file_hash)
+        if blob is None:
+            self.db.rollback()
+            return None
+        return saveToDatabase(
+            original_filename=original_filename,
+            user_id=user_id,
+            file_path=blob.file_path,
+            file_hash=file_hash,
+            db=self.db,
+            nonce=bytes.fromhex(blob.nonce),
+            blob_id=blob.id,
+            wrapped_key=blob.wrapped_key,
+            key_version=blob.key_version,
+            codec=blob.codec,
+            size_bytes=blob.size_bytes,
+            hash_algorithm=blob.hash_algorithm,
+            expires_at=expires_at
+        )
 
-            file_hash = HashHandler(file_path).hash_file()
-            logger.info("File hash computed: %s", file_hash)
+    def _matchingBlob(self, user_id: str, file_hash: str, hash_algorithm: str, size_bytes: int | None = None):
+        """The user's blob for file_hash if it was hashed with hash_algorithm (and has size_bytes), else None."""
+        blob = findBlob(self.db, user_id, file_hash)
+        if blob is None or (blob.hash_algorithm or LEGACY_ALGORITHM) != hash_algorithm:
+            return None
+        if size_bytes is not None and blob.size_bytes is not None and blob.size_bytes != size_bytes:
+            return None
+        return blob
 
-            nonce = self.encryption.encrypt(
-                file_path=file_path,
-                user_id=user_id,
-                db=self.db
-            )
+    def _referenceByHash(
+            self,
+            user_id: str,
+            original_filename: str,
+            file_hash: str,
+            size_bytes: int,
+            hash_algorithm: str,
+            ttl_seconds: int | None
+        ):
+        if self._matchingBlob(user_id, file_hash, hash_algorithm, size_bytes) is None:
+            return None
+        expires_at = retention.expiryFor(self.db, user_id, ttl_seconds)
+        return self._referenceExisting(user_id, original_filename, file_hash, expires_at)
 
-            if nonce is None:
-                logger.error("Encryption failed: nonce is None")
-                raise HTTPException(status_code=500, detail="Encryption failed")
+    async def referenceByHash(
+            self,
+            user_id: str,
+            original_filename: str,
+            file_hash: str,
+            size_bytes: int,
+            hash_algorithm: str = LEGACY_ALGORITHM,
+            ttl_seconds: int | None = None
+        ):
+        """
+        Create a FileModel row from content the user already stored, without any bytes being sent.
 
-            logger.info("Encryption successful, nonce length: %d bytes", len(nonce))
+        Blobs are per user, so a hash can only ever resolve to the caller's own
+        content; knowing a hash gives no access to anyone else's files.
 
-            new_file = saveToDatabase(
-                original_filename=file.filename or "unnamed_file",
-                user_id=user_id,
-                file_path=file_path,
-                file_hash=file_hash,
-                db=self.db,
-                nonce=nonce
-            )
+        Returns:
+            FileModel | None: the new row, None if the user has no matching content
+        """
+        return await run_blocking(
+            DISK,
+            self._referenceByHash,
+            user_id,
+            original_filename,
+            file_hash.lower(),
+            size_bytes,
+            hash_algorithm,
+            ttl_seconds
+        )
+
+    async def _uploadByReference(
+            self,
+            user_id: str,
+            file: UploadFile,
+            file_hash: str,
+            hash_algorithm: str,
+            expires_at: datetime | None
+        ):
+        """
+        Short circuit for content the user already has stored.
+
+        The client supplied hash is only trusted after hashing the upload, which
+        skips encryption and the disk write entirely.
+        """
+        if await run_blocking(DISK, self._matchingBlob, user_id, file_hash, hash_algorithm) is None:
+            return None
+
+        actual_hash = await run_blocking(CRYPTO, fileOperations.hash_upload, file, HashHandler(algorithm=hash_algorithm))
+        if actual_hash != file_hash:
+            SingletonLogger().get_logger().warning("Client supplied hash does not match upload for user %s", user_id)
+            return None
+
+        return await run_blocking(
+            DISK, self._referenceExisting, user_id, file.filename or "unnamed_file", file_hash, expires_at
+        )
+
+    async def uploadFile(
+            self,
+            user_id: str,
+            file: UploadFile,
+            file_hash: str | None = None,
+            hash_algorithm: str = LEGACY_ALGORITHM,
+            ttl_seconds: int | None = None,
+            retain_from: datetime | None = None
+        ):
+        # retain_from: count the retention from then instead of now, for files needed later (task attachments)
+        logger = SingletonLogger().get_logger()
+        try:
+            fileOperations.validate_file(file)
+            expires_at = await run_blocking(DISK, retention.expiryFor, self.db, user_id, ttl_seconds, retain_from)
+
+            async with upload_budget.reserve(file.size or 0):
+                new_file = None
+                if file_hash:
+                    new_file = await self._uploadByReference(user_id, file, file_hash, hash_algorithm, expires_at)
+
+                if new_file is None:
+                    # one pass over the upload: hash + encrypt each chunk, write ciphertext only
+                    hasher = HashHandler(algorithm=HASH_ALGORITHM)
+                    codec = await run_blocking(DISK, fileOperations.choose_codec, file)
+                    encryptor = await run_blocking(DISK, self.encryption.stream_encryptor, user_id=user_id, db=self.db)
+                    filename, file_path = await run_blocking(
+                        CRYPTO, fileOperations.save_file, file, user_id, hasher, encryptor, codec
+                    )
+                    logger.info("File successfully saved to disk: %s", file_path)
+
+                    if await getStorage().statAsync(keyFor(file_path)) is None:
+                        raise HTTPException(status_code=500, detail="Saved file not found in storage")
+
+                    file_hash = hasher.hexdigest()
+                    logger.info("File hash computed: %s", file_hash)
+                    logger.info("Encryption successful, nonce length: %d bytes", len(encryptor.nonce))
+
+                    new_file = await run_blocking(
+                        DISK,
+                        self.recordUpload,
+                        user_id,
+                        file.filename or "unnamed_file",
+                        file_path,
+                        file_hash,
+                        encryptor.nonce,
+                        file.size or 0,
+                        encryptor.wrapped_key,
+                        encryptor.key_version,
+                        codec,
+                        HASH_ALGORITHM,
+                        expires_at
+                    )
 
             logger.info("File metadata saved to DB - ID: %s", new_file.id)
 
             return {
                 "id": new_file.id,
-                "filename": filename,
-                "file_path": file_path,
-                "file_hash": file_hash if isinstance(file_hash, str) else file_hash.hex(),
-                "nonce": nonce.hex()
+                "filename": os.path.basename(new_file.file_path),
+                "file_path": new_file.file_path,
+                "file_hash": new_file.file_hash,
+                "nonce": new_file.nonce
             }
 
+        except HTTPException:
+            raise
         except Exception as e:
             logger.exception("Upload failed with unexpected exception: %s", e)
             raise HTTPException(status_code=500, detail="Upload processing failed") from e
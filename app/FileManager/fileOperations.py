@@ -7,34 +7,59 @@ from datetime import datetime
 from fastapi import UploadFile, HTTPException, status
 from app.utils.logger import SingletonLogger
 from app.dependencies.constants import MAX_UPLOAD_SIZE_MB
+from app.FileManager import storagePath
+from app.FileManager.storageBackend import getStorage, keyFor
+from app.FileManager import compression
 
-#base dir is for docker container volume
-BASE_DIR = "/app/uploads"
 logger = SingletonLogger().get_logger()
 
+# uploads are streamed through hashing and encryption in chunks of this size
+CHUNK_SIZE = 1024 * 1024
+
 class fileOperations():
-    def save_file(file: UploadFile, user_id: str) -> tuple[str, str]:
+    def build_path(original_filename: str, user_id: str) -> tuple[str, str]:
+        """
+        Pick the unique stored name for a new upload, inside its storage shard.
+
+        Returns:
+            tuple[str, str]: (Saved filename, full path)
         """
-        Save uploaded file to disk with a unique name.
+        filename = f"{user_id}_{datetime.now():%Y-%m-%d_%H-%M-%S}_{original_filename}"
+        return filename, storagePath.pathFor(filename, create=False)
+
+
+    def save_file(file: UploadFile, user_id: str, hasher, encryptor, codec: str | None = None) -> tuple[str, str]:
+        """
+        Stream uploaded file into storage with a unique name.
+
+        The upload is read once in CHUNK_SIZE pieces; each chunk updates the
+        hash, is compressed with codec (if any) and goes through the encryptor,
+        and only ciphertext is written.
+        The storage backend only makes the object visible once it is complete,
+        so neither plaintext nor half written ciphertext is left behind.
 
         Args:
             file (UploadFile): Uploaded file.
             user_id (str): User's ID.
+            hasher (HashHandler): Receives every plaintext chunk.
+            encryptor (SegmentedEncryptor): Turns plaintext chunks into ciphertext.
+            codec (str | None): Compression applied before encryption, see choose_codec.
 
         Returns:
             tuple[str, str]: (Saved filename, full path)
         """
-        try:
-            filename = f"{user_id}_{datetime.now():%Y-%m-%d_%H-%M-%S}_{file.filename}"
-            os.makedirs(BASE_DIR, exist_ok=True)
-            file_path = os.path.join(BASE_DIR, filename)
-
-            with open(file_path, "wb") as f:
-                contents = file.file.read()
-                f.write(contents)
-                
-            #reset pointer    
+        def ciphertext():
+            compressor = compression.compressor(codec)
             file.file.seek(0)
+            while chunk := file.file.read(CHUNK_SIZE):
+                hasher.update(chunk)
+                yield encryptor.update(compressor.compress(chunk))
+            yield encryptor.update(compressor.flush())
+            yield encryptor.finalize()
+
+        try:
+            filename, file_path = fileOperations.build_path(file.filename, user_id)
+            getStorage().putStream(keyFor(file_path), ciphertext())
             logger.info("File saved: %s at %s", filename, file_path)
             return filename, file_path
 
@@ -46,6 +71,34 @@ class fileOperations():
             ) from exc
 
 
+    def hash_upload(file: UploadFile, hasher):
+        """
+        Hash an upload without writing anything, used to verify a client supplied hash.
+
+        Returns:
+            str: Hex digest of the upload.
+        """
+        file.file.seek(0)
+        while chunk := file.file.read(CHUNK_SIZE):
+            hasher.update(chunk)
+        file.file.seek(0)
+        return hasher.hexdigest()
+
+
+    def choose_codec(file: UploadFile) -> str | None:
+        """Pick the compression codec for an upload from its name, size and first chunk."""
+        file.file.seek(0)
+        sample = file.file.read(compression.PROBE_SIZE)
+        file.file.seek(0)
+        return compression.chooseCodec(file.filename, file.size or len(sample), sample)
+
+
+    def remove_file(file_path: str) -> None:
+        """Remove a stored file if it exists."""
+        if getStorage().delete(keyFor(file_path)):
+            logger.info("File removed: %s", file_path)
+
+
     def validate_file(file: UploadFile) -> None:
         """
         Validate uploaded file size.
@@ -68,6 +121,8 @@ class fileOperations():
                     status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
                     detail=f"File exceeds max allowed size of {MAX_UPLOAD_SIZE_MB} MB",
                 )
+        except HTTPException:
+            raise
         except Exception as exc:
             logger.exception("Error validating file size: %s", exc)
             raise HTTPException(
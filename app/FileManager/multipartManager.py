@@ -0,0 +1,400 @@
+"""
+Resumable, parallel multipart uploads.
+
+The client declares the total size when it starts a session, which fixes the
+layout of the segmented ciphertext file up front: the staged file is created
+with its header and final length, and every part covers a fixed run of
+segments at a known offset. Parts can therefore arrive in any order (and in
+parallel), each one is hashed and encrypted straight into its own region as it
+streams in, and completing the session needs no copy or reassembly, only a
+rename once the plaintext hash has been computed.
+
+Parts are staged on local disk (they are written at arbitrary offsets, which
+object stores cannot do) and the finished file is handed to the storage
+backend with putFile(), a plain rename for the local backend.
+
+complete() and abort() move a session out of open with a conditional UPDATE,
+so only one of them (and only one complete() call) gets to use its staged
+file. Sessions still open UPLOAD_SESSION_MAX_AGE_HOURS after they started are
+abandoned: expireSessions() aborts them and deletes their staged files, which
+are allocated at the full upload size from the start.
+"""
+
+import os
+from datetime import datetime, timedelta
+from uuid import uuid4
+from fastapi import Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from app.models.database import get_db
+from app.models.file import UploadSession, UploadPart
+from app.schemas.file import MultipartUploadCreate, MultipartUploadStatus, UploadPartResponse
+from app.FileManager.fileOperations import fileOperations, CHUNK_SIZE
+from app.FileManager.fileManager import fileManager
+from app.FileManager import retention
+from app.FileManager.storageBackend import getStorage, keyFor, staging
+from app.Encryption_Services.encryptionService import (
+    EncryptionService,
+    encrypted_size,
+    HEADER,
+    SEGMENT_SIZE,
+    TAG_SIZE,
+)
+from app.FileHash.API.HashFile import HashHandler, ALGORITHMS
+from app.config import HASH_ALGORITHM, UPLOAD_SESSION_MAX_AGE_HOURS
+from app.utils.executors import run_blocking, upload_budget, CRYPTO, DISK
+from app.utils.logger import SingletonLogger
+from app.dependencies.constants import (
+    MAX_MULTIPART_UPLOAD_SIZE_MB,
+    MULTIPART_PART_SIZE_MB,
+    UPLOAD_SESSION_OPEN,
+    UPLOAD_SESSION_COMPLETING,
+    UPLOAD_SESSION_COMPLETED,
+    UPLOAD_SESSION_ABORTED,
+    UPLOAD_SESSION_SWEEP_BATCH_SIZE,
+)
+
+logger = SingletonLogger().get_logger()
+
+# part size is a whole number of segments so parts never share a segment
+PART_SIZE = MULTIPART_PART_SIZE_MB * 1024 * 1024 // SEGMENT_SIZE * SEGMENT_SIZE
+
+
+def _moveSession(db: Session, session_id: str, from_status: str, to_status: str) -> bool:
+    """Change a session's status only if it still has from_status; False when another request changed it first."""
+    moved = db.query(UploadSession).filter(
+        UploadSession.id == session_id,
+        UploadSession.status == from_status
+    ).update({UploadSession.status: to_status}, synchronize_session=False)
+    db.commit()
+    return moved == 1
+
+
+def _closeSession(db: Session, session: UploadSession, from_status: str) -> bool:
+    """Abort a session still in from_status: forget its parts and delete its staged file."""
+    if not _moveSession(db, session.id, from_status, UPLOAD_SESSION_ABORTED):
+        return False
+    db.query(UploadPart).filter(UploadPart.session_id == session.id).delete()
+    db.commit()
+    staging.delete(keyFor(session.file_path))
+    return True
+
+
+def expireSessions(
+        db: Session,
+        max_age_hours: float = UPLOAD_SESSION_MAX_AGE_HOURS,
+        batch_size: int = UPLOAD_SESSION_SWEEP_BATCH_SIZE,
+        now: datetime | None = None
+    ) -> dict:
+    """
+    Abort the sessions still open max_age_hours after they started and delete their staged files.
+
+    Returns:
+        dict: sessions aborted and staged bytes freed
+    """
+    cutoff = (now or datetime.utcnow()) - timedelta(hours=max_age_hours)
+    stats = {"aborted": 0, "bytes_freed": 0}
+    after_id = ""
+    while True:
+        sessions = db.query(UploadSession).filter(
+            UploadSession.status == UPLOAD_SESSION_OPEN,
+            UploadSession.created_at < cutoff,
+            UploadSession.id > after_id
+        ).order_by(UploadSession.id).limit(batch_size).all()
+        if not sessions:
+            return stats
+        after_id = sessions[-1].id
+        for session in sessions:
+            if not _closeSession(db, session, UPLOAD_SESSION_OPEN):
+                # completed or aborted meanwhile
+                continue
+            stats["aborted"] += 1
+            stats["bytes_freed"] += encrypted_size(session.total_size)
+            logger.info("Multipart upload %s of user %s abandoned since %s, aborted",
+                        session.id, session.user_id, session.created_at)
+        if len(sessions) < batch_size:
+            return stats
+
+
+class PartWriter:
+    """Hashes and encrypts one part's plaintext into its region of the staged file."""
+    def __init__(self, file_path: str, offset: int, encryptor):
+        self.hasher = HashHandler()
+        self.size = 0
+        self._encryptor = encryptor
+        self._file = open(file_path, "r+b")
+        self._file.seek(offset)
+
+    def write(self, chunk: bytes) -> None:
+        self.hasher.update(chunk)
+        self.size += len(chunk)
+        self._file.write(self._encryptor.update(chunk))
+
+    def close(self, last: bool) -> None:
+        self._file.write(self._encryptor.finalize(last=last))
+        self._file.close()
+
+    def abort(self) -> None:
+        self._file.close()
+
+
+class multipartManager:
+    def __init__(self, db: Session = Depends(get_db)):
+        self.db = db
+
+    @staticmethod
+    def partCount(session: UploadSession) -> int:
+        return max(-(-session.total_size // session.part_size), 1)
+
+    @staticmethod
+    def partSize(session: UploadSession, part_number: int) -> int:
+        """Exact plaintext size part_number (1 based) must have."""
+        if part_number < multipartManager.partCount(session):
+            return session.part_size
+        return session.total_size - (part_number - 1) * session.part_size
+
+    def _status(self, session: UploadSession) -> MultipartUploadStatus:
+        parts = self.db.query(UploadPart).filter(
+            UploadPart.session_id == session.id
+        ).order_by(UploadPart.part_number).all()
+        return MultipartUploadStatus(
+            upload_id=session.id,
+            filename=session.filename,
+            total_size=session.total_size,
+            part_size=session.part_size,
+            part_count=self.partCount(session),
+            status=session.status,
+            parts=[UploadPartResponse.model_validate(p) for p in parts]
+        )
+
+    def _getSession(self, upload_id: str, user_id: str, require_open: bool = True) -> UploadSession:
+        session = self.db.query(UploadSession).filter(
+            UploadSession.id == upload_id,
+            UploadSession.user_id == user_id
+        ).first()
+        if not session:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload session not found")
+        if require_open and session.status != UPLOAD_SESSION_OPEN:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Upload session is {session.status}")
+        return session
+
+    def _createSession(self, user_id: str, request: MultipartUploadCreate) -> MultipartUploadStatus:
+        if request.total_size < 0 or request.total_size > MAX_MULTIPART_UPLOAD_SIZE_MB * 1024 * 1024:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"File exceeds max allowed size of {MAX_MULTIPART_UPLOAD_SIZE_MB} MB",
+            )
+
+        hash_algorithm = request.hash_algorithm or HASH_ALGORITHM
+        if hash_algorithm not in ALGORITHMS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unsupported hash algorithm, use one of: {', '.join(ALGORITHMS)}"
+            )
+        # a fresh encryptor gives us the session's nonce prefix, header and wrapped data key
+        encryptor = EncryptionService.stream_encryptor(user_id=user_id, db=self.db)
+        _, file_path = fileOperations.build_path(request.filename, user_id)
+        staged_path = file_path + ".part"
+        os.makedirs(os.path.dirname(staged_path), exist_ok=True)
+        with open(staged_path, "wb") as f:
+            f.write(encryptor.header)
+            f.truncate(encrypted_size(request.total_size))
+
+        session = UploadSession(
+            id=str(uuid4()),
+            user_id=user_id,
+            filename=request.filename,
+            file_path=staged_path,
+            total_size=request.total_size,
+            part_size=PART_SIZE,
+            nonce=encryptor.nonce.hex(),
+            wrapped_key=encryptor.wrapped_key,
+            key_version=encryptor.key_version,
+            expected_hash=request.file_hash,
+            hash_algorithm=hash_algorithm,
+            ttl_seconds=request.ttl_seconds,
+            status=UPLOAD_SESSION_OPEN
+        )
+        self.db.add(session)
+        self.db.commit()
+        self.db.refresh(session)
+        logger.info("Multipart upload %s started by user %s (%d bytes)", session.id, user_id, session.total_size)
+        return self._status(session)
+
+    def _forgetPart(self, session_id: str, part_number: int) -> None:
+        # a re-sent part overwrites its region, so it no longer counts as received until it finishes
+        self.db.query(UploadPart).filter(
+            UploadPart.session_id == session_id,
+            UploadPart.part_number == part_number
+        ).delete()
+        self.db.commit()
+
+    def _recordPart(self, session_id: str, part_number: int, size: int, sha256: str) -> UploadPart:
+        part = UploadPart(session_id=session_id, part_number=part_number, size=size, sha256=sha256)
+        self.db.merge(part)
+        self.db.commit()
+        return part
+
+    @staticmethod
+    def _hashStaged(reader, algorithm: str | None) -> str:
+        hasher = HashHandler(algorithm=algorithm)
+        for chunk in reader.iter_range():
+            hasher.update(chunk)
+        return hasher.hexdigest()
+
+    async def initiate(self, user_id: str, request: MultipartUploadCreate) -> MultipartUploadStatus:
+        return await run_blocking(DISK, self._createSession, user_id, request)
+
+    async def status(self, user_id: str, upload_id: str) -> MultipartUploadStatus:
+        session = await run_blocking(DISK, self._getSession, upload_id, user_id, False)
+        return await run_blocking(DISK, self._status, session)
+
+    async def uploadPart(self, user_id: str, upload_id: str, part_number: int, body, expected_sha256: str | None = None):
+        """
+        Stream one part's plaintext from body (an async iterator of bytes) into the staged file.
+
+        Raises:
+            HTTPException: Unknown part number, wrong part size or hash mismatch.
+        """
+        session = await run_blocking(DISK, self._getSession, upload_id, user_id)
+        part_count = self.partCount(session)
+        if not 1 <= part_number <= part_count:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Part number must be between 1 and {part_count}"
+            )
+
+        expected_size = self.partSize(session, part_number)
+        first_segment = (part_number - 1) * (session.part_size // SEGMENT_SIZE)
+        offset = HEADER.size + first_segment * (SEGMENT_SIZE + TAG_SIZE)
+
+        await run_blocking(DISK, self._forgetPart, session.id, part_number)
+        async with upload_budget.reserve(expected_size):
+            encryptor = await run_blocking(
+                DISK,
+                EncryptionService.part_encryptor,
+                user_id,
+                self.db,
+                bytes.fromhex(session.nonce),
+                first_segment,
+                session.wrapped_key,
+                session.key_version
+            )
+            writer = await run_blocking(DISK, PartWriter, session.file_path, offset, encryptor)
+            try:
+                buffer = bytearray()
+                async for chunk in body:
+                    buffer += chunk
+                    if writer.size + len(buffer) > expected_size:
+                        raise HTTPException(
+                            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"Part {part_number} must be {expected_size} bytes"
+                        )
+                    if len(buffer) >= CHUNK_SIZE:
+                        await run_blocking(CRYPTO, writer.write, bytes(buffer))
+                        buffer.clear()
+                if buffer:
+                    await run_blocking(CRYPTO, writer.write, bytes(buffer))
+
+                if writer.size != expected_size:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail=f"Part {part_number} must be {expected_size} bytes, got {writer.size}"
+                    )
+                await run_blocking(CRYPTO, writer.close, part_number == part_count)
+            except BaseException:
+                writer.abort()
+                raise
+
+        sha256 = writer.hasher.hexdigest()
+        if expected_sha256 and expected_sha256.lower() != sha256:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Part hash does not match")
+
+        part = await run_blocking(DISK, self._recordPart, session.id, part_number, writer.size, sha256)
+        return UploadPartResponse.model_validate(part)
+
+    async def complete(self, user_id: str, upload_id: str) -> dict:
+        """
+        Check every part arrived, hash the plaintext and turn the staged file into a stored file + FileModel row.
+
+        The session is moved to completing first; a concurrent call gets a 409. If the
+        upload turns out incomplete or its hash doesn't match, the session is open again.
+        If recording the file fails after the staged file was handed to storage, the
+        stored copy is gone too (recordUpload removes it) and the session is aborted.
+        """
+        session = await run_blocking(DISK, self._getSession, upload_id, user_id)
+        if not await run_blocking(DISK, _moveSession, self.db, session.id, UPLOAD_SESSION_OPEN, UPLOAD_SESSION_COMPLETING):
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Upload session is no longer open")
+
+        try:
+            upload = await run_blocking(DISK, self._status, session)
+            received = {p.part_number for p in upload.parts}
+            missing = [n for n in range(1, upload.part_count + 1) if n not in received]
+            if missing:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail={"message": "Upload is missing parts", "missing_parts": missing[:100]}
+                )
+
+            nonce = bytes.fromhex(session.nonce)
+            reader = await run_blocking(
+                DISK,
+                EncryptionService.open_reader,
+                session.file_path,
+                user_id,
+                self.db,
+                nonce,
+                session.wrapped_key,
+                session.key_version,
+                staging
+            )
+            file_hash = await run_blocking(CRYPTO, self._hashStaged, reader, session.hash_algorithm)
+            if session.expected_hash and session.expected_hash.lower() != file_hash:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="File hash does not match")
+
+            file_path = session.file_path[:-len(".part")]
+            await run_blocking(DISK, getStorage().putFile, keyFor(file_path), session.file_path)
+        except BaseException:
+            # the staged file is untouched, parts can be re-sent and completion retried
+            self.db.rollback()
+            await run_blocking(DISK, _moveSession, self.db, session.id, UPLOAD_SESSION_COMPLETING, UPLOAD_SESSION_OPEN)
+            raise
+
+        try:
+            expires_at = await run_blocking(DISK, retention.expiryFor, self.db, user_id, session.ttl_seconds)
+            # flushed together with the FileModel row in recordUpload's commit
+            session.status = UPLOAD_SESSION_COMPLETED
+            new_file = await run_blocking(
+                DISK,
+                fileManager(db=self.db).recordUpload,
+                user_id,
+                session.filename,
+                file_path,
+                file_hash,
+                nonce,
+                session.total_size,
+                session.wrapped_key,
+                session.key_version,
+                hash_algorithm=session.hash_algorithm,
+                expires_at=expires_at
+            )
+        except BaseException:
+            # nothing left to retry with, don't leave the session stuck in completing
+            self.db.rollback()
+            await run_blocking(DISK, _closeSession, self.db, session, UPLOAD_SESSION_COMPLETING)
+            logger.exception("Multipart upload %s failed to record its file, aborted", upload_id)
+            raise
+        logger.info("Multipart upload %s completed as file %s", upload_id, new_file.id)
+        return {
+            "id": new_file.id,
+            "filename": os.path.basename(new_file.file_path),
+            "file_path": new_file.file_path,
+            "file_hash": new_file.file_hash,
+        }
+
+    def _abort(self, user_id: str, upload_id: str) -> None:
+        session = self._getSession(upload_id, user_id)
+        if not _closeSession(self.db, session, UPLOAD_SESSION_OPEN):
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Upload session is no longer open")
+
+    async def abort(self, user_id: str, upload_id: str) -> None:
+        await run_blocking(DISK, self._abort, user_id, upload_id)
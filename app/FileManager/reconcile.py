@@ -0,0 +1,236 @@
+"""
+Reconciliation between stored files and the files table.
+
+Rows get deleted without their stored file and stored files get deleted
+without their rows, so the two drift apart: orphaned files waste space and
+rows without a file fail on download. A run compares the two in one pass:
+
+    storage   listSorted(), every stored key in string order
+    files     FileModel rows ordered by file_path (keyset-paginated), whose
+              keys sort the same way since every path is FILE_STORAGE_DIR/<key>
+
+and merge-joins them, so it is O(n) and holds one batch in memory whatever
+the size of either side. Keys only on the storage side are orphaned files,
+keys only in the table are rows whose file is missing. Both are recorded
+(ReconcileOrphan) and, when the run has fix set, deleted: orphaned files from
+storage, dangling rows through releaseFiles so blob ref counts stay right.
+
+A storage migration interrupted between moving a batch and committing its new
+paths (storagePath.migrateFlatFiles) leaves files at their sharded key whose
+rows still hold the flat path. resolve() finds those on reads, and the join
+does the same before calling anything an orphan or a dangling row: a sharded
+file with a row at its flat path, or a flat row whose file is at its sharded
+key, is neither.
+
+Progress is committed every RECONCILE_BATCH_SIZE keys with the last key
+compared as the checkpoint, and a run resumes from it. Files and rows younger
+than RECONCILE_GRACE_SECONDS are left alone: an upload writes its file before
+its row, so a new file without a row may simply not be committed yet.
+"""
+
+import os
+import time
+from datetime import datetime, timedelta
+from itertools import groupby
+from uuid import uuid4
+from sqlalchemy import and_, delete, or_
+from sqlalchemy.orm import Session
+from app.config import RECONCILE_GRACE_SECONDS
+from app.models.file import FileModel, BlobModel
+from app.models.reconcile import ReconcileRun, ReconcileOrphan
+from app.FileManager import storagePath
+from app.FileManager.blobStore import releaseFiles
+from app.FileManager.storageBackend import StorageBackend, getStorage, keyFor, pathForKey
+from app.utils.logger import SingletonLogger
+from app.dependencies.constants import (
+    RECONCILE_BATCH_SIZE,
+    RECONCILE_PENDING,
+    RECONCILE_RUNNING,
+    RECONCILE_COMPLETED,
+    RECONCILE_FAILED,
+    RECONCILE_ORPHAN_FILE,
+    RECONCILE_ORPHAN_ROW,
+)
+
+logger = SingletonLogger().get_logger()
+
+
+def createRun(db: Session, fix: bool = False) -> ReconcileRun:
+    run = ReconcileRun(id=str(uuid4()), status=RECONCILE_PENDING, fix=fix)
+    db.add(run)
+    db.commit()
+    db.refresh(run)
+    logger.info("Reconcile run %s created (fix=%s)", run.id, fix)
+    return run
+
+
+def _pathColumn(db: Session):
+    # keys are compared as plain strings, Postgres must not order by a locale collation
+    if db.bind.dialect.name == "postgresql":
+        return FileModel.file_path.collate("C")
+    return FileModel.file_path
+
+
+def _rows(db: Session, start_after: str, batch_size: int):
+    """FileModel rows under the storage root with a key after start_after, in key order."""
+    path = _pathColumn(db)
+    root = storagePath.STORAGE_ROOT.rstrip(os.sep) + os.sep
+    after = path > (pathForKey(start_after) if start_after else root)
+    while True:
+        rows = db.query(FileModel.id, FileModel.file_path, FileModel.blob_id, FileModel.created_at).filter(
+            FileModel.file_path.startswith(root, autoescape=True),
+            after
+        ).order_by(path, FileModel.id).limit(batch_size).all()
+        yield from rows
+        if len(rows) < batch_size:
+            return
+        last = rows[-1]
+        after = or_(path > last.file_path, and_(path == last.file_path, FileModel.id > last.id))
+
+
+def _migratedKey(key: str) -> str | None:
+    """The sharded key migrateFlatFiles() moves a flat key to, None for keys that aren't flat."""
+    if "/" in key:
+        return None
+    return keyFor(os.path.join(storagePath.shardFor(key), key))
+
+
+def _hasFlatRow(db: Session, key: str) -> bool:
+    # a sharded file whose row still has the flat path its migration moved it from
+    name = key.rsplit("/", 1)[-1]
+    if _migratedKey(name) != key:
+        return False
+    return db.query(FileModel.id).filter(FileModel.file_path == pathForKey(name)).first() is not None
+
+
+def _flush(db: Session, run: ReconcileRun, storage: StorageBackend, orphans: list, dangling: list, last_key: str):
+    if run.fix:
+        if orphans:
+            storage.deleteMany([orphan.key for orphan in orphans])
+            # a blob row left behind would let a new upload dedup onto the deleted file
+            db.execute(
+                delete(BlobModel)
+                .where(BlobModel.file_path.in_([pathForKey(orphan.key) for orphan in orphans]))
+                .execution_options(synchronize_session=False)
+            )
+        if dangling:
+            releaseFiles(db, dangling)
+        for orphan in orphans:
+            orphan.fixed = True
+        run.fixed += len(orphans) + len(dangling)
+    db.add_all(orphans)
+    db.add_all(
+        ReconcileOrphan(run_id=run.id, kind=RECONCILE_ORPHAN_ROW, key=keyFor(row.file_path), file_id=row.id, fixed=run.fix)
+        for row in dangling
+    )
+    run.last_key = last_key
+    db.commit()
+
+
+def runReconcile(
+        db: Session,
+        run_id: str,
+        storage: StorageBackend | None = None,
+        batch_size: int = RECONCILE_BATCH_SIZE
+    ) -> ReconcileRun | None:
+    """Merge-join storage against the files table from the run's checkpoint. Safe to call again to resume."""
+    run = db.query(ReconcileRun).filter(ReconcileRun.id == run_id).first()
+    if run is None or run.status == RECONCILE_COMPLETED:
+        return run
+    storage = storage or getStorage()
+    run.status = RECONCILE_RUNNING
+    run.error = None
+    db.commit()
+
+    # rows store naive UTC, stored mtimes are epoch seconds
+    cutoff = datetime.utcnow() - timedelta(seconds=RECONCILE_GRACE_SECONDS)
+    mtime_cutoff = time.time() - RECONCILE_GRACE_SECONDS
+    orphans, dangling, compared = [], [], 0
+    try:
+        stored_files = storage.listSorted(run.last_key)
+        row_groups = groupby(_rows(db, run.last_key, batch_size), key=lambda row: keyFor(row.file_path))
+        stored = next(stored_files, None)
+        key, rows = next(row_groups, (None, None))
+
+        while stored is not None or key is not None:
+            if key is None or (stored is not None and stored.key < key):
+                # stored file nothing points at
+                run.stored_files += 1
+                current = stored.key
+                if stored.mtime < mtime_cutoff and not _hasFlatRow(db, stored.key):
+                    orphans.append(ReconcileOrphan(
+                        run_id=run.id, kind=RECONCILE_ORPHAN_FILE, key=stored.key, size_bytes=stored.size
+                    ))
+                    run.orphaned_files += 1
+                    run.orphaned_bytes += stored.size
+                stored = next(stored_files, None)
+            else:
+                rows = list(rows)
+                run.file_rows += len(rows)
+                current = key
+                if stored is not None and stored.key == key:
+                    run.stored_files += 1
+                    stored = next(stored_files, None)
+                else:
+                    # rows whose stored file is gone
+                    missing = [row for row in rows if row.created_at is None or row.created_at < cutoff]
+                    moved = _migratedKey(key)
+                    if missing and moved is not None and storage.stat(moved) is not None:
+                        # flat path of a file the storage migration moved, resolve() still finds it
+                        missing = []
+                    dangling += missing
+                    run.missing_files += len(missing)
+                key, rows = next(row_groups, (None, None))
+
+            compared += 1
+            if compared % batch_size == 0:
+                # nothing sorting at or before current is left on either side, so it is a safe checkpoint
+                _flush(db, run, storage, orphans, dangling, current)
+                orphans, dangling = [], []
+        if compared:
+            _flush(db, run, storage, orphans, dangling, current)
+    except Exception as e:
+        db.rollback()
+        run.status = RECONCILE_FAILED
+        run.error = str(e)
+        db.commit()
+        logger.exception("Reconcile run %s stopped after key %r", run.id, run.last_key)
+        return run
+
+    run.status = RECONCILE_COMPLETED
+    run.finished_at = datetime.utcnow()
+    db.commit()
+    logger.info(
+        "Reconcile run %s completed: %d stored files, %d rows, %d orphaned files (%d bytes), %d missing files, %d fixed",
+        run.id, run.stored_files, run.file_rows, run.orphaned_files, run.orphaned_bytes, run.missing_files, run.fixed
+    )
+    return run
+
+
+def runReport(db: Session, run_id: str, limit: int = 100, offset: int = 0) -> dict | None:
+    """Totals of a run and a page of what it found."""
+    run = db.query(ReconcileRun).filter(ReconcileRun.id == run_id).first()
+    if run is None:
+        return None
+    found = db.query(ReconcileOrphan).filter(ReconcileOrphan.run_id == run_id).order_by(
+        ReconcileOrphan.id
+    ).limit(limit).offset(offset).all()
+    return {
+        "run_id": run.id,
+        "status": run.status,
+        "fix": run.fix,
+        "last_key": run.last_key,
+        "stored_files": run.stored_files,
+        "file_rows": run.file_rows,
+        "orphaned_files": run.orphaned_files,
+        "orphaned_bytes": run.orphaned_bytes,
+        "missing_files": run.missing_files,
+        "fixed": run.fixed,
+        "error": run.error,
+        "created_at": run.created_at,
+        "finished_at": run.finished_at,
+        "orphans": [
+            {"kind": o.kind, "key": o.key, "file_id": o.file_id, "size_bytes": o.size_bytes, "fixed": o.fixed}
+            for o in found
+        ],
+    }
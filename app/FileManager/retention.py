@@ -0,0 +1,133 @@
+"""
+Per-file retention.
+
+Every FileModel row gets an expires_at when it is created:
+
+    1. the TTL sent with the upload, if any
+    2. otherwise the user's retention policy (UserModel.retention_hours)
+    3. otherwise FILE_RETENTION_HOURS
+
+A retention of 0 hours means the file is kept until deleted (expires_at is
+None). The file_cleanup task then removes exactly the rows whose expires_at
+has passed, found by a range scan of the expires_at index in bounded
+batches, so its cost grows with the number of expiring files rather than
+with everything stored. Stored bytes go once their blob loses its last
+reference (blobStore.releaseFiles).
+"""
+
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+from app.config import FILE_RETENTION_HOURS, CLEANUP_DELETES_PER_SECOND, CLEANUP_WORKERS
+from app.models.database import SessionLocal
+from app.models.file import FileModel
+from app.models.user import UserModel
+from app.FileManager.blobStore import releaseFiles
+from app.utils.throttle import RateLimiter
+from app.utils.logger import SingletonLogger
+from app.dependencies.constants import RETENTION_BATCH_SIZE
+
+logger = SingletonLogger().get_logger()
+
+
+def expiryFor(db: Session, user_id: str, ttl_seconds: int | None = None, now: datetime | None = None) -> datetime | None:
+    """expires_at for a new file of user_id, None if it is kept forever."""
+    now = now or datetime.utcnow()
+    if ttl_seconds:
+        return now + timedelta(seconds=ttl_seconds)
+    retention_hours = db.query(UserModel.retention_hours).filter(UserModel.id == user_id).scalar()
+    if retention_hours is None:
+        retention_hours = FILE_RETENTION_HOURS
+    if retention_hours <= 0:
+        return None
+    return now + timedelta(hours=retention_hours)
+
+
+def setUserRetention(db: Session, user_id: str, retention_hours: int | None) -> None:
+    """Set the user's default retention for future uploads; None falls back to FILE_RETENTION_HOURS."""
+    db.query(UserModel).filter(UserModel.id == user_id).update({UserModel.retention_hours: retention_hours})
+    db.commit()
+
+
+def _expired(query, now: datetime, user_id: str | None):
+    query = query.filter(FileModel.expires_at.is_not(None), FileModel.expires_at <= now)
+    if user_id is not None:
+        query = query.filter(FileModel.user_id == user_id)
+    return query
+
+
+def _expiredBatch(db: Session, now: datetime, batch_size: int, user_id: str | None = None) -> list[FileModel]:
+    return _expired(db.query(FileModel), now, user_id).order_by(FileModel.expires_at).limit(batch_size).all()
+
+
+def expireFiles(
+        now: datetime | None = None,
+        dry_run: bool = False,
+        batch_size: int = RETENTION_BATCH_SIZE,
+        deletes_per_second: float = CLEANUP_DELETES_PER_SECOND,
+        workers: int = CLEANUP_WORKERS,
+        session_factory=SessionLocal,
+        user_id: str | None = None
+    ) -> dict:
+    """
+    Remove every file whose expires_at is before now, one committed batch at a time.
+
+    With user_id only that user's files are removed (a file_cleanup task only
+    ever cleans up after the user who scheduled it); None is every user's,
+    for admin_cli.
+
+    Returns:
+        dict: expired (rows removed), deleted (stored files removed), bytes_freed,
+        batches, duration_seconds and dry_run
+    """
+    now = now or datetime.utcnow()
+    limiter = RateLimiter(deletes_per_second, burst=max(batch_size, deletes_per_second))
+    stats = {"expired": 0, "deleted": 0, "bytes_freed": 0, "batches": 0, "duration_seconds": 0.0, "dry_run": dry_run}
+    started = time.perf_counter()
+
+    with session_factory() as db:
+        if dry_run:
+            expired, size = _expired(
+                db.query(func.count(FileModel.id), func.coalesce(func.sum(FileModel.size_bytes), 0)), now, user_id
+            ).one()
+            stats["expired"] = expired
+            stats["bytes_freed"] = int(size)
+        else:
+            while files := _expiredBatch(db, now, batch_size, user_id):
+                limiter.consume(len(files))
+                sizes = {file.file_path: file.size_bytes or 0 for file in files}
+                removed = releaseFiles(db, files, workers)
+                stats["expired"] += len(files)
+                stats["deleted"] += len(removed)
+                stats["bytes_freed"] += sum(sizes.get(path, 0) for path in removed)
+                stats["batches"] += 1
+                # the deleted rows are still in the identity map, don't let it grow with the run
+                db.expunge_all()
+
+    stats["duration_seconds"] = round(time.perf_counter() - started, 3)
+    logger.info(
+        "Retention%s: %d files expired, %d stored files removed (%d bytes) in %.1fs",
+        " (dry run)" if dry_run else "",
+        stats["expired"], stats["deleted"], stats["bytes_freed"], stats["duration_seconds"]
+    )
+    return stats
+
+
+def backfillExpiry(db: Session, retention_hours: float = FILE_RETENTION_HOURS, now: datetime | None = None) -> int:
+    """
+    Give rows stored before retention existed (expires_at is None) an expiry retention_hours from now.
+
+    Only meant to be run once after upgrading, since None otherwise means "keep forever".
+    """
+    if retention_hours <= 0:
+        return 0
+    expires_at = (now or datetime.utcnow()) + timedelta(hours=retention_hours)
+    updated = db.execute(
+        update(FileModel)
+        .where(FileModel.expires_at.is_(None))
+        .values(expires_at=expires_at)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return updated
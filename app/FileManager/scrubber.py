@@ -0,0 +1,241 @@
+"""
+Background integrity scrubber for stored files.
+
+Every FileModel row is stream-verified: its ciphertext is decrypted segment
+by segment, which checks each AES-GCM tag, then decompressed when it was
+stored compressed and hashed with the algorithm its file_hash was recorded
+with. Nothing is kept in memory beyond one segment.
+
+Rows are walked in id order in keyset-paginated batches and the run's
+checkpoint (last_file_id) is committed after every batch, and after any file
+once SCRUB_HEARTBEAT_SECONDS have passed since the last commit, so an
+interrupted run resumes where it stopped. Reads go through a RateLimiter set to
+SCRUB_BYTES_PER_SECOND, which caps the disk bandwidth the scrubber takes away
+from API traffic. Rows sharing a dedup blob in a batch are verified once.
+
+Only files that fail are recorded (ScrubResult), with the run keeping totals.
+
+A worker claims a run with a conditional UPDATE before scrubbing it, so a run
+is only ever scrubbed by one worker. Runs that are pending or failed can be
+claimed, and so can a running one whose checkpoint hasn't moved for
+SCRUB_STALE_SECONDS (its worker died). Committing the checkpoint moves
+updated_at, which is why a long batch checkpoints as it goes.
+"""
+
+import time
+from datetime import datetime, timedelta
+from uuid import uuid4
+from cryptography.exceptions import InvalidTag
+from sqlalchemy import and_, or_, update
+from sqlalchemy.orm import Session
+from app.config import SCRUB_BYTES_PER_SECOND, SCRUB_STALE_SECONDS
+from app.models.file import FileModel
+from app.models.scrub import ScrubRun, ScrubResult
+from app.Encryption_Services.encryptionService import EncryptionService
+from app.FileManager import compression
+from app.FileManager.storageBackend import getStorage, keyFor
+from app.FileHash.API.HashFile import HashHandler
+from app.utils.throttle import RateLimiter
+from app.utils.logger import SingletonLogger
+from app.dependencies.constants import (
+    SCRUB_BATCH_SIZE,
+    SCRUB_HEARTBEAT_SECONDS,
+    SCRUB_PENDING,
+    SCRUB_RUNNING,
+    SCRUB_COMPLETED,
+    SCRUB_FAILED,
+    SCRUB_FILE_MISSING,
+    SCRUB_FILE_CORRUPT,
+    SCRUB_FILE_HASH_MISMATCH,
+    SCRUB_FILE_ERROR,
+)
+
+logger = SingletonLogger().get_logger()
+
+
+def activeRun(db: Session) -> ScrubRun | None:
+    return db.query(ScrubRun).filter(
+        ScrubRun.status.in_((SCRUB_PENDING, SCRUB_RUNNING))
+    ).order_by(ScrubRun.created_at.desc()).first()
+
+
+def createRun(db: Session) -> tuple[ScrubRun, bool]:
+    """
+    Start a new run, or return the one still in progress (runs never overlap).
+
+    Returns:
+        tuple: (the run, whether it was created by this call)
+    """
+    run = activeRun(db)
+    if run is not None:
+        return run, False
+    run = ScrubRun(id=str(uuid4()), status=SCRUB_PENDING)
+    db.add(run)
+    db.commit()
+    db.refresh(run)
+    logger.info("Scrub run %s created", run.id)
+    return run, True
+
+
+def _claimable(now: datetime):
+    stale = now - timedelta(seconds=SCRUB_STALE_SECONDS)
+    return or_(
+        ScrubRun.status.in_((SCRUB_PENDING, SCRUB_FAILED)),
+        and_(ScrubRun.status == SCRUB_RUNNING, ScrubRun.updated_at < stale)
+    )
+
+
+def canResume(db: Session, run_id: str) -> bool:
+    """Whether runScrub would pick the run up: it is pending, failed, or running with a stale checkpoint."""
+    return db.query(ScrubRun.id).filter(ScrubRun.id == run_id, _claimable(datetime.utcnow())).first() is not None
+
+
+def _throttled(chunks, limiter: RateLimiter):
+    # segments are read from storage lazily, so pacing their consumption paces the disk
+    for chunk in chunks:
+        limiter.consume(len(chunk))
+        yield chunk
+
+
+def verifyFile(db: Session, file: FileModel, limiter: RateLimiter) -> tuple[str | None, str | None, int]:
+    """
+    Decrypt and hash one stored file under the rate limit.
+
+    Returns:
+        tuple: (failure status or None if the file verified, detail, stored bytes read)
+    """
+    stored = getStorage().stat(keyFor(file.file_path))
+    if stored is None:
+        return SCRUB_FILE_MISSING, "Stored file not found", 0
+
+    try:
+        reader = EncryptionService.open_reader(
+            file_path=file.file_path,
+            user_id=str(file.user_id),
+            db=db,
+            nonce=bytes.fromhex(file.nonce),
+            wrapped_key=file.wrapped_key,
+            key_version=file.key_version
+        )
+        hasher = HashHandler(algorithm=file.hash_algorithm)
+        for chunk in compression.decompressStream(file.codec, _throttled(reader.iter_range(), limiter)):
+            hasher.update(chunk)
+    except InvalidTag:
+        return SCRUB_FILE_CORRUPT, "Authentication tag mismatch", stored.size
+    except FileNotFoundError:
+        return SCRUB_FILE_MISSING, "Stored file not found", 0
+    except ValueError as e:
+        # truncated segmented files and legacy files that fail to decrypt
+        return SCRUB_FILE_CORRUPT, str(e), stored.size
+    except Exception as e:
+        return SCRUB_FILE_ERROR, f"{type(e).__name__}: {e}", stored.size
+
+    if file.file_hash and hasher.hexdigest() != file.file_hash.lower():
+        return SCRUB_FILE_HASH_MISMATCH, f"Plaintext hashes to {hasher.hexdigest()}", stored.size
+    return None, None, stored.size
+
+
+def _nextBatch(db: Session, after_id: str) -> list[FileModel]:
+    return db.query(FileModel).filter(FileModel.id > after_id).order_by(FileModel.id).limit(SCRUB_BATCH_SIZE).all()
+
+
+def runScrub(db: Session, run_id: str, limiter: RateLimiter | None = None) -> ScrubRun | None:
+    """
+    Verify every file after the run's checkpoint, committing progress per batch (or sooner, see
+    SCRUB_HEARTBEAT_SECONDS). Safe to call again to resume.
+
+    Returns the run untouched when another worker holds it or it has completed.
+    """
+    now = datetime.utcnow()
+    claimed = db.execute(
+        update(ScrubRun)
+        .where(ScrubRun.id == run_id, _claimable(now))
+        .values(status=SCRUB_RUNNING, error=None, updated_at=now)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    run = db.query(ScrubRun).filter(ScrubRun.id == run_id).first()
+    if claimed != 1:
+        if run is not None and run.status != SCRUB_COMPLETED:
+            logger.info("Scrub run %s is %s in another worker, not starting it", run.id, run.status)
+        return run
+    limiter = limiter or RateLimiter(SCRUB_BYTES_PER_SECOND)
+    committed_at = time.monotonic()
+
+    try:
+        while files := _nextBatch(db, run.last_file_id):
+            # rows sharing a blob point at the same stored file, verify it once per batch
+            outcomes = {}
+            for file in files:
+                if file.file_path not in outcomes:
+                    outcomes[file.file_path] = verifyFile(db, file, limiter)
+                    run.bytes_read += outcomes[file.file_path][2]
+                failure, detail, _ = outcomes[file.file_path]
+                if failure is not None:
+                    run.files_failed += 1
+                    db.add(ScrubResult(
+                        run_id=run.id,
+                        file_id=file.id,
+                        user_id=file.user_id,
+                        file_path=file.file_path,
+                        status=failure,
+                        detail=detail
+                    ))
+                    logger.warning("Scrub run %s: file %s %s (%s)", run.id, file.id, failure, detail)
+                run.files_checked += 1
+                run.last_file_id = file.id
+                if time.monotonic() - committed_at >= SCRUB_HEARTBEAT_SECONDS:
+                    # a batch of large files can outlast SCRUB_STALE_SECONDS, don't let the run look abandoned
+                    db.commit()
+                    committed_at = time.monotonic()
+            db.commit()
+            committed_at = time.monotonic()
+    except Exception as e:
+        db.rollback()
+        run.status = SCRUB_FAILED
+        run.error = str(e)
+        db.commit()
+        logger.exception("Scrub run %s stopped at file %s", run.id, run.last_file_id)
+        return run
+
+    run.status = SCRUB_COMPLETED
+    run.finished_at = datetime.utcnow()
+    db.commit()
+    logger.info(
+        "Scrub run %s completed: %d files checked, %d failed, %d bytes read",
+        run.id, run.files_checked, run.files_failed, run.bytes_read
+    )
+    return run
+
+
+def runProgress(db: Session, run_id: str, limit: int = 100, offset: int = 0) -> dict | None:
+    """Totals of a run and a page of the files that failed verification."""
+    run = db.query(ScrubRun).filter(ScrubRun.id == run_id).first()
+    if run is None:
+        return None
+    failures = db.query(ScrubResult).filter(ScrubResult.run_id == run_id).order_by(
+        ScrubResult.id
+    ).limit(limit).offset(offset).all()
+    return {
+        "run_id": run.id,
+        "status": run.status,
+        "files_checked": run.files_checked,
+        "files_failed": run.files_failed,
+        "bytes_read": run.bytes_read,
+        "last_file_id": run.last_file_id,
+        "error": run.error,
+        "created_at": run.created_at,
+        "updated_at": run.updated_at,
+        "finished_at": run.finished_at,
+        "failures": [
+            {
+                "file_id": r.file_id,
+                "user_id": r.user_id,
+                "file_path": r.file_path,
+                "status": r.status,
+                "detail": r.detail,
+                "checked_at": r.checked_at,
+            }
+            for r in failures
+        ],
+    }
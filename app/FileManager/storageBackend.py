@@ -0,0 +1,345 @@
+"""
+Storage backends for stored (encrypted) file bytes.
+
+Everything that reads or writes stored files goes through a StorageBackend so
+the API and the Celery workers no longer need to share a local volume:
+
+    LocalBackend   files under FILE_STORAGE_DIR (the default)
+    S3Backend      any S3 compatible object store (AWS, MinIO, ...), needs boto3
+
+Objects are addressed by key, the path relative to FILE_STORAGE_DIR with "/"
+separators ("ab/cd/<name>"). FileModel.file_path keeps the full logical path
+under FILE_STORAGE_DIR whatever the backend, keyFor() turns it into a key.
+
+Backend methods block. Async code calls the *Async variants, which run on the
+DISK executor (app/utils/executors.py) so routes never block the event loop.
+
+Multipart uploads still stage their .part file on local disk (parts are
+written at arbitrary offsets) and hand it over with putFile() on completion.
+"""
+
+import os
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, NamedTuple
+from app.config import (
+    STORAGE_BACKEND,
+    S3_BUCKET,
+    S3_ENDPOINT_URL,
+    S3_REGION,
+    S3_PREFIX,
+)
+from app.FileManager import storagePath
+from app.utils.executors import run_blocking, iterate_blocking, DISK
+from app.utils.logger import SingletonLogger
+
+logger = SingletonLogger().get_logger()
+
+# size of chunks yielded by getRange()
+READ_CHUNK_SIZE = 1024 * 1024
+# S3 multipart part size for putStream (S3 requires >= 5 MiB for all but the last part)
+S3_PART_SIZE = 8 * 1024 * 1024
+
+
+class StoredObject(NamedTuple):
+    key: str
+    size: int
+    mtime: float
+
+
+def keyFor(file_path: str) -> str:
+    """Storage key of a path under FILE_STORAGE_DIR (paths that are already keys pass through)."""
+    if os.path.isabs(file_path):
+        file_path = os.path.relpath(file_path, storagePath.STORAGE_ROOT)
+    return file_path.replace(os.sep, "/")
+
+
+def pathForKey(key: str) -> str:
+    """The logical FileModel.file_path of a storage key, the inverse of keyFor()."""
+    return os.path.join(storagePath.STORAGE_ROOT, *key.split("/"))
+
+
+class StorageBackend(ABC):
+    """Interface every backend implements."""
+
+    @abstractmethod
+    def putStream(self, key: str, chunks: Iterable[bytes]) -> int:
+        """Store the concatenated chunks under key, atomically. Returns the bytes written."""
+
+    @abstractmethod
+    def putFile(self, key: str, local_path: str) -> None:
+        """Move a finished local file into storage under key; local_path is gone afterwards."""
+
+    @abstractmethod
+    def getRange(self, key: str, start: int = 0, end: int | None = None) -> Iterator[bytes]:
+        """Yield the bytes of key in the inclusive range [start, end] (to the end when end is None)."""
+
+    @abstractmethod
+    def delete(self, key: str) -> bool:
+        """Remove key, False if it did not exist."""
+
+    def deleteMany(self, keys: list[str], workers: int = 8) -> list[bool]:
+        """Delete keys in parallel, returns whether each one existed."""
+        if len(keys) <= 1 or workers <= 1:
+            return [self.delete(key) for key in keys]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(self.delete, keys))
+
+    @abstractmethod
+    def list(self, prefix: str = "") -> Iterator[StoredObject]:
+        """Yield every stored object whose key starts with prefix."""
+
+    def listSorted(self, start_after: str = "") -> Iterator[StoredObject]:
+        """
+        Like list(), in key order and only keys after start_after.
+
+        Backends that can stream their listing in order override this; the
+        fallback sorts in memory.
+        """
+        return iter(sorted((stored for stored in self.list() if stored.key > start_after), key=lambda o: o.key))
+
+    @abstractmethod
+    def stat(self, key: str) -> StoredObject | None:
+        """Size and mtime of key, None if it does not exist."""
+
+    def read(self, key: str, start: int = 0, length: int | None = None) -> bytes:
+        """Ranged read into memory, for small reads such as headers."""
+        if length is not None and length <= 0:
+            return b""
+        end = None if length is None else start + length - 1
+        return b"".join(self.getRange(key, start, end))
+
+    async def statAsync(self, key: str) -> StoredObject | None:
+        return await run_blocking(DISK, self.stat, key)
+
+    async def deleteAsync(self, key: str) -> bool:
+        return await run_blocking(DISK, self.delete, key)
+
+    async def readAsync(self, key: str, start: int = 0, length: int | None = None) -> bytes:
+        return await run_blocking(DISK, self.read, key, start, length)
+
+    def getRangeAsync(self, key: str, start: int = 0, end: int | None = None):
+        """Async iterator over getRange(), each chunk is read on the DISK executor."""
+        return iterate_blocking(DISK, self.getRange(key, start, end))
+
+
+class LocalBackend(StorageBackend):
+    def __init__(self, root: str = storagePath.STORAGE_ROOT):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        # resolve() also finds flat files a storage migration has moved but not yet committed
+        return storagePath.resolve(os.path.join(self.root, *key.split("/")), self.root)
+
+    def putStream(self, key: str, chunks: Iterable[bytes]) -> int:
+        path = os.path.join(self.root, *key.split("/"))
+        tmp_path = path + storagePath.PARTIAL_SUFFIX
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        written = 0
+        try:
+            with open(tmp_path, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    written += len(chunk)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return written
+
+    def putFile(self, key: str, local_path: str) -> None:
+        path = os.path.join(self.root, *key.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(local_path, path)
+
+    def getRange(self, key: str, start: int = 0, end: int | None = None) -> Iterator[bytes]:
+        with open(self._path(key), "rb") as f:
+            f.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                chunk = f.read(READ_CHUNK_SIZE if remaining is None else min(READ_CHUNK_SIZE, remaining))
+                if not chunk:
+                    return
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def delete(self, key: str) -> bool:
+        path = self._path(key)
+        if not os.path.exists(path):
+            return False
+        os.remove(path)
+        return True
+
+    def list(self, prefix: str = "") -> Iterator[StoredObject]:
+        # only walk the directory the prefix points into
+        directory, _, _ = prefix.rpartition("/")
+        for entry in storagePath.iterStoredFiles(os.path.join(self.root, *directory.split("/")) if directory else self.root):
+            key = keyFor(os.path.relpath(entry.path, self.root))
+            if key.startswith(prefix):
+                st = entry.stat(follow_symlinks=False)
+                yield StoredObject(key, st.st_size, st.st_mtime)
+
+    def listSorted(self, start_after: str = "") -> Iterator[StoredObject]:
+        if os.path.isdir(self.root):
+            yield from self._walkSorted(self.root, "", start_after)
+
+    def _walkSorted(self, directory: str, prefix: str, start_after: str) -> Iterator[StoredObject]:
+        # one directory's listing in memory at a time; sorting directories as "name/" puts keys in string order
+        with os.scandir(directory) as entries:
+            entries = sorted(entries, key=lambda e: e.name + "/" if e.is_dir(follow_symlinks=False) else e.name)
+        for entry in entries:
+            key = prefix + entry.name
+            if entry.is_dir(follow_symlinks=False):
+                subtree = key + "/"
+                if start_after >= subtree and not start_after.startswith(subtree):
+                    # every key below sorts before start_after
+                    continue
+                yield from self._walkSorted(entry.path, subtree, start_after)
+            elif entry.is_file(follow_symlinks=False) and not entry.name.endswith(storagePath.PARTIAL_SUFFIX):
+                if key > start_after:
+                    st = entry.stat(follow_symlinks=False)
+                    yield StoredObject(key, st.st_size, st.st_mtime)
+
+    def stat(self, key: str) -> StoredObject | None:
+        try:
+            st = os.stat(self._path(key))
+        except FileNotFoundError:
+            return None
+        return StoredObject(key, st.st_size, st.st_mtime)
+
+
+class S3Backend(StorageBackend):
+    """S3 compatible object storage; endpoint_url points it at MinIO or another stand-in."""
+    def __init__(
+            self,
+            bucket: str,
+            endpoint_url: str | None = None,
+            region: str | None = None,
+            prefix: str = ""
+        ):
+        try:
+            import boto3
+        except ImportError as exc:
+            raise RuntimeError("STORAGE_BACKEND=s3 requires the boto3 package") from exc
+        # credentials come from the usual AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY chain
+        self.client = boto3.client("s3", endpoint_url=endpoint_url, region_name=region)
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+
+    def _key(self, key: str) -> str:
+        return self.prefix + key
+
+    def putStream(self, key: str, chunks: Iterable[bytes]) -> int:
+        buffer = bytearray()
+        upload_id = None
+        parts = []
+        written = 0
+        try:
+            for chunk in chunks:
+                buffer += chunk
+                written += len(chunk)
+                while len(buffer) >= S3_PART_SIZE:
+                    if upload_id is None:
+                        upload_id = self.client.create_multipart_upload(
+                            Bucket=self.bucket, Key=self._key(key)
+                        )["UploadId"]
+                    body = bytes(buffer[:S3_PART_SIZE])
+                    del buffer[:S3_PART_SIZE]
+                    part = self.client.upload_part(
+                        Bucket=self.bucket, Key=self._key(key), UploadId=upload_id,
+                        PartNumber=len(parts) + 1, Body=body
+                    )
+                    parts.append({"ETag": part["ETag"], "PartNumber": len(parts) + 1})
+
+            if upload_id is None:
+                # small object, a single request is cheaper than a multipart upload
+                self.client.put_object(Bucket=self.bucket, Key=self._key(key), Body=bytes(buffer))
+                return written
+
+            if buffer:
+                part = self.client.upload_part(
+                    Bucket=self.bucket, Key=self._key(key), UploadId=upload_id,
+                    PartNumber=len(parts) + 1, Body=bytes(buffer)
+                )
+                parts.append({"ETag": part["ETag"], "PartNumber": len(parts) + 1})
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket, Key=self._key(key), UploadId=upload_id,
+                MultipartUpload={"Parts": parts}
+            )
+            return written
+        except BaseException:
+            if upload_id is not None:
+                self.client.abort_multipart_upload(Bucket=self.bucket, Key=self._key(key), UploadId=upload_id)
+            raise
+
+    def putFile(self, key: str, local_path: str) -> None:
+        self.client.upload_file(local_path, self.bucket, self._key(key))
+        os.remove(local_path)
+
+    def getRange(self, key: str, start: int = 0, end: int | None = None) -> Iterator[bytes]:
+        byte_range = f"bytes={start}-" if end is None else f"bytes={start}-{end}"
+        response = self.client.get_object(Bucket=self.bucket, Key=self._key(key), Range=byte_range)
+        yield from response["Body"].iter_chunks(READ_CHUNK_SIZE)
+
+    def delete(self, key: str) -> bool:
+        if self.stat(key) is None:
+            return False
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+        return True
+
+    def deleteMany(self, keys: list[str], workers: int = 8) -> list[bool]:
+        # one DeleteObjects request per 1000 keys instead of a request per key;
+        # S3 doesn't say whether a key existed, only failures come back as False
+        failed = set()
+        for offset in range(0, len(keys), 1000):
+            response = self.client.delete_objects(
+                Bucket=self.bucket,
+                Delete={"Objects": [{"Key": self._key(key)} for key in keys[offset:offset + 1000]], "Quiet": True}
+            )
+            failed.update(error["Key"][len(self.prefix):] for error in response.get("Errors", []))
+        return [key not in failed for key in keys]
+
+    def list(self, prefix: str = "") -> Iterator[StoredObject]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._key(prefix)):
+            for obj in page.get("Contents", []):
+                yield StoredObject(obj["Key"][len(self.prefix):], obj["Size"], obj["LastModified"].timestamp())
+
+    def listSorted(self, start_after: str = "") -> Iterator[StoredObject]:
+        # S3 lists keys in UTF-8 byte order, which is the same as str order
+        paginator = self.client.get_paginator("list_objects_v2")
+        options = {"StartAfter": self._key(start_after)} if start_after else {}
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix, **options):
+            for obj in page.get("Contents", []):
+                yield StoredObject(obj["Key"][len(self.prefix):], obj["Size"], obj["LastModified"].timestamp())
+
+    def stat(self, key: str) -> StoredObject | None:
+        from botocore.exceptions import ClientError
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except ClientError as exc:
+            if exc.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return StoredObject(key, head["ContentLength"], head["LastModified"].timestamp())
+
+
+_storage: StorageBackend | None = None
+# multipart uploads stage their parts here before putFile()
+staging = LocalBackend(storagePath.STORAGE_ROOT)
+
+
+def getStorage() -> StorageBackend:
+    """The configured backend, created on first use."""
+    global _storage
+    if _storage is None:
+        if STORAGE_BACKEND == "s3":
+            _storage = S3Backend(S3_BUCKET, S3_ENDPOINT_URL, S3_REGION, S3_PREFIX)
+        elif STORAGE_BACKEND == "local":
+            _storage = staging
+        else:
+            raise RuntimeError(f"Unknown STORAGE_BACKEND {STORAGE_BACKEND!r}")
+        logger.info("Using %s storage backend", STORAGE_BACKEND)
+    return _storage
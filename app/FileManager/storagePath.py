@@ -0,0 +1,194 @@
+"""
+Where stored files live on disk.
+
+Files are fanned out into two levels of hash-prefixed subdirectories under
+FILE_STORAGE_DIR (``ab/cd/<name>``, 65536 leaf directories) so no single
+directory grows large enough to make lookups, renames or cleanup scans slow.
+The shard is derived from the stored filename alone, so a path can always be
+recomputed from the name.
+
+Files saved before sharding sit flat in the root; migrateFlatFiles() moves
+them and rewrites the paths stored in the database in batches. Until a file's
+row is updated, resolve() still finds it in its new location, and a later
+migration run rewrites the rows of files an interrupted one already moved.
+"""
+
+import hashlib
+import os
+from sqlalchemy import case, update
+from sqlalchemy.orm import Session
+from app.config import FILE_STORAGE_DIR
+from app.models.file import FileModel, BlobModel
+from app.utils.logger import SingletonLogger
+
+logger = SingletonLogger().get_logger()
+
+STORAGE_ROOT = FILE_STORAGE_DIR
+SHARD_DEPTH = 2
+SHARD_WIDTH = 2
+# suffix of files still being written, never moved or cleaned up by scans
+PARTIAL_SUFFIX = ".part"
+
+
+def shardFor(filename: str) -> str:
+    """Relative shard directory of a stored filename, e.g. 'ab/cd'."""
+    digest = hashlib.sha256(filename.encode()).hexdigest()
+    return os.path.join(*(digest[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH] for i in range(SHARD_DEPTH)))
+
+
+def pathFor(filename: str, root: str = STORAGE_ROOT, create: bool = True) -> str:
+    """Full sharded path for a stored filename, creating its directory unless create is False."""
+    directory = os.path.join(root, shardFor(filename))
+    if create:
+        os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, filename)
+
+
+def isSharded(file_path: str, root: str = STORAGE_ROOT) -> bool:
+    filename = os.path.basename(file_path)
+    return os.path.dirname(file_path) == os.path.join(root, shardFor(filename))
+
+
+def resolve(file_path: str, root: str = STORAGE_ROOT) -> str:
+    """
+    On-disk location of a stored path.
+
+    Falls back to the sharded location when a flat path no longer exists,
+    which happens while a migration has moved the file but not yet committed
+    the new path.
+    """
+    if os.path.exists(file_path) or isSharded(file_path, root):
+        return file_path
+    sharded = os.path.join(root, shardFor(os.path.basename(file_path)), os.path.basename(file_path))
+    return sharded if os.path.exists(sharded) else file_path
+
+
+def iterStoredFiles(root: str = STORAGE_ROOT, include_partial: bool = False):
+    """
+    Yield an os.DirEntry for every stored file under root, flat or sharded.
+
+    Uses scandir so stat information comes with the listing instead of one
+    extra syscall per file.
+    """
+    if not os.path.isdir(root):
+        return
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    if include_partial or not entry.name.endswith(PARTIAL_SUFFIX):
+                        yield entry
+
+
+def _flatFiles(root: str):
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.is_file(follow_symlinks=False) and not entry.name.endswith(PARTIAL_SUFFIX):
+                yield entry.path
+
+
+def _movePaths(db: Session, moves: list[tuple[str, str]]) -> None:
+    # one UPDATE per model for the whole batch
+    new_paths = dict(moves)
+    for model in (FileModel, BlobModel):
+        db.execute(
+            update(model)
+            .where(model.file_path.in_(list(new_paths)))
+            .values(file_path=case(new_paths, value=model.file_path))
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()
+
+
+def _like(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _flatRowPaths(db: Session, model, source: str, after: str, batch_size: int) -> list[str]:
+    """Stored paths directly in source (not in a subdirectory) after the given one, in order."""
+    prefix = _like(source.rstrip(os.sep) + os.sep)
+    rows = db.query(model.file_path).filter(
+        model.file_path.like(prefix + "%", escape="\\"),
+        ~model.file_path.like(prefix + "%" + _like(os.sep) + "%", escape="\\"),
+        model.file_path > after
+    ).distinct().order_by(model.file_path).limit(batch_size).all()
+    return [row.file_path for row in rows]
+
+
+def _repairMovedRows(db: Session, source: str, root: str, batch_size: int, dry_run: bool) -> int:
+    """
+    Rewrite the rows of files an earlier run moved without committing their new paths.
+
+    Those rows still hold a flat path that no longer exists while the file sits
+    at its sharded path. Returns how many files' paths were (or would be) rewritten.
+    """
+    repaired = set()
+    for model in (FileModel, BlobModel):
+        after = ""
+        while paths := _flatRowPaths(db, model, source, after, batch_size):
+            after = paths[-1]
+            moves = [
+                (old_path, pathFor(os.path.basename(old_path), root, create=False))
+                for old_path in paths if not os.path.exists(old_path)
+            ]
+            moves = [(old_path, new_path) for old_path, new_path in moves if os.path.exists(new_path)]
+            if moves and not dry_run:
+                _movePaths(db, moves)
+            repaired.update(old_path for old_path, _ in moves)
+            if len(paths) < batch_size:
+                break
+    return len(repaired)
+
+
+def migrateFlatFiles(
+        db: Session,
+        source: str = STORAGE_ROOT,
+        root: str = STORAGE_ROOT,
+        batch_size: int = 500,
+        dry_run: bool = False
+    ) -> dict:
+    """
+    Move files lying flat in source into the sharded layout under root.
+
+    Each batch is moved on disk first and its FileModel/BlobModel paths are
+    then updated and committed together. If that commit fails (or the process
+    dies in between) resolve() still finds the moved files, and the next run
+    first rewrites every flat path whose file is gone from source but present
+    at its sharded path. Staged ``.part`` files of uploads in progress are left
+    alone.
+
+    Returns:
+        dict: counts of moved files, rows repaired from an earlier run and committed batches
+    """
+    stats = {"moved": 0, "repaired": 0, "batches": 0, "dry_run": dry_run}
+    stats["repaired"] = _repairMovedRows(db, source, root, batch_size, dry_run)
+    if stats["repaired"]:
+        logger.info("Storage migration: rewrote %d paths left behind by an interrupted run", stats["repaired"])
+    if not os.path.isdir(source):
+        return stats
+
+    moves: list[tuple[str, str]] = []
+    for old_path in _flatFiles(source):
+        filename = os.path.basename(old_path)
+        if dry_run:
+            stats["moved"] += 1
+            continue
+        new_path = pathFor(filename, root)
+        os.replace(old_path, new_path)
+        moves.append((old_path, new_path))
+        if len(moves) >= batch_size:
+            _movePaths(db, moves)
+            stats["moved"] += len(moves)
+            stats["batches"] += 1
+            logger.info("Storage migration: %d files moved so far", stats["moved"])
+            moves = []
+
+    if moves:
+        _movePaths(db, moves)
+        stats["moved"] += len(moves)
+        stats["batches"] += 1
+    logger.info("Storage migration finished: %s", stats)
+    return stats
@@ -7,3 +7,89 @@ load_dotenv()
 
 SECRET_KEY = os.getenv("SECRET_KEY", "fallback-secret")
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite://dev.db")
+
+# root of stored uploads, the docker volume mount (app/FileManager/storagePath.py)
+FILE_STORAGE_DIR = os.getenv("FILE_STORAGE_DIR", "/app/uploads")
+
+# where stored file bytes live (app/FileManager/storageBackend.py): "local" or "s3"
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")
+S3_BUCKET = os.getenv("S3_BUCKET", "task-automation-uploads")
+# set for MinIO or other S3 compatible stores, None means AWS
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None
+S3_REGION = os.getenv("S3_REGION") or None
+S3_PREFIX = os.getenv("S3_PREFIX", "")
+
+# Compression of uploads before encryption (app/FileManager/compression.py)
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "1") not in ("0", "false", "False")
+# smaller uploads are stored as is, the saving isn't worth a codec
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "4096"))
+# bits per byte above which the first chunk is treated as incompressible (8.0 = random)
+COMPRESSION_MAX_ENTROPY = float(os.getenv("COMPRESSION_MAX_ENTROPY", "7.5"))
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", "3"))
+
+# algorithm new uploads are hashed with (app/FileHash/API/HashFile.py): sha256, blake2b or blake3
+# (blake3 needs the blake3 package). See app/scripts/benchmark_hashing.py before changing it.
+HASH_ALGORITHM = os.getenv("HASH_ALGORITHM", "sha256")
+
+# reconciliation ignores stored files and rows younger than this, an upload may be between
+# writing its file and committing its row (app/FileManager/reconcile.py)
+RECONCILE_GRACE_SECONDS = int(os.getenv("RECONCILE_GRACE_SECONDS", "3600"))
+
+# Background integrity scrubber (app/FileManager/scrubber.py): stored bytes read per second,
+# per worker running it. Keep it well under what the disk serves so API traffic isn't starved.
+SCRUB_BYTES_PER_SECOND = int(os.getenv("SCRUB_BYTES_PER_SECOND", str(8 * 1024 * 1024)))
+# a running scrub whose checkpoint hasn't moved for this long is taken to have lost its worker and can be
+# resumed; the checkpoint moves every SCRUB_HEARTBEAT_SECONDS, or after a file when one takes longer, so keep
+# it well above the time the largest file takes at SCRUB_BYTES_PER_SECOND
+SCRUB_STALE_SECONDS = int(os.getenv("SCRUB_STALE_SECONDS", "3600"))
+
+# default retention of uploads that set no TTL and whose user has no policy (app/FileManager/retention.py);
+# 0 keeps them forever
+FILE_RETENTION_HOURS = float(os.getenv("FILE_RETENTION_HOURS", "24"))
+
+# storage scan cleanup (app/FileManager/cleanup.py, admin_cli cleanup-files): stored files older than this are deleted
+CLEANUP_MAX_AGE_HOURS = float(os.getenv("CLEANUP_MAX_AGE_HOURS", "24"))
+# stored files deleted per second at most, and how many deletes run in parallel
+CLEANUP_DELETES_PER_SECOND = float(os.getenv("CLEANUP_DELETES_PER_SECOND", "500"))
+CLEANUP_WORKERS = int(os.getenv("CLEANUP_WORKERS", "8"))
+
+# Due task dispatcher (app/utils/dispatcher.py): seconds between polls of the tasks table when
+# nothing is due, which bounds how late a task is sent to the broker
+DISPATCH_POLL_SECONDS = float(os.getenv("DISPATCH_POLL_SECONDS", "1"))
+# tasks due within this many seconds are held on a timing wheel and sent within a tick of their
+# schedule_time instead of up to a poll late (app/utils/timing_wheel.py); 0 turns the wheel off
+DISPATCH_HORIZON_SECONDS = float(os.getenv("DISPATCH_HORIZON_SECONDS", "30"))
+DISPATCH_TICK_SECONDS = float(os.getenv("DISPATCH_TICK_SECONDS", "0.01"))
+# an occurrence of a recurring schedule up to this late still runs as normal, an older one is
+# missed and handled by the schedule's catch-up policy (app/utils/recurring.py)
+RECURRING_MISFIRE_GRACE_SECONDS = float(os.getenv("RECURRING_MISFIRE_GRACE_SECONDS", "60"))
+
+# Outgoing mail (app/utils/email.py). Connections are pooled per worker process (app/utils/smtp_pool.py)
+SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "465"))
+# implicit TLS (port 465); "0" for a plain connection, e.g. a local relay
+SMTP_USE_SSL = os.getenv("SMTP_USE_SSL", "1") not in ("0", "false", "False")
+SMTP_TIMEOUT_SECONDS = float(os.getenv("SMTP_TIMEOUT_SECONDS", "30"))
+# idle logged-in connections kept per worker process
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "2"))
+# a connection is replaced after this many messages, providers cap messages per session
+SMTP_MAX_MESSAGES_PER_CONNECTION = int(os.getenv("SMTP_MAX_MESSAGES_PER_CONNECTION", "100"))
+# a connection idle for longer gets a NOOP before it is reused
+SMTP_IDLE_CHECK_SECONDS = float(os.getenv("SMTP_IDLE_CHECK_SECONDS", "30"))
+
+# Executors for blocking work done from async routes (app/utils/executors.py)
+CRYPTO_WORKERS = int(os.getenv("CRYPTO_WORKERS", str(os.cpu_count() or 2)))
+DISK_WORKERS = int(os.getenv("DISK_WORKERS", "16"))
+# uploads are admitted while the sum of their sizes stays under this budget
+UPLOAD_INFLIGHT_BUDGET_MB = int(os.getenv("UPLOAD_INFLIGHT_BUDGET_MB", "64"))
+# how long an upload may queue for budget before getting a 503
+UPLOAD_QUEUE_TIMEOUT_SECONDS = float(os.getenv("UPLOAD_QUEUE_TIMEOUT_SECONDS", "10"))
+
+# multipart upload sessions still open this long after they started are aborted and their staged
+# .part file deleted (app/FileManager/multipartManager.py, admin_cli expire-uploads)
+UPLOAD_SESSION_MAX_AGE_HOURS = float(os.getenv("UPLOAD_SESSION_MAX_AGE_HOURS", "24"))
+
+# In-process cache of decoded user keys (app/Encryption_Services/keyGenerator.py)
+KEY_CACHE_ENABLED = os.getenv("KEY_CACHE_ENABLED", "1") not in ("0", "false", "False")
+KEY_CACHE_SIZE = int(os.getenv("KEY_CACHE_SIZE", "1024"))
+KEY_CACHE_TTL_SECONDS = float(os.getenv("KEY_CACHE_TTL_SECONDS", "300"))
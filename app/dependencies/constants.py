@@ -6,6 +6,8 @@ import uuid
 
 
 TASK_STATUS_SCHEDULED = "scheduled"
+# claimed by the dispatcher and sent to the broker, waiting for a worker
+TASK_STATUS_QUEUED = "queued"
 TASK_STATUS_CANCELLED = "cancelled"
 TASK_STATUS_COMPLETED = "completed"
 TASK_STATUS_FAILED = "failed"
@@ -14,6 +16,31 @@ TASK_STATUS_RUNNING= "R"
 TASK_TYPE_REMINDER = "reminder"
 TASK_TYPE_FILE_CLEANUP = "file_cleanup"
 
+# due tasks claimed and published per dispatcher round (app/utils/dispatcher.py)
+DISPATCH_BATCH_SIZE = 500
+# most tasks a dispatcher holds on its timing wheel at once, the rest wait for the due poll
+DISPATCH_HORIZON_MAX_TASKS = 100_000
+
+# most tasks one POST /tasks/schedule_batch may carry (app/utils/task.py)
+SCHEDULE_BATCH_MAX_TASKS = 50_000
+# and its largest body, checked while the body streams in
+SCHEDULE_BATCH_MAX_BYTES = 64 * 1024 * 1024
+TASK_BATCH_REJECTED = "rejected"
+
+# co-due reminders sent per send_reminders task, over one session and SMTP connection
+REMINDER_BATCH_SIZE = 50
+# retries of a reminder whose send hit an SMTP error, as send_email_task's autoretry
+REMINDER_MAX_RETRIES = 3
+
+# catch-up policies of recurring schedules for occurrences missed while nothing was running
+# (app/utils/recurring.py): drop them, run one catch-up task, or run every one of them
+RECURRING_CATCH_UP_SKIP = "skip"
+RECURRING_CATCH_UP_ONCE = "once"
+RECURRING_CATCH_UP_ALL = "all"
+# schedules materialized per transaction, and most missed occurrences one "all" schedule catches up on
+RECURRING_BATCH_SIZE = 500
+RECURRING_MAX_CATCH_UP = 100
+
 def taskscheduledefault():
     """returns uth time"""
     return datetime.now(timezone.utc)
@@ -38,6 +65,55 @@ HTTP_STATUS_NOT_APPLICABLE = 406
 HTTP_STATUS_SERVER_ERROR = 500
 
 
-FILE_STORAGE_DIR = "/uploads/app/uploads"
 MAX_UPLOAD_SIZE_MB = 10
 ALLOWED_FILE_EXTENSIONS = {"txt", "pdf", "png", "jpg", "jpeg", "gif"}
+
+# resumable multipart uploads
+MAX_MULTIPART_UPLOAD_SIZE_MB = 5 * 1024
+MULTIPART_PART_SIZE_MB = 8
+UPLOAD_SESSION_OPEN = "open"
+UPLOAD_SESSION_COMPLETING = "completing"
+UPLOAD_SESSION_COMPLETED = "completed"
+UPLOAD_SESSION_ABORTED = "aborted"
+UPLOAD_SESSION_SWEEP_BATCH_SIZE = 200
+# upload-by-hash preflight outcomes (POST /files/preflight)
+UPLOAD_PREFLIGHT_EXISTS = "exists"
+UPLOAD_PREFLIGHT_REQUIRED = "upload_required"
+
+# user key rotation (app/Encryption_Services/keyRotation.py)
+KEY_ROTATION_BATCH_SIZE = 500
+KEY_ROTATION_PENDING = "pending"
+KEY_ROTATION_RUNNING = "running"
+KEY_ROTATION_COMPLETED = "completed"
+KEY_ROTATION_FAILED = "failed"
+KEY_ROTATION_SKIPPED = "skipped"
+
+# stored files deleted per batch by the storage scan cleanup (app/FileManager/cleanup.py)
+CLEANUP_BATCH_SIZE = 500
+# expired files removed per batch by the file_cleanup task (app/FileManager/retention.py)
+RETENTION_BATCH_SIZE = 500
+
+# storage / files table reconciliation (app/FileManager/reconcile.py)
+RECONCILE_BATCH_SIZE = 1000
+RECONCILE_PENDING = "pending"
+RECONCILE_RUNNING = "running"
+RECONCILE_COMPLETED = "completed"
+RECONCILE_FAILED = "failed"
+# stored file nothing references / row whose stored file is gone
+RECONCILE_ORPHAN_FILE = "file"
+RECONCILE_ORPHAN_ROW = "row"
+
+# integrity scrubber (app/FileManager/scrubber.py)
+SCRUB_BATCH_SIZE = 200
+# a running scrub commits its checkpoint at least this often, mid batch if need be, so its
+# updated_at never looks stale (SCRUB_STALE_SECONDS) while it is working
+SCRUB_HEARTBEAT_SECONDS = 60
+SCRUB_PENDING = "pending"
+SCRUB_RUNNING = "running"
+SCRUB_COMPLETED = "completed"
+SCRUB_FAILED = "failed"
+# per file outcomes, only files that did not verify get a ScrubResult row
+SCRUB_FILE_MISSING = "missing"
+SCRUB_FILE_CORRUPT = "corrupt"
+SCRUB_FILE_HASH_MISMATCH = "hash_mismatch"
+SCRUB_FILE_ERROR = "error"
@@ -7,4 +7,7 @@ from sqlalchemy.orm import sessionmaker, relationship
 from sqlalchemy import Column, String, Integer
 from ..models.database import Base
 from ..models.user import UserModel
-from ..models.file import FileModel
+from ..models.file import FileModel, BlobModel, UploadSession, UploadPart
+from ..models.key_rotation import KeyRotationJob, KeyRotationUser
+from ..models.scrub import ScrubRun, ScrubResult
+from ..models.reconcile import ReconcileRun, ReconcileOrphan
@@ -1,18 +1,84 @@
 """SQLAlchemy model for uploaded files."""
 # pylint: disable=too-few-public-methods
 
-from sqlalchemy import Column, String, ForeignKey
+from datetime import datetime
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from ..models.database import Base
 
 class FileModel(Base):
     """Database of user-uploaded files"""
     __tablename__ = "files"
+    # duplicate reports group by file_hash, per user or across all users
+    __table_args__ = (Index("ix_files_user_hash", "user_id", "file_hash"),)
 
     id = Column(String, primary_key=True, index=True)
     filename = Column(String)
     user_id = Column(String, ForeignKey("users.id"))
     file_path = Column(String)
-    file_hash = Column(String)
+    file_hash = Column(String, index=True)
+    # algorithm file_hash was computed with, None for sha256 hashes from before it was recorded
+    hash_algorithm = Column(String, nullable=True)
     user = relationship("UserModel", back_populates="files")
     nonce = Column(String, nullable=False)
+    # shared encrypted blob this row points at, None for files stored before dedup
+    blob_id = Column(String, ForeignKey("blobs.id"), nullable=True, index=True)
+    # per-file data key wrapped by version key_version of the user's key;
+    # None for files encrypted directly with the user key before envelope encryption
+    wrapped_key = Column(String, nullable=True)
+    key_version = Column(Integer, nullable=True)
+    # compression applied before encryption (see FileManager/compression.py), None if stored as is
+    codec = Column(String, nullable=True)
+    # size of the original upload
+    size_bytes = Column(BigInteger, nullable=True, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    # when retention removes the file (app/FileManager/retention.py), None keeps it forever
+    expires_at = Column(DateTime, nullable=True, index=True)
+
+
+class BlobModel(Base):
+    """One encrypted copy of a user's content, shared by every FileModel row with the same hash"""
+    __tablename__ = "blobs"
+    __table_args__ = (UniqueConstraint("user_id", "content_hash", name="uq_blobs_user_hash"),)
+
+    id = Column(String, primary_key=True, index=True)
+    user_id = Column(String, ForeignKey("users.id"), nullable=False)
+    content_hash = Column(String, nullable=False)
+    hash_algorithm = Column(String, nullable=True)
+    file_path = Column(String, nullable=False)
+    nonce = Column(String, nullable=False)
+    wrapped_key = Column(String, nullable=True)
+    key_version = Column(Integer, nullable=True)
+    codec = Column(String, nullable=True)
+    size_bytes = Column(BigInteger, default=0)
+    ref_count = Column(Integer, nullable=False, default=0)
+
+
+class UploadSession(Base):
+    """A resumable multipart upload in progress; parts are encrypted straight into file_path"""
+    __tablename__ = "upload_sessions"
+
+    id = Column(String, primary_key=True, index=True)
+    user_id = Column(String, ForeignKey("users.id"), index=True)
+    filename = Column(String)
+    file_path = Column(String, nullable=False)
+    total_size = Column(BigInteger, nullable=False)
+    part_size = Column(Integer, nullable=False)
+    nonce = Column(String, nullable=False)
+    wrapped_key = Column(String, nullable=False)
+    key_version = Column(Integer, nullable=False)
+    expected_hash = Column(String, nullable=True)
+    hash_algorithm = Column(String, nullable=True)
+    ttl_seconds = Column(Integer, nullable=True)
+    status = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class UploadPart(Base):
+    """A part received for an UploadSession, with the hash of its plaintext"""
+    __tablename__ = "upload_parts"
+
+    session_id = Column(String, ForeignKey("upload_sessions.id"), primary_key=True)
+    part_number = Column(Integer, primary_key=True)
+    size = Column(Integer, nullable=False)
+    sha256 = Column(String, nullable=False)
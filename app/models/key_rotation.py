@@ -0,0 +1,31 @@
+"""SQLAlchemy models for user key rotation jobs."""
+# pylint: disable=too-few-public-methods
+
+from datetime import datetime
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey
+from ..dependencies.constants import KEY_ROTATION_PENDING
+from .database import Base
+
+
+class KeyRotationJob(Base):
+    """One rotation run over a set of users, progress is summed from its KeyRotationUser rows"""
+    __tablename__ = "key_rotation_jobs"
+
+    id = Column(String, primary_key=True, index=True)
+    status = Column(String, nullable=False, default=KEY_ROTATION_PENDING)
+    total_users = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class KeyRotationUser(Base):
+    """Rotation state of one user within a KeyRotationJob"""
+    __tablename__ = "key_rotation_users"
+
+    job_id = Column(String, ForeignKey("key_rotation_jobs.id"), primary_key=True)
+    user_id = Column(String, ForeignKey("users.id"), primary_key=True)
+    status = Column(String, nullable=False, default=KEY_ROTATION_PENDING)
+    # data keys rewrapped so far, across files, blobs and open upload sessions
+    rewrapped = Column(Integer, nullable=False, default=0)
+    error = Column(String, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
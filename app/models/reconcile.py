@@ -0,0 +1,42 @@
+"""SQLAlchemy models for storage / files table reconciliation runs."""
+# pylint: disable=too-few-public-methods
+
+from datetime import datetime
+from sqlalchemy import Column, String, Integer, BigInteger, Boolean, DateTime, ForeignKey
+from ..dependencies.constants import RECONCILE_PENDING
+from .database import Base
+
+
+class ReconcileRun(Base):
+    """One merge-join of the stored files against the files table, resumable from last_key"""
+    __tablename__ = "reconcile_runs"
+
+    id = Column(String, primary_key=True, index=True)
+    status = Column(String, nullable=False, default=RECONCILE_PENDING)
+    # delete what is found, otherwise only report it
+    fix = Column(Boolean, nullable=False, default=False)
+    # checkpoint: every storage key up to and including this one has been compared
+    last_key = Column(String, nullable=False, default="")
+    stored_files = Column(Integer, nullable=False, default=0)
+    file_rows = Column(Integer, nullable=False, default=0)
+    orphaned_files = Column(Integer, nullable=False, default=0)
+    orphaned_bytes = Column(BigInteger, nullable=False, default=0)
+    missing_files = Column(Integer, nullable=False, default=0)
+    fixed = Column(Integer, nullable=False, default=0)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class ReconcileOrphan(Base):
+    """A stored file with no row (kind "file") or a row with no stored file (kind "row")"""
+    __tablename__ = "reconcile_orphans"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    run_id = Column(String, ForeignKey("reconcile_runs.id"), nullable=False, index=True)
+    kind = Column(String, nullable=False)
+    key = Column(String, nullable=False)
+    file_id = Column(String, nullable=True)
+    size_bytes = Column(BigInteger, nullable=True)
+    fixed = Column(Boolean, nullable=False, default=False)
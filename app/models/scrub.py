@@ -0,0 +1,38 @@
+"""SQLAlchemy models for the stored file integrity scrubber."""
+# pylint: disable=too-few-public-methods
+
+from datetime import datetime
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime, ForeignKey
+from ..dependencies.constants import SCRUB_PENDING
+from .database import Base
+
+
+class ScrubRun(Base):
+    """One pass of the scrubber over every FileModel row, resumable from last_file_id"""
+    __tablename__ = "scrub_runs"
+
+    id = Column(String, primary_key=True, index=True)
+    status = Column(String, nullable=False, default=SCRUB_PENDING)
+    # checkpoint: files are checked in id order, everything up to this id is done
+    last_file_id = Column(String, nullable=False, default="")
+    files_checked = Column(Integer, nullable=False, default=0)
+    files_failed = Column(Integer, nullable=False, default=0)
+    bytes_read = Column(BigInteger, nullable=False, default=0)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class ScrubResult(Base):
+    """A file that failed verification during a ScrubRun"""
+    __tablename__ = "scrub_results"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    run_id = Column(String, ForeignKey("scrub_runs.id"), nullable=False, index=True)
+    file_id = Column(String, nullable=False, index=True)
+    user_id = Column(String, nullable=True)
+    file_path = Column(String, nullable=True)
+    status = Column(String, nullable=False)
+    detail = Column(String, nullable=True)
+    checked_at = Column(DateTime, default=datetime.utcnow)
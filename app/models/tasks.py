@@ -1,9 +1,9 @@
-"""SQLAlchemy models for Task Automation API: Task and TaskHistory."""
+"""SQLAlchemy models for Task Automation API: Task, TaskHistory and RecurringSchedule."""
 from sqlalchemy import ForeignKey
 
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, Integer
-from ..dependencies.constants import TASK_STATUS_SCHEDULED, taskscheduledefault
+from sqlalchemy import Column, String, DateTime, Integer, Index, Boolean
+from ..dependencies.constants import TASK_STATUS_SCHEDULED, RECURRING_CATCH_UP_SKIP, taskscheduledefault
 from .database import Base
 
 
@@ -18,6 +18,17 @@ class Task(Base):  # pylint: disable=too-few-public-methods
     title = Column(String, default="")
     receiver_email = Column(String, default="")
     file_id = Column(String, nullable=True) # added this for users uploading files with task scheduling
+    # set when the dispatcher hands the task to the broker (app/utils/dispatcher.py)
+    dispatched_at = Column(DateTime, nullable=True)
+    # lets the dispatcher pick up tasks scheduled since its last look, see load_horizon
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    # the recurring schedule this task is an occurrence of, if any (app/utils/recurring.py)
+    schedule_id = Column(String, nullable=True, index=True)
+
+    __table_args__ = (
+        # the dispatcher's due scan: status = scheduled and schedule_time <= now, oldest first
+        Index("ix_tasks_status_schedule_time", "status", "schedule_time"),
+    )
 
 
 class TaskHistory(Base):  # pylint: disable=too-few-public-methods
@@ -29,3 +40,32 @@ class TaskHistory(Base):  # pylint: disable=too-few-public-methods
     status = Column(String)
     executed_at = Column(DateTime, default=datetime.utcnow)
     details = Column(String)  # such as 42 files deleted
+
+
+class RecurringSchedule(Base):  # pylint: disable=too-few-public-methods
+    """
+    A task repeated on a cron expression, stored once.
+
+    next_run_at is the next occurrence not yet turned into a Task row; the
+    dispatcher materializes occurrences shortly before they fall due and moves
+    it forward in the same transaction (app/utils/recurring.py).
+    """
+    __tablename__ = "recurring_schedules"
+    id = Column(String, primary_key=True, index=True)
+    user_id = Column(String, index=True)
+    task_type = Column(String, nullable=False)
+    title = Column(String, default="")
+    receiver_email = Column(String, default="")
+    cron = Column(String, nullable=False)
+    # what to do about occurrences missed while nothing was running: skip, once or all
+    catch_up = Column(String, nullable=False, default=RECURRING_CATCH_UP_SKIP)
+    next_run_at = Column(DateTime, nullable=True)
+    last_run_at = Column(DateTime, nullable=True)
+    ends_at = Column(DateTime, nullable=True)
+    enabled = Column(Boolean, nullable=False, default=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # the dispatcher's scan: enabled schedules with next_run_at inside its horizon
+        Index("ix_recurring_schedules_enabled_next_run_at", "enabled", "next_run_at"),
+    )
@@ -2,7 +2,7 @@
 """SQLAlchemy model for users."""
 
 import uuid
-from sqlalchemy import Column, String, Boolean
+from sqlalchemy import Column, String, Boolean, Integer, DateTime
 from sqlalchemy.orm import relationship
 from ..models.database import Base
 
@@ -17,3 +17,10 @@ class UserModel(Base):
     files = relationship("FileModel", back_populates="user")
     is_admin = Column(Boolean, default=False)
     encryption_key = Column(String)
+    # envelope encryption key versions, see KeyHandler
+    key_version = Column(Integer, default=1)
+    pending_encryption_key = Column(String, nullable=True)
+    previous_encryption_key = Column(String, nullable=True)
+    key_rotated_at = Column(DateTime, nullable=True)
+    # how long uploads are kept when they don't set a TTL; None uses FILE_RETENTION_HOURS, 0 keeps them forever
+    retention_hours = Column(Integer, nullable=True)
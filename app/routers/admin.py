@@ -3,13 +3,19 @@ Admin routes for Task Automation API.
 Includes user and task management endpoints.
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+from fastapi import APIRouter, Body, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
 from ..models.database import get_db
 from ..models.user import UserModel
 from app.models.tasks import Task
 from app.dependencies.auth_utils import admin_required
+from app.utils.executors import executor_stats
+from app.Encryption_Services.keyGenerator import KeyHandler, key_cache
+from app.Encryption_Services import keyRotation
+from app.FileManager import duplicateReport, scrubber
+from app.utils.celery_instance import celery_app
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
@@ -31,6 +37,7 @@ def delete_user(user_id: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="User not found")
     db.delete(user)
     db.commit()
+    KeyHandler.invalidate(user_id)
     return {"message": f"User {user_id} deleted."}
 
 
@@ -60,3 +67,116 @@ def get_summary(db: Session = Depends(get_db)):
     user_count = db.query(UserModel).count()
     task_count = db.query(Task).count()
     return {"total_users": user_count, "total_tasks": task_count}
+
+
+@router.get("/executors", dependencies=[Depends(admin_required)])
+def get_executor_stats():
+    """Queue depth, wait times and upload byte budget of the blocking work executors (admin only)."""
+    return executor_stats()
+
+
+@router.get("/key_cache", dependencies=[Depends(admin_required)])
+def get_key_cache_stats():
+    """Hit/miss counters of this process's encryption key cache (admin only)."""
+    return key_cache.stats()
+
+
+@router.post("/key_rotation", dependencies=[Depends(admin_required)])
+def start_key_rotation(
+    user_ids: Optional[list[str]] = Body(default=None, embed=True),
+    db: Session = Depends(get_db)
+):
+    """Rotate the encryption keys of user_ids, or of every user, in the background (admin only)."""
+    job = keyRotation.createJob(db, user_ids)
+    celery_app.send_task("app.tasks.tasks.rotate_keys", args=[job.id])
+    return keyRotation.jobProgress(db, job.id)
+
+
+@router.get("/key_rotation/{job_id}", dependencies=[Depends(admin_required)])
+def get_key_rotation(job_id: str, db: Session = Depends(get_db)):
+    """Progress of a key rotation job (admin only)."""
+    progress = keyRotation.jobProgress(db, job_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Key rotation job not found")
+    return progress
+
+
+@router.post("/key_rotation/{job_id}/resume", dependencies=[Depends(admin_required)])
+def resume_key_rotation(job_id: str, db: Session = Depends(get_db)):
+    """Re-dispatch the users of a job that have not finished, e.g. after a worker crash (admin only)."""
+    if keyRotation.jobProgress(db, job_id) is None:
+        raise HTTPException(status_code=404, detail="Key rotation job not found")
+    celery_app.send_task("app.tasks.tasks.rotate_keys", args=[job_id])
+    return keyRotation.jobProgress(db, job_id)
+
+
+@router.get("/duplicates", dependencies=[Depends(admin_required)])
+def get_duplicates(
+    user_id: Optional[str] = None,
+    limit: int = Query(duplicateReport.DEFAULT_PAGE_SIZE, ge=1, le=duplicateReport.MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db)
+):
+    """Duplicate file groups of one user, or across all users, with reclaimable bytes (admin only)."""
+    return duplicateReport.duplicateReport(db, user_id, limit, offset)
+
+
+@router.post("/duplicates/report", dependencies=[Depends(admin_required)])
+def start_duplicate_report(
+    user_id: Optional[str] = Body(default=None, embed=True),
+    limit: int = Body(default=duplicateReport.DEFAULT_PAGE_SIZE, embed=True),
+    offset: int = Body(default=0, embed=True)
+):
+    """Build a duplicate report in the background, fetch it from /admin/duplicates/report/{task_id} (admin only)."""
+    result = celery_app.send_task("app.tasks.tasks.duplicate_report", args=[user_id, limit, offset])
+    return {"task_id": result.id}
+
+
+@router.get("/duplicates/report/{task_id}", dependencies=[Depends(admin_required)])
+def get_duplicate_report(task_id: str):
+    """State of a background duplicate report and the report once it is ready (admin only)."""
+    result = celery_app.AsyncResult(task_id)
+    if not result.ready():
+        return {"task_id": task_id, "status": result.state}
+    if result.failed():
+        return {"task_id": task_id, "status": result.state, "error": str(result.result)}
+    return {"task_id": task_id, "status": result.state, "report": result.result}
+
+
+@router.post("/scrub", dependencies=[Depends(admin_required)])
+def start_scrub(db: Session = Depends(get_db)):
+    """Check every stored file decrypts and matches its hash, in the background (admin only).
+
+    Only one run is active at a time; while one is in progress it is returned instead.
+    """
+    run, created = scrubber.createRun(db)
+    if created:
+        celery_app.send_task("app.tasks.tasks.scrub_files", args=[run.id])
+    return scrubber.runProgress(db, run.id)
+
+
+@router.get("/scrub/{run_id}", dependencies=[Depends(admin_required)])
+def get_scrub(
+    run_id: str,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db)
+):
+    """Progress of a scrub run and the files that failed verification (admin only)."""
+    progress = scrubber.runProgress(db, run_id, limit, offset)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Scrub run not found")
+    return progress
+
+
+@router.post("/scrub/{run_id}/resume", dependencies=[Depends(admin_required)])
+def resume_scrub(run_id: str, db: Session = Depends(get_db)):
+    """Continue a scrub run from its checkpoint, e.g. after a worker crash (admin only).
+
+    A run that has completed, or is still being worked on, is returned as it is.
+    """
+    if scrubber.runProgress(db, run_id, limit=0) is None:
+        raise HTTPException(status_code=404, detail="Scrub run not found")
+    if scrubber.canResume(db, run_id):
+        celery_app.send_task("app.tasks.tasks.scrub_files", args=[run_id])
+    return scrubber.runProgress(db, run_id)
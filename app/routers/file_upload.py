@@ -1,18 +1,135 @@
-from fastapi import APIRouter, Depends, File,UploadFile
-from app.schemas.file import FileResponse
+import os
+from typing import Optional
+from fastapi import APIRouter, Depends, File, Form, Header, Request, UploadFile
+from app.schemas.file import (
+    FileResponse,
+    MultipartUploadCreate,
+    MultipartUploadStatus,
+    UploadPartResponse,
+    UploadPreflightRequest,
+    UploadPreflightResponse,
+)
 from app.FileManager.fileManager import fileManager
+from app.FileManager.multipartManager import multipartManager
 from app.models.user import UserModel
 from app.dependencies.auth_utils import get_current_user
+from app.config import HASH_ALGORITHM
+from app.dependencies.constants import UPLOAD_PREFLIGHT_EXISTS, UPLOAD_PREFLIGHT_REQUIRED
 router = APIRouter(prefix="/files", tags=["Files"])
 
 
 @router.post("/upload", response_model=FileResponse)
 async def uploadfile(
     file: UploadFile = File(...),
+    file_hash: Optional[str] = Form(None),
+    hash_algorithm: str = Form("sha256"),
+    ttl_seconds: Optional[int] = Form(None, gt=0),
     user: UserModel = Depends(get_current_user),
     manaager: fileManager = Depends(),
     ):
     """
     Upload endpoint — manager is created by FastAPI (so its dependencies get injected).
+
+    file_hash is optional: when it matches content the user already stored, the
+    upload is verified by hash and recorded without re-encrypting or writing it.
+    hash_algorithm names the algorithm file_hash was computed with. ttl_seconds
+    sets when the file expires, otherwise the user's retention policy applies.
+    """
+    return await manaager.uploadFile(
+        user.id, file, file_hash=file_hash, hash_algorithm=hash_algorithm, ttl_seconds=ttl_seconds
+    )
+
+
+@router.post("/preflight", response_model=UploadPreflightResponse)
+async def preflight_upload(
+    request: UploadPreflightRequest,
+    user: UserModel = Depends(get_current_user),
+    files: fileManager = Depends(),
+    uploads: multipartManager = Depends(),
+    ):
+    """
+    Upload by hash: if the user already stored content with this hash and size
+    the file is created straight away and no bytes need to be sent. Otherwise a
+    multipart upload session (the upload ticket) is opened, bound to the hash so
+    the content is verified on completion.
+    """
+    hash_algorithm = request.hash_algorithm or HASH_ALGORITHM
+    new_file = await files.referenceByHash(
+        user.id, request.filename, request.file_hash, request.size_bytes, hash_algorithm, request.ttl_seconds
+    )
+    if new_file is not None:
+        return UploadPreflightResponse(
+            status=UPLOAD_PREFLIGHT_EXISTS,
+            file=FileResponse(
+                id=new_file.id,
+                filename=os.path.basename(new_file.file_path),
+                file_path=new_file.file_path,
+                file_hash=new_file.file_hash,
+            ),
+        )
+
+    ticket = await uploads.initiate(user.id, MultipartUploadCreate(
+        filename=request.filename,
+        total_size=request.size_bytes,
+        file_hash=request.file_hash,
+        hash_algorithm=hash_algorithm,
+        ttl_seconds=request.ttl_seconds,
+    ))
+    return UploadPreflightResponse(status=UPLOAD_PREFLIGHT_REQUIRED, upload=ticket)
+
+
+@router.post("/uploads", response_model=MultipartUploadStatus)
+async def initiate_upload(
+    request: MultipartUploadCreate,
+    user: UserModel = Depends(get_current_user),
+    manager: multipartManager = Depends(),
+    ):
+    """Start a resumable multipart upload. The response says how big each part must be and how many there are."""
+    return await manager.initiate(user.id, request)
+
+
+@router.put("/uploads/{upload_id}/parts/{part_number}", response_model=UploadPartResponse)
+async def upload_part(
+    upload_id: str,
+    part_number: int,
+    request: Request,
+    x_content_sha256: Optional[str] = Header(None),
+    user: UserModel = Depends(get_current_user),
+    manager: multipartManager = Depends(),
+    ):
     """
-    return await manaager.uploadFile(user.id, file) 
\ No newline at end of file
+    Upload one part as the raw request body. Parts may be sent in parallel and in
+    any order; re-sending a part replaces it. X-Content-SHA256 is checked if given.
+    """
+    return await manager.uploadPart(user.id, upload_id, part_number, request.stream(), x_content_sha256)
+
+
+@router.get("/uploads/{upload_id}", response_model=MultipartUploadStatus)
+async def get_upload(
+    upload_id: str,
+    user: UserModel = Depends(get_current_user),
+    manager: multipartManager = Depends(),
+    ):
+    """Session state and the parts received so far, so a client can resume."""
+    return await manager.status(user.id, upload_id)
+
+
+@router.post("/uploads/{upload_id}/complete", response_model=FileResponse)
+async def complete_upload(
+    upload_id: str,
+    user: UserModel = Depends(get_current_user),
+    manager: multipartManager = Depends(),
+    ):
+    """Finish the upload once every part has arrived."""
+    return await manager.complete(user.id, upload_id)
+
+
+@router.delete("/uploads/{upload_id}")
+async def abort_upload(
+    upload_id: str,
+    user: UserModel = Depends(get_current_user),
+    manager: multipartManager = Depends(),
+    ):
+    """Abandon the upload and discard what was received."""
+    await manager.abort(user.id, upload_id)
+    return {"message": f"Upload {upload_id} aborted."}
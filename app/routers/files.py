@@ -4,11 +4,10 @@ Includes upload, list, and delete functionality.
 """
 
 
-from io import BytesIO
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 
 from fastapi.responses import StreamingResponse
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
 
 from sqlalchemy.orm import Session
 from app.dependencies.auth_utils import get_current_user
@@ -17,6 +16,11 @@ from app.models.user import UserModel
 from app.models.file import FileModel
 
 from app.Encryption_Services.encryptionService import EncryptionService
+from app.FileManager.databaseManager import getFileById
+from app.FileManager.blobStore import releaseFile
+from app.FileManager import compression, duplicateReport, retention
+from app.schemas.file import RetentionPolicy
+from app.utils.executors import run_blocking, iterate_blocking, CRYPTO, DISK
 
 from app.utils.logger import SingletonLogger
 from app.dependencies.constants import (
@@ -46,7 +50,8 @@ def list_files(
                 "id": f.id,
                 "filename": f.filename,
                 "file_path": f.file_path,
-                "file_hash": f.file_hash
+                "file_hash": f.file_hash,
+                "expires_at": f.expires_at
             }  
             for f in files
         ]
@@ -58,15 +63,90 @@ def list_files(
         ) from exc
 
 
+@router.get("/retention", response_model=RetentionPolicy)
+def get_retention(user: UserModel = Depends(get_current_user)):
+    """The current user's default retention for uploads that don't set a TTL."""
+    return RetentionPolicy(retention_hours=user.retention_hours)
+
+
+@router.put("/retention", response_model=RetentionPolicy)
+def set_retention(
+    policy: RetentionPolicy,
+    user: UserModel = Depends(get_current_user),
+    db: Session = Depends(get_db)):
+    """Change how long future uploads are kept (files already stored keep their expiry)."""
+    retention.setUserRetention(db, user.id, policy.retention_hours)
+    return policy
+
+
+@router.get("/duplicates")
+def list_duplicates(
+    limit: int = Query(duplicateReport.DEFAULT_PAGE_SIZE, ge=1, le=duplicateReport.MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    user=Depends(get_current_user),
+    db: Session = Depends(get_db)) -> Dict[str, Any]:
+    """Groups of the current user's files with identical content, largest savings first."""
+    return duplicateReport.duplicateReport(db, user.id, limit, offset)
+
+
+@router.delete("/{file_id}")
+def delete_file(
+    file_id: str,
+    user: UserModel = Depends(get_current_user),
+    db: Session = Depends(get_db)):
+    """Delete one of the current user's files; the stored blob goes once nothing references it."""
+    file = db.query(FileModel).filter(
+        FileModel.id == file_id,
+        FileModel.user_id == user.id
+    ).first()
+
+    if not file:
+        raise HTTPException(404, "File not found")
+
+    releaseFile(db, file)
+    logger.info("File %s deleted by user %s", file_id, user.id)
+    return {"message": f"File {file_id} deleted."}
+
+
+def _parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single ``bytes=`` Range header into an inclusive (start, end).
+
+    Returns None when the whole file should be sent (no header, or a form we
+    don't serve such as multiple ranges). Raises 416 if the range can't be satisfied.
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+
+    first, _, last = range_header[len("bytes="):].strip().partition("-")
+    try:
+        if first == "":
+            # suffix range: the last N bytes
+            start, end = max(size - int(last), 0), size - 1
+        else:
+            start = int(first)
+            end = int(last) if last else size - 1
+    except ValueError:
+        return None
+
+    if start >= size or start > end:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, min(end, size - 1)
+
+
 @router.get("/download/{file_id}")
 async def download_file(
     file_id: str,
+    range_header: Optional[str] = Header(None, alias="Range"),
     db: Session = Depends(get_db),
     user: UserModel = Depends(get_current_user)):
 
 
-    file = db.query(FileModel).filter(
-        FileModel.id == file_id).first()
+    file = await run_blocking(DISK, getFileById, file_id, db)
 
     if not file:
         raise HTTPException(404, "File not found")
@@ -75,12 +155,18 @@ async def download_file(
         # convert stored hex nonce to bytes
         nonce_bytes = bytes.fromhex(file.nonce)
 
-        decrypted = EncryptionService.decrypt(
+        # segmented files are decrypted lazily, one segment per chunk sent
+        reader = await run_blocking(
+            CRYPTO,
+            EncryptionService.open_reader,
             file_path=file.file_path,
             user_id=str(user.id),
             db=db,
-            nonce=nonce_bytes
+            nonce=nonce_bytes,
+            wrapped_key=file.wrapped_key,
+            key_version=file.key_version
         )
+        reader = compression.wrapReader(reader, file.codec, file.size_bytes)
 
         original_filename = file.filename or "downloaded_file"
 
@@ -90,12 +176,27 @@ async def download_file(
         if media_type is None:
             media_type = "application/octet-stream"
 
+        headers = {
+            "Content-Disposition": f'attachment; filename="{original_filename}"',
+            "Accept-Ranges": "bytes",
+        }
+        byte_range = _parse_range(range_header, reader.size)
+        if byte_range is None:
+            headers["Content-Length"] = str(reader.size)
+            return StreamingResponse(
+                iterate_blocking(CRYPTO, reader.iter_range()),
+                media_type=media_type,
+                headers=headers
+            )
+
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{reader.size}"
+        headers["Content-Length"] = str(end - start + 1)
         return StreamingResponse(
-            BytesIO(decrypted),
+            iterate_blocking(CRYPTO, reader.iter_range(start, end)),
+            status_code=206,
             media_type=media_type,
-            headers={
-                "Content-Disposition": f'attachment; filename="{original_filename}"'
-            }
+            headers=headers
         )
     
     except HTTPException:
@@ -4,21 +4,26 @@ Includes scheduling, listing, cancelling, and deleting tasks.
 Fully compatible with UUID task IDs and your current auth system.
 """
 
+import json
 from typing import Optional
 
 from uuid import UUID
 from typing import List
-from fastapi import APIRouter, Form, Depends, HTTPException, Path, File, UploadFile
+from fastapi import APIRouter, Form, Depends, HTTPException, Path, File, UploadFile, Request, status
 from sqlalchemy.orm import Session
 
-from app.models.tasks import Task, TaskHistory
-from app.schemas.tasks import TaskCreate, TaskResponse, TaskHistoryS
+from app.models.tasks import Task, TaskHistory, RecurringSchedule
+from app.schemas.tasks import (
+    TaskCreate, TaskResponse, TaskHistoryS, TaskBatchResponse, RecurringTaskCreate, RecurringTaskResponse
+)
 from app.dependencies.auth_utils import get_current_user
 from app.models.database import get_db
-from app.utils.task import schedule_task
+from app.utils.task import schedule_task, schedule_task_batch
+from app.utils.executors import run_blocking, DISK
+from app.utils.recurring import create_schedule, disable_schedule
 from app.utils.logger import SingletonLogger
 from app.models.user import UserModel
-from app.dependencies.constants import HTTP_STATUS_BAD_REQUEST
+from app.dependencies.constants import HTTP_STATUS_BAD_REQUEST, SCHEDULE_BATCH_MAX_TASKS, SCHEDULE_BATCH_MAX_BYTES
 
 from app.schemas.tasks import TaskType
 from datetime import datetime
@@ -26,6 +31,8 @@ from datetime import datetime
 router = APIRouter(prefix="/tasks")
 logger = SingletonLogger().get_logger()
 
+NDJSON_CONTENT_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl"}
+
 
 @router.post("/schedule", response_model=TaskResponse)
 # sorry this is probaly the only way we can add a file as optional. I cant use a schema to combine them both
@@ -71,6 +78,135 @@ async def schedule_task_endpoint(
         ) from e
 
 
+def _too_many_tasks() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"A batch holds at most {SCHEDULE_BATCH_MAX_TASKS} tasks"
+    )
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"A batch body holds at most {SCHEDULE_BATCH_MAX_BYTES} bytes"
+    )
+
+
+async def _stream_body(request: Request):
+    # refuse an oversized body up front when it says so, and stop reading once it turns out to be
+    try:
+        declared = int(request.headers.get("content-length", 0))
+    except ValueError:
+        declared = 0
+    if declared > SCHEDULE_BATCH_MAX_BYTES:
+        raise _too_large()
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > SCHEDULE_BATCH_MAX_BYTES:
+            raise _too_large()
+        yield chunk
+
+
+async def _read_json(request: Request) -> bytes:
+    return b"".join([chunk async for chunk in _stream_body(request)])
+
+
+async def _read_ndjson(request: Request) -> list:
+    # lines are kept raw and validated off the event loop; only the count and size are checked while streaming
+    lines, pending = [], b""
+    async for chunk in _stream_body(request):
+        *complete, pending = (pending + chunk).split(b"\n")
+        lines += [line for line in complete if line.strip()]
+        if len(lines) > SCHEDULE_BATCH_MAX_TASKS:
+            raise _too_many_tasks()
+    if pending.strip():
+        lines.append(pending)
+    return lines
+
+
+@router.post("/schedule_batch", response_model=TaskBatchResponse, response_model_exclude_none=True)
+async def schedule_batch_endpoint(
+    request: Request,
+    db: Session = Depends(get_db),
+    user: UserModel = Depends(get_current_user)
+):
+    """
+    Schedule many tasks in one request: a JSON array of task objects, or one
+    task object per line with Content-Type application/x-ndjson. Each item
+    takes the fields of /tasks/schedule except the file, and gets its own
+    result; valid items are scheduled even when others are rejected.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in NDJSON_CONTENT_TYPES:
+        items = await _read_ndjson(request)
+    else:
+        try:
+            items = await run_blocking(DISK, json.loads, await _read_json(request))
+        except ValueError as e:
+            raise HTTPException(status_code=HTTP_STATUS_BAD_REQUEST, detail="Body is not valid JSON") from e
+        if not isinstance(items, list):
+            raise HTTPException(status_code=HTTP_STATUS_BAD_REQUEST, detail="Body must be a JSON array of tasks")
+    if len(items) > SCHEDULE_BATCH_MAX_TASKS:
+        raise _too_many_tasks()
+
+    try:
+        return await schedule_task_batch(db, str(user.id), items)
+    except Exception as e:
+        logger.exception("Error scheduling task batch: %s", e)
+        raise HTTPException(
+            status_code=HTTP_STATUS_BAD_REQUEST,
+            detail="Failed to schedule the batch, no task was scheduled"
+        ) from e
+
+
+@router.post("/recurring", response_model=RecurringTaskResponse)
+def create_recurring_task_endpoint(
+    task_data: RecurringTaskCreate,
+    db: Session = Depends(get_db),
+    user: UserModel = Depends(get_current_user)
+):
+    """Repeat a task on a cron expression (UTC), e.g. "0 9 * * mon-fri"."""
+    try:
+        schedule = create_schedule(db, str(user.id), task_data)
+    except ValueError as e:
+        raise HTTPException(status_code=HTTP_STATUS_BAD_REQUEST, detail=str(e)) from e
+    return RecurringTaskResponse.model_validate(schedule)
+
+
+@router.get("/recurring", response_model=List[RecurringTaskResponse])
+def list_recurring_tasks_endpoint(
+    db: Session = Depends(get_db),
+    user: UserModel = Depends(get_current_user)
+):
+    schedules = db.query(RecurringSchedule).filter(
+        RecurringSchedule.user_id == str(user.id)
+    ).order_by(RecurringSchedule.created_at).all()
+    return [RecurringTaskResponse.model_validate(schedule) for schedule in schedules]
+
+
+@router.delete("/recurring/{schedule_id}", response_model=RecurringTaskResponse)
+def disable_recurring_task_endpoint(
+    schedule_id: str = Path(..., description="Recurring task UUID"),
+    db: Session = Depends(get_db),
+    user: UserModel = Depends(get_current_user)
+):
+    """Stop a recurring task; its occurrences not sent yet are cancelled."""
+    validate_uuid(schedule_id)
+
+    schedule = db.query(RecurringSchedule).filter(
+        RecurringSchedule.id == schedule_id,
+        RecurringSchedule.user_id == str(user.id)
+    ).first()
+
+    if not schedule:
+        raise HTTPException(status_code=404, detail="Recurring task not found or doesn't belong to you")
+
+    cancelled = disable_schedule(db, schedule)
+    logger.info("Recurring task %s disabled by user %s, %d pending runs cancelled", schedule_id, user.id, cancelled)
+    return RecurringTaskResponse.model_validate(schedule)
+
+
 @router.get("/list_tasks", response_model=List[TaskResponse])
 def list_tasks_endpoint(
     db: Session = Depends(get_db),
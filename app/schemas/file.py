@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Optional, List
 
 """Schema for returning files"""
 class FileResponse(BaseModel):
@@ -12,4 +12,57 @@ class FileUploadRequest(BaseModel):
     filename: str
     file_hash: Optional[str] = None
 
-__all__ = ["FileResponse", "FileUploadRequest"]
+class MultipartUploadCreate(BaseModel):
+    """Start a resumable upload, total_size is fixed up front"""
+    filename: str
+    total_size: int
+    file_hash: Optional[str] = None
+    # algorithm file_hash is computed with, defaults to the server's HASH_ALGORITHM
+    hash_algorithm: Optional[str] = None
+    # seconds until the file expires, defaults to the user's retention policy
+    ttl_seconds: Optional[int] = Field(default=None, gt=0)
+
+class UploadPreflightRequest(BaseModel):
+    """Announce an upload by its hash before sending any bytes"""
+    filename: str
+    size_bytes: int
+    file_hash: str
+    hash_algorithm: Optional[str] = None
+    ttl_seconds: Optional[int] = Field(default=None, gt=0)
+
+class UploadPartResponse(BaseModel):
+    part_number: int
+    size: int
+    sha256: str
+
+    model_config = {"from_attributes": True}
+
+class MultipartUploadStatus(BaseModel):
+    upload_id: str
+    filename: str
+    total_size: int
+    part_size: int
+    part_count: int
+    status: str
+    parts: List[UploadPartResponse] = []
+
+class RetentionPolicy(BaseModel):
+    """Default lifetime of a user's uploads; None uses the server default, 0 keeps them forever"""
+    retention_hours: Optional[int] = Field(default=None, ge=0)
+
+class UploadPreflightResponse(BaseModel):
+    """Either the file created from content already stored, or the upload session to send it through"""
+    status: str
+    file: Optional[FileResponse] = None
+    upload: Optional[MultipartUploadStatus] = None
+
+__all__ = [
+    "FileResponse",
+    "FileUploadRequest",
+    "MultipartUploadCreate",
+    "UploadPartResponse",
+    "MultipartUploadStatus",
+    "UploadPreflightRequest",
+    "UploadPreflightResponse",
+    "RetentionPolicy",
+]
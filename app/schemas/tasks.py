@@ -7,6 +7,8 @@ from enum import Enum
 from pydantic import BaseModel, field_validator
 from typing import Optional
 
+from app.utils.cron import compile_cron
+
 
 def aware_utcnow() -> datetime:
     """Return current UTC time with timezone awareness."""
@@ -16,6 +18,7 @@ def aware_utcnow() -> datetime:
 class TaskStatus(str, Enum):
     """Enum for task statuses with UPPER_CASE naming style."""
     SCHEDULED = "scheduled"
+    QUEUED = "queued"
     COMPLETED = "completed"
     RUNNING = "running"
     CANCELED = "canceled"
@@ -28,6 +31,13 @@ class TaskType(str, Enum):
     FILE_CLEANUP = "file_cleanup"
 
 
+class CatchUpPolicy(str, Enum):
+    """What a recurring schedule does about occurrences missed while nothing was running."""
+    SKIP = "skip"
+    ONCE = "once"
+    ALL = "all"
+
+
 class FileTypes(str, Enum):
 
     """gonna have to get a libary to mkae this more easier.
@@ -80,6 +90,67 @@ class TaskResponse(BaseModel):
     }
 
 
+class TaskBatchResult(BaseModel):
+    """Outcome of one item of a batch, index is its position in the request."""
+    index: int
+    status: str
+    id: Optional[str] = None
+    error: Optional[str] = None
+
+
+class TaskBatchResponse(BaseModel):
+    """Schema for returning the outcome of POST /tasks/schedule_batch"""
+    scheduled: int
+    rejected: int
+    results: list[TaskBatchResult]
+
+
+class RecurringTaskCreate(BaseModel):
+    """Schema for creating a recurring task."""
+    task_type: TaskType
+    cron: str
+    title: str
+    receiver_email: str
+    catch_up: CatchUpPolicy = CatchUpPolicy.SKIP
+    # first occurrence at or after this; in the past it backfills according to catch_up
+    starts_at: Optional[datetime] = None
+    ends_at: Optional[datetime] = None
+
+    @field_validator("cron")
+    @classmethod
+    def validate_cron(cls, v: str) -> str:
+        """Reject expressions that don't parse or never fire."""
+        compile_cron(v.strip())
+        return v.strip()
+
+    @field_validator("starts_at", "ends_at")
+    @classmethod
+    def to_naive_utc(cls, v: Optional[datetime]) -> Optional[datetime]:
+        """Store times as naive UTC like schedule_time."""
+        if v is not None and v.tzinfo is not None:
+            v = v.astimezone(timezone.utc).replace(tzinfo=None)
+        return v
+
+
+class RecurringTaskResponse(BaseModel):
+    """Schema for returning a recurring schedule"""
+    id: str
+    user_id: str
+    task_type: str
+    cron: str
+    catch_up: str
+    enabled: bool
+    next_run_at: Optional[datetime] = None
+    last_run_at: Optional[datetime] = None
+    ends_at: Optional[datetime] = None
+    title: Optional[str] = None
+    receiver_email: Optional[str] = None
+
+    model_config = {
+        "from_attributes": True
+    }
+
+
 class TaskHistoryS(BaseModel):
     task_type: str
     status: str
@@ -90,4 +161,8 @@ class TaskHistoryS(BaseModel):
         "from_attributes": True
     }
 
-__all__ = ["TaskStatus", "TaskType", "TaskCreate", "TaskResponse"]
+__all__ = [
+    "TaskStatus", "TaskType", "CatchUpPolicy", "TaskCreate", "TaskResponse",
+    "TaskBatchResult", "TaskBatchResponse",
+    "RecurringTaskCreate", "RecurringTaskResponse"
+]
@@ -3,6 +3,11 @@ import argparse
 from app.models.database import get_db
 from app.models.user import UserModel
 from app.models.tasks import Task
+from app.Encryption_Services.keyGenerator import KeyHandler
+import time
+
+from app.FileManager import storagePath, cleanup, reconcile, retention, multipartManager
+from app.config import CLEANUP_MAX_AGE_HOURS, FILE_RETENTION_HOURS, UPLOAD_SESSION_MAX_AGE_HOURS
 
 
 parser = argparse.ArgumentParser(description="Parser for admin tasks")
@@ -19,6 +24,30 @@ subparsers.add_parser("view-tasks", help="List tasks")
 cancel_parser = subparsers.add_parser('cancel-task', help="Cancel task using task_id")
 cancel_parser.add_argument('task_id', type=int, help="ID of task to cancel")
 
+migrate_parser = subparsers.add_parser('migrate-storage', help="Move flat stored files into the sharded layout")
+migrate_parser.add_argument('--source', default=storagePath.STORAGE_ROOT, help="Directory holding the flat files")
+migrate_parser.add_argument('--batch-size', type=int, default=500, help="Files moved per database commit")
+migrate_parser.add_argument('--dry-run', action='store_true', help="Only count the files that would move")
+
+cleanup_parser = subparsers.add_parser('cleanup-files', help="Delete old stored files that no file record references")
+cleanup_parser.add_argument('--older-than-hours', type=float, default=CLEANUP_MAX_AGE_HOURS, help="Age cutoff")
+cleanup_parser.add_argument('--batch-size', type=int, default=500, help="Files deleted per batch")
+cleanup_parser.add_argument('--dry-run', action='store_true', help="Only report what would be deleted")
+
+reconcile_parser = subparsers.add_parser('reconcile', help="Compare stored files with the files table")
+reconcile_parser.add_argument('--fix', action='store_true', help="Delete orphaned files and rows whose file is gone")
+reconcile_parser.add_argument('--resume', metavar='RUN_ID', help="Continue an interrupted run from its checkpoint")
+reconcile_parser.add_argument('--show', type=int, default=20, help="How many findings to print")
+
+expire_parser = subparsers.add_parser('expire-files', help="Remove files whose retention has expired")
+expire_parser.add_argument('--dry-run', action='store_true', help="Only report what would be removed")
+
+backfill_parser = subparsers.add_parser('backfill-expiry', help="Give files stored without an expiry one")
+backfill_parser.add_argument('--hours', type=float, default=FILE_RETENTION_HOURS, help="Expire this many hours from now")
+
+uploads_parser = subparsers.add_parser('expire-uploads', help="Abort abandoned multipart uploads and delete their staged files")
+uploads_parser.add_argument('--older-than-hours', type=float, default=UPLOAD_SESSION_MAX_AGE_HOURS, help="Age cutoff")
+
 args = parser.parse_args()
 
 # Functions
@@ -37,6 +66,7 @@ def delete_user(user_id):
     if user:
         db.delete(user)
         db.commit()
+        KeyHandler.invalidate(user_id)
         print(f"User {user_id} deleted.")
     else:
         print(f"User {user_id} not found.")
@@ -60,6 +90,50 @@ def delete_task(task_id):
     else:
         print(f"Task {task_id} not found.")
 
+def migrate_storage(source, batch_size, dry_run):
+    db = next(get_db())
+    stats = storagePath.migrateFlatFiles(db, source=source, batch_size=batch_size, dry_run=dry_run)
+    verb = "Would move" if dry_run else "Moved"
+    print(f"{verb} {stats['moved']} files in {stats['batches']} batches.")
+    if stats['repaired']:
+        print(f"{'Would fix' if dry_run else 'Fixed'} {stats['repaired']} paths left flat by an interrupted migration.")
+
+def cleanup_files(older_than_hours, batch_size, dry_run):
+    stats = cleanup.cleanupStoredFiles(time.time() - older_than_hours * 3600, dry_run=dry_run, batch_size=batch_size)
+    verb = "Would delete" if dry_run else "Deleted"
+    print(f"Scanned {stats['scanned']} files in {stats['duration_seconds']}s.")
+    print(f"{verb} {stats['deleted']} unreferenced files ({stats['bytes_freed']} bytes), "
+          f"kept {stats['referenced']} old files still in use.")
+    if stats['errors']:
+        print(f"{stats['errors']} batches failed, see the log.")
+
+def reconcile_storage(fix, resume, show):
+    db = next(get_db())
+    run_id = resume or reconcile.createRun(db, fix).id
+    reconcile.runReconcile(db, run_id)
+    report = reconcile.runReport(db, run_id, limit=show)
+    print(f"Run {run_id}: {report['status']}{' (' + report['error'] + ')' if report['error'] else ''}")
+    print(f"Compared {report['stored_files']} stored files with {report['file_rows']} file records.")
+    print(f"Orphaned files: {report['orphaned_files']} ({report['orphaned_bytes']} bytes). "
+          f"Records without a file: {report['missing_files']}. Fixed: {report['fixed']}.")
+    for orphan in report['orphans']:
+        print(f"  {orphan['kind']:<4} {orphan['key']} {orphan['file_id'] or ''}")
+
+def expire_files(dry_run):
+    stats = retention.expireFiles(dry_run=dry_run)
+    verb = "Would remove" if dry_run else "Removed"
+    print(f"{verb} {stats['expired']} expired files ({stats['bytes_freed']} bytes) in {stats['duration_seconds']}s.")
+
+def backfill_expiry(hours):
+    db = next(get_db())
+    updated = retention.backfillExpiry(db, hours)
+    print(f"Set an expiry {hours} hours from now on {updated} files.")
+
+def expire_uploads(older_than_hours):
+    db = next(get_db())
+    stats = multipartManager.expireSessions(db, older_than_hours)
+    print(f"Aborted {stats['aborted']} multipart uploads, freed {stats['bytes_freed']} staged bytes.")
+
 # Command Dispatcher
 if args.command == 'list-users':
     list_users()
@@ -72,3 +146,21 @@ elif args.command == 'view-tasks':
 
 elif args.command == 'cancel-task':
     delete_task(args.task_id)
+
+elif args.command == 'migrate-storage':
+    migrate_storage(args.source, args.batch_size, args.dry_run)
+
+elif args.command == 'cleanup-files':
+    cleanup_files(args.older_than_hours, args.batch_size, args.dry_run)
+
+elif args.command == 'expire-files':
+    expire_files(args.dry_run)
+
+elif args.command == 'backfill-expiry':
+    backfill_expiry(args.hours)
+
+elif args.command == 'reconcile':
+    reconcile_storage(args.fix, args.resume, args.show)
+
+elif args.command == 'expire-uploads':
+    expire_uploads(args.older_than_hours)
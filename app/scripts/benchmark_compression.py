@@ -0,0 +1,131 @@
+"""
+Benchmark: disk space and CPU cost of compressing uploads before encryption.
+
+Runs every file of a corpus through each codec, the automatic choice
+(compression.chooseCodec) and segmented AES-GCM encryption, and reports the
+stored size ratio and throughput per codec. Without --corpus a mixed corpus is
+generated: text, CSV, logs, JSON, random binary (stands in for images and
+archives) and a PNG.
+
+    python -m app.scripts.benchmark_compression
+    python -m app.scripts.benchmark_compression --corpus /path/to/sample/files
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from app.FileManager import compression
+from app.Encryption_Services.encryptionService import SegmentedEncryptor
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def generated_corpus(scale_mb: float) -> dict[str, bytes]:
+    rng = random.Random(42)
+    target = int(scale_mb * 1024 * 1024)
+    words = "task file upload report invoice reminder schedule user error retry queue worker".split()
+
+    text = " ".join(rng.choice(words) for _ in range(target // 6)).encode()[:target]
+    csv_rows = ["id,user,amount,status,created_at"] + [
+        f"{i},{rng.randrange(1000)},{rng.random() * 1000:.2f},{rng.choice(['ok', 'failed'])},2024-01-{i % 28 + 1:02d}"
+        for i in range(target // 40)
+    ]
+    log_lines = [
+        f"2024-01-01 12:{i % 60:02d}:{i % 60:02d} INFO app.tasks send_reminder task_id={rng.randrange(10**6)} ok"
+        for i in range(target // 80)
+    ]
+    records = [{"id": i, "user": rng.randrange(1000), "tags": rng.sample(words, 3)} for i in range(target // 60)]
+    png = b"\x89PNG\r\n\x1a\n" + os.urandom(target // 2)
+
+    return {
+        "notes.txt": text,
+        "export.csv": "\n".join(csv_rows).encode()[:target],
+        "worker.log": "\n".join(log_lines).encode()[:target],
+        "records.json": json.dumps(records).encode()[:target],
+        "blob.bin": os.urandom(target),
+        "photo.png": png,
+    }
+
+
+def load_corpus(directory: str) -> dict[str, bytes]:
+    corpus = {}
+    for root, _, files in os.walk(directory):
+        for name in files:
+            with open(os.path.join(root, name), "rb") as f:
+                corpus[os.path.relpath(os.path.join(root, name), directory)] = f.read()
+    return corpus
+
+
+def store(data: bytes, codec: str | None, cipher: AESGCM) -> tuple[int, float, float]:
+    """Compress + encrypt like an upload does. Returns (stored bytes, compress seconds, encrypt seconds)."""
+    compressor = compression.compressor(codec)
+    encryptor = SegmentedEncryptor(cipher, "bench")
+    stored = 0
+    compress_time = encrypt_time = 0.0
+    for offset in range(0, len(data), CHUNK_SIZE):
+        started = time.perf_counter()
+        chunk = compressor.compress(data[offset:offset + CHUNK_SIZE])
+        compress_time += time.perf_counter() - started
+        started = time.perf_counter()
+        stored += len(encryptor.update(chunk))
+        encrypt_time += time.perf_counter() - started
+    started = time.perf_counter()
+    tail = compressor.flush()
+    compress_time += time.perf_counter() - started
+    stored += len(encryptor.update(tail)) + len(encryptor.finalize())
+    return stored, compress_time, encrypt_time
+
+
+def decompress_time(data: bytes, codec: str | None) -> float:
+    compressed = compression.compressor(codec)
+    packed = compressed.compress(data) + compressed.flush()
+    started = time.perf_counter()
+    compression.decompress(codec, packed)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compression before encryption: space saved vs CPU")
+    parser.add_argument("--corpus", help="Directory of sample files (default: generated mixed corpus)")
+    parser.add_argument("--scale-mb", type=float, default=4, help="Size of each generated file")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else generated_corpus(args.scale_mb)
+    cipher = AESGCM(AESGCM.generate_key(bit_length=256))
+    codecs = [None, compression.CODEC_ZLIB] + ([compression.CODEC_ZSTD] if compression.zstandard else [])
+    original = sum(len(data) for data in corpus.values())
+
+    print(f"corpus: {len(corpus)} files, {original / 1024 / 1024:.1f} MiB")
+    print(f"{'codec':<8} {'stored':>10} {'ratio':>7} {'compress':>12} {'decompress':>12} {'encrypt':>10}")
+    for codec in codecs + ["auto"]:
+        stored = 0
+        compress_s = decompress_s = encrypt_s = 0.0
+        for name, data in corpus.items():
+            chosen = compression.chooseCodec(name, len(data), data[:compression.PROBE_SIZE]) if codec == "auto" else codec
+            size, c_time, e_time = store(data, chosen, cipher)
+            stored += size
+            compress_s += c_time
+            encrypt_s += e_time
+            decompress_s += decompress_time(data, chosen) if chosen else 0.0
+        mb = original / 1024 / 1024
+        print(
+            f"{codec or 'none':<8} {stored / 1024 / 1024:>8.1f}Mi {stored / original:>7.3f} "
+            f"{mb / compress_s if compress_s else float('inf'):>8.0f}MB/s "
+            f"{mb / decompress_s if decompress_s else float('inf'):>8.0f}MB/s "
+            f"{mb / encrypt_s:>6.0f}MB/s"
+        )
+
+    print("\nauto choice per file:")
+    for name, data in corpus.items():
+        probe = data[:compression.PROBE_SIZE]
+        print(f"  {name:<20} entropy={compression.entropy(probe):.2f} -> "
+              f"{compression.chooseCodec(name, len(data), probe) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Benchmark: due task dispatch with a large backlog of future tasks.
+
+Inserts --future tasks scheduled days ahead (1M by default) and --due tasks
+falling due over --seconds starting --lead seconds from now, runs the
+dispatcher until they are all sent, and reports:
+
+    published   messages sent to the broker, only ever the due ones; with ETA
+                publishing all --future tasks would be in Redis and prefetched
+                into worker memory until they were due
+    lag         schedule_time to publish, bounded by DISPATCH_POLL_SECONDS
+                however many future tasks there are, and by a tick of the
+                timing wheel for tasks scheduled more than a poll ahead
+    rss         dispatcher process memory before/after the backlog and at the end
+    claim       time of one claim on the (status, schedule_time) index
+
+Publishing is only timed (nothing reaches a broker) unless --broker is given.
+The benchmark's tasks are deleted afterwards.
+
+    DATABASE_URL=sqlite:////tmp/dispatch.db python -m app.scripts.benchmark_dispatch
+    python -m app.scripts.benchmark_dispatch --future 100000 --due 2000 --seconds 10 --poll 0.5
+    python -m app.scripts.benchmark_dispatch --future 100000 --horizon 0
+"""
+
+import argparse
+import os
+import random
+import statistics
+import threading
+import time
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from sqlalchemy import delete, insert
+
+from app.config import DISPATCH_HORIZON_SECONDS
+from app.models.database import Base, SessionLocal, engine
+from app.models.tasks import Task
+from app.utils import dispatcher
+from app.dependencies.constants import TASK_STATUS_SCHEDULED, TASK_TYPE_REMINDER
+
+BENCH_USER = "benchmark-dispatch"
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(int(len(ordered) * pct / 100), len(ordered) - 1)
+    return ordered[index]
+
+
+def task_row(schedule_time: datetime) -> dict:
+    return {
+        "id": str(uuid4()),
+        "user_id": BENCH_USER,
+        "task_type": TASK_TYPE_REMINDER,
+        "schedule_time": schedule_time,
+        "status": TASK_STATUS_SCHEDULED,
+        "title": "benchmark",
+        "receiver_email": "bench@example.com",
+    }
+
+
+def insert_future(count: int, chunk: int = 20000) -> float:
+    start = time.perf_counter()
+    now = datetime.utcnow()
+    with SessionLocal() as db:
+        for offset in range(0, count, chunk):
+            rows = [
+                task_row(now + timedelta(days=1, seconds=random.randint(0, 6 * 24 * 3600)))
+                for _ in range(min(chunk, count - offset))
+            ]
+            db.execute(insert(Task), rows)
+            db.commit()
+    return time.perf_counter() - start
+
+
+def insert_due(count: int, seconds: float, lead: float):
+    # due tasks spread evenly over the run, inserted up front: a writer racing the dispatcher on
+    # SQLite would mostly measure the claims waiting for the write lock
+    start = datetime.utcnow() + timedelta(seconds=lead)
+    with SessionLocal() as db:
+        db.execute(insert(Task), [task_row(start + timedelta(seconds=seconds * i / count)) for i in range(count)])
+        db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--future", type=int, default=1_000_000, help="Tasks scheduled days ahead")
+    parser.add_argument("--due", type=int, default=5000, help="Tasks falling due during the run")
+    parser.add_argument("--seconds", type=float, default=20, help="Seconds over which the due tasks fall due")
+    parser.add_argument("--lead", type=float, default=2.0, help="Seconds until the first due task")
+    parser.add_argument("--poll", type=float, default=1.0, help="Dispatcher poll interval")
+    parser.add_argument("--horizon", type=float, default=DISPATCH_HORIZON_SECONDS, help="Timing wheel horizon, 0 for none")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--broker", action="store_true", help="Really publish to the Celery broker")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    lags, published = [], []
+
+    def record(tasks):
+        if args.broker:
+            dispatcher.publish_batch(tasks)
+        sent = datetime.utcnow()
+        published.extend(task.id for task in tasks)
+        lags.extend((sent - task.schedule_time).total_seconds() for task in tasks)
+
+    try:
+        rss_start = rss_mb()
+        took = insert_future(args.future)
+        print(f"inserted {args.future} future tasks in {took:.1f}s")
+        rss_backlog = rss_mb()
+
+        with SessionLocal() as db:
+            start = time.perf_counter()
+            dispatcher.dispatch_due(db, publish=record)
+            claim_ms = (time.perf_counter() - start) * 1000
+
+        stop = threading.Event()
+        loop = threading.Thread(
+            target=dispatcher.run_dispatcher,
+            kwargs={
+                "poll_seconds": args.poll,
+                "batch_size": args.batch_size,
+                "stop": stop,
+                "publish": record,
+                "horizon_seconds": args.horizon,
+            },
+        )
+        insert_due(args.due, args.seconds, args.lead)
+        loop.start()
+        deadline = time.monotonic() + args.lead + args.seconds + args.poll + 5
+        while len(published) < args.due and time.monotonic() < deadline:
+            time.sleep(0.05)
+        stop.set()
+        loop.join()
+        rss_end = rss_mb()
+
+        print(f"published   {len(published)} of {args.due} due tasks, {args.future} future tasks untouched")
+        if lags:
+            print(
+                f"lag         p50 {statistics.median(lags) * 1000:.0f} ms, p99 {percentile(lags, 99) * 1000:.0f} ms, "
+                f"max {max(lags) * 1000:.0f} ms (poll {args.poll * 1000:.0f} ms, horizon {args.horizon:.0f}s)"
+            )
+        print(f"rss         {rss_start:.1f} MB at start, {rss_backlog:.1f} MB after backlog, {rss_end:.1f} MB at end")
+        print(f"claim       {claim_ms:.1f} ms with nothing due")
+    finally:
+        with SessionLocal() as db:
+            db.execute(delete(Task).where(Task.user_id == BENCH_USER))
+            db.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark: hashing throughput per algorithm and read strategy.
+
+Hashes temporary files of several sizes with every registered algorithm
+(sha256, blake2b and blake3 when installed) and three ways of reading them:
+
+    read      f.read(64 KiB) loop, the old HashHandler behaviour
+    readinto  one reused 1 MiB buffer (HashHandler below MMAP_THRESHOLD)
+    mmap      whole file mapped and hashed in one update (HashHandler above it)
+
+Numbers are from the page cache (each file is hashed once before timing), so
+they measure CPU cost, not the disk. Use them to pick HASH_ALGORITHM.
+
+    python -m app.scripts.benchmark_hashing
+    python -m app.scripts.benchmark_hashing --sizes 4K 1M 256M --repeat 5
+"""
+
+import argparse
+import mmap
+import os
+import tempfile
+import time
+
+from app.FileHash.API.HashFile import ALGORITHMS, HashHandler, READ_BUFFER_SIZE, new_hasher
+
+UNITS = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+
+def parse_size(text: str) -> int:
+    text = text.upper().rstrip("B")
+    if text[-1:] in UNITS:
+        return int(float(text[:-1]) * UNITS[text[-1]])
+    return int(text)
+
+
+def hash_read(path: str, algorithm: str) -> str:
+    hasher = new_hasher(algorithm)
+    with open(path, "rb") as f:
+        while chunk := f.read(64 * 1024):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def hash_readinto(path: str, algorithm: str) -> str:
+    hasher = new_hasher(algorithm)
+    buffer = bytearray(READ_BUFFER_SIZE)
+    view = memoryview(buffer)
+    with open(path, "rb") as f:
+        while read := f.readinto(buffer):
+            hasher.update(view[:read])
+    return hasher.hexdigest()
+
+
+def hash_mmap(path: str, algorithm: str) -> str:
+    hasher = new_hasher(algorithm)
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                hasher.update(mapped)
+    return hasher.hexdigest()
+
+
+METHODS = {
+    "read": hash_read,
+    "readinto": hash_readinto,
+    "mmap": hash_mmap,
+    "handler": lambda path, algorithm: HashHandler(path, algorithm).hash_file(),
+}
+
+
+def best_of(fn, path: str, algorithm: str, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(path, algorithm)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hash algorithm and read strategy throughput")
+    parser.add_argument("--sizes", nargs="+", default=["4K", "64K", "1M", "16M", "128M"])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"algorithms: {', '.join(ALGORITHMS)}")
+    print(f"{'size':>8} {'algorithm':<10} " + " ".join(f"{name:>10}" for name in METHODS))
+    with tempfile.TemporaryDirectory() as tmp:
+        for size_text in args.sizes:
+            size = parse_size(size_text)
+            path = os.path.join(tmp, f"sample_{size}")
+            with open(path, "wb") as f:
+                f.write(os.urandom(size))
+
+            for algorithm in ALGORITHMS:
+                # warm the page cache and check every method agrees
+                digests = {fn(path, algorithm) for fn in METHODS.values()}
+                assert len(digests) == 1, f"{algorithm} methods disagree on {size_text}"
+                rates = []
+                for fn in METHODS.values():
+                    seconds = best_of(fn, path, algorithm, args.repeat)
+                    rates.append(size / 1024 / 1024 / seconds if seconds else float("inf"))
+                print(f"{size_text:>8} {algorithm:<10} " + " ".join(f"{rate:>6.0f}MB/s" for rate in rates))
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
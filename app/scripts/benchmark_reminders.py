@@ -0,0 +1,128 @@
+"""
+Benchmark: co-due reminders sent one task per invocation vs in batches.
+
+Inserts --tasks reminder tasks due at the same time, among them one without a
+receiver email and one whose recipient the SMTP stub refuses, and sends them
+through send_reminder_batch against the stub from benchmark_smtp:
+
+    per task    one invocation per task with a new SMTP connection each,
+                which is what a send_reminder message per task cost
+    batched     chunks of --batch-size with one session and one connection
+
+For each it reports reminders per second and SQL statements per reminder, and
+checks that the two bad tasks failed on their own (the refused one marked for
+retry) while every other task was sent.
+
+    DATABASE_URL=sqlite:////tmp/reminders.db python -m app.scripts.benchmark_reminders
+"""
+
+import argparse
+import os
+import threading
+import time
+from datetime import datetime
+from uuid import uuid4
+
+from sqlalchemy import delete, event, insert
+
+from app.dependencies.constants import REMINDER_BATCH_SIZE, TASK_STATUS_SCHEDULED, TASK_TYPE_REMINDER
+from app.models.database import Base, SessionLocal, engine
+from app.models.tasks import Task, TaskHistory
+from app.models.user import UserModel
+from app.scripts.benchmark_smtp import StubServer
+# the Celery app first: app.tasks.tasks imports app.utils.email, which imports the app back
+from app.utils.celery_instance import celery_app  # noqa: F401
+from app.utils import email, smtp_pool
+
+BENCH_USER = "benchmark-reminders"
+
+
+def insert_tasks(count: int) -> list:
+    due = datetime.utcnow().replace(second=0, microsecond=0)
+    rows = [
+        {
+            "id": str(uuid4()),
+            "user_id": BENCH_USER,
+            "task_type": TASK_TYPE_REMINDER,
+            "schedule_time": due,
+            "status": TASK_STATUS_SCHEDULED,
+            "title": f"benchmark {i}",
+            "receiver_email": f"bench{i}@example.com",
+        }
+        for i in range(count)
+    ]
+    rows[0]["receiver_email"] = ""
+    rows[1]["receiver_email"] = "reject@example.com"
+    with SessionLocal() as db:
+        db.execute(insert(Task), rows)
+        db.commit()
+    return [row["id"] for row in rows]
+
+
+def run(task_ids: list, batch_size: int, max_messages: int, port: int) -> tuple[float, int, dict]:
+    smtp_pool._pool = smtp_pool.SmtpPool(
+        host="127.0.0.1", port=port, username="bench@example.com", password="password",
+        use_ssl=False, max_messages=max_messages
+    )
+    smtp_pool._pool_pid = os.getpid()
+    statements = [0]
+
+    def count(*_):
+        statements[0] += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+    outcome = {"sent": [], "failed": [], "retry": [], "missing": []}
+    start = time.perf_counter()
+    try:
+        for offset in range(0, len(task_ids), batch_size):
+            with SessionLocal() as db:
+                result = email.send_reminder_batch(db, task_ids[offset:offset + batch_size])
+            for key, ids in result.items():
+                outcome[key] += ids
+    finally:
+        took = time.perf_counter() - start
+        event.remove(engine, "before_cursor_execute", count)
+        smtp_pool._pool.close()
+    return took, statements[0], outcome
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=REMINDER_BATCH_SIZE)
+    parser.add_argument("--rtt-ms", type=float, default=1, help="Delay before every stub reply")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    server = StubServer(args.rtt_ms / 1000, None)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+    with SessionLocal() as db:
+        db.merge(UserModel(id=BENCH_USER, email=f"{BENCH_USER}@example.com", username=BENCH_USER))
+        db.commit()
+
+    ok = True
+    try:
+        for label, batch_size, max_messages in (("per task", 1, 1), ("batched", args.batch_size, 100)):
+            task_ids = insert_tasks(args.tasks)
+            took, statements, outcome = run(task_ids, batch_size, max_messages, port)
+            print(
+                f"{label:<11} {args.tasks / took:8.1f} reminders/s, {statements / args.tasks:.1f} statements per "
+                f"reminder, {len(outcome['sent'])} sent, {len(outcome['failed'])} failed, "
+                f"{len(outcome['retry'])} to retry"
+            )
+            ok &= set(outcome["failed"]) == set(task_ids[:1]) and set(outcome["retry"]) == set(task_ids[1:2])
+            ok &= len(outcome["sent"]) == args.tasks - 2
+    finally:
+        server.shutdown()
+        with SessionLocal() as db:
+            db.execute(delete(Task).where(Task.user_id == BENCH_USER))
+            db.execute(delete(TaskHistory).where(TaskHistory.user_id == BENCH_USER))
+            db.execute(delete(UserModel).where(UserModel.id == BENCH_USER))
+            db.commit()
+    print("OK" if ok else "FAILED: a bad task affected the others")
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark: scheduling tasks one per request vs POST /tasks/schedule_batch.
+
+Schedules --single tasks through /tasks/schedule, then --tasks tasks through
+/tasks/schedule_batch as one JSON array and again as an NDJSON stream, each
+in batches of --batch-size, and reports tasks per second for each. The batch
+endpoint only inserts rows (the dispatcher publishes them when due), so no
+broker is needed for the comparison.
+
+The tasks are scheduled a year ahead and deleted from the database at the
+end, so run it with the server's DATABASE_URL:
+
+    DATABASE_URL=sqlite:////tmp/dev.db python -m app.scripts.benchmark_schedule_batch --host http://127.0.0.1:8000
+"""
+
+import argparse
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import requests
+from sqlalchemy import delete
+
+from app.models.database import SessionLocal
+from app.models.tasks import Task
+
+
+def get_token(host):
+    name = f"bench-{uuid.uuid4().hex[:8]}"
+    requests.post(f"{host}/auth/register", json={"email": f"{name}@example.com", "password": name, "username": name})
+    r = requests.post(f"{host}/auth/login", data={"username": f"{name}@example.com", "password": name})
+    return r.json()["access_token"]
+
+
+def task_spec(title: str, index: int) -> dict:
+    return {
+        "title": title,
+        "task_type": "reminder",
+        "receiver_email": f"bench{index}@example.com",
+        "schedule_time": (datetime.utcnow() + timedelta(days=365, seconds=index)).isoformat(),
+    }
+
+
+def run_single(session, host, title, count) -> float:
+    start = time.perf_counter()
+    for index in range(count):
+        spec = task_spec(title, index)
+        r = session.post(f"{host}/tasks/schedule", data={**spec, "description": "benchmark"})
+        r.raise_for_status()
+    return time.perf_counter() - start
+
+
+def run_batch(session, host, title, count, batch_size, ndjson) -> float:
+    specs = [task_spec(title, index) for index in range(count)]
+    start = time.perf_counter()
+    for offset in range(0, count, batch_size):
+        chunk = specs[offset:offset + batch_size]
+        if ndjson:
+            body = "\n".join(json.dumps(spec) for spec in chunk)
+            r = session.post(
+                f"{host}/tasks/schedule_batch", data=body, headers={"Content-Type": "application/x-ndjson"}
+            )
+        else:
+            r = session.post(f"{host}/tasks/schedule_batch", json=chunk)
+        r.raise_for_status()
+        result = r.json()
+        if result["scheduled"] != len(chunk):
+            raise SystemExit(f"only {result['scheduled']} of {len(chunk)} scheduled: {result['results'][:3]}")
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="http://127.0.0.1:8000")
+    parser.add_argument("--single", type=int, default=500, help="Tasks scheduled one request each")
+    parser.add_argument("--tasks", type=int, default=50_000, help="Tasks scheduled through the batch endpoint")
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    args = parser.parse_args()
+
+    title = f"benchmark-{uuid.uuid4().hex[:8]}"
+    session = requests.Session()
+    session.headers["Authorization"] = f"Bearer {get_token(args.host)}"
+    try:
+        took = run_single(session, args.host, title, args.single)
+        print(f"single        {args.single} tasks in {took:.2f}s, {args.single / took:,.0f} tasks/s")
+        for label, ndjson in (("batch json", False), ("batch ndjson", True)):
+            took = run_batch(session, args.host, title, args.tasks, args.batch_size, ndjson)
+            print(f"{label:<13} {args.tasks} tasks in {took:.2f}s, {args.tasks / took:,.0f} tasks/s "
+                  f"({args.batch_size} per request)")
+    finally:
+        with SessionLocal() as db:
+            db.execute(delete(Task).where(Task.title == title))
+            db.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Benchmark: emails per second with a new SMTP connection per email vs the pool.
+
+Starts a local SMTP stub (implicit TLS with a throwaway self-signed
+certificate, AUTH PLAIN, every reply delayed by --rtt-ms to stand in for the
+network) and sends --emails messages the way send_email_task used to (connect,
+TLS handshake, login, send, quit) and then through SmtpPool. Reports emails per
+second and connections opened for each.
+
+It then has the stub drop the pool's idle connection and sends once more,
+which must reconnect instead of failing.
+
+    python -m app.scripts.benchmark_smtp
+    python -m app.scripts.benchmark_smtp --emails 500 --rtt-ms 20 --no-tls
+"""
+
+import argparse
+import datetime
+import os
+import smtplib
+import socket
+import socketserver
+import ssl
+import tempfile
+import threading
+import time
+from email.message import EmailMessage
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+from app.utils.smtp_pool import SmtpPool
+
+
+class StubHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib: accepts and discards every message, refuses recipients containing "reject"."""
+
+    def reply(self, line: str) -> None:
+        time.sleep(self.server.rtt)
+        self.wfile.write(line.encode() + b"\r\n")
+        self.wfile.flush()
+
+    def handle(self):
+        if self.server.context is not None:
+            self.connection = self.request = self.server.context.wrap_socket(self.request, server_side=True)
+            self.setup()
+        self.server.open_connections.add(self.request)
+        self.server.stats["connections"] += 1
+        try:
+            self.reply("220 stub ESMTP")
+            while True:
+                line = self.rfile.readline()
+                if not line:
+                    return
+                verb = line[:4].upper()
+                if verb == b"EHLO":
+                    self.reply("250-stub\r\n250-AUTH PLAIN\r\n250 8BITMIME")
+                elif verb == b"AUTH":
+                    self.reply("235 2.7.0 Authentication successful")
+                elif verb == b"DATA":
+                    self.reply("354 End data with <CR><LF>.<CR><LF>")
+                    while self.rfile.readline() not in (b".\r\n", b""):
+                        pass
+                    self.server.stats["messages"] += 1
+                    self.reply("250 2.0.0 Ok: queued")
+                elif verb == b"RCPT" and b"reject" in line.lower():
+                    # lets callers exercise a refused recipient
+                    self.reply("550 5.1.1 Recipient rejected")
+                elif verb == b"QUIT":
+                    self.reply("221 2.0.0 Bye")
+                    return
+                else:
+                    # HELO, MAIL, RCPT, RSET, NOOP
+                    self.reply("250 2.0.0 Ok")
+        except (OSError, ssl.SSLError):
+            return
+        finally:
+            self.server.open_connections.discard(self.request)
+
+
+class StubServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, rtt: float, context: ssl.SSLContext | None):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.rtt = rtt
+        self.context = context
+        self.open_connections = set()
+        self.stats = {"connections": 0, "messages": 0}
+
+    def drop_all(self) -> None:
+        for sock in list(self.open_connections):
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+def server_context(directory: str) -> ssl.SSLContext:
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now).not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    cert_path, key_path = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ))
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert_path, key_path)
+    return context
+
+
+def client_context() -> ssl.SSLContext:
+    # the stub's certificate is self-signed
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+def message(index: int) -> EmailMessage:
+    msg = EmailMessage()
+    msg["From"] = "bench@example.com"
+    msg["To"] = f"bench{index}@example.com"
+    msg["Subject"] = f"Reminder: Task 'benchmark {index}' Due"
+    msg.set_content("Dear recipient,\n\nThis is a reminder for your upcoming task.\n" * 5)
+    return msg
+
+
+def send_unpooled(port: int, tls: bool, msg: EmailMessage) -> None:
+    # what send_email_task did for every email
+    if tls:
+        server = smtplib.SMTP_SSL("127.0.0.1", port, context=client_context())
+    else:
+        server = smtplib.SMTP("127.0.0.1", port)
+    with server:
+        server.login("bench@example.com", "password")
+        server.send_message(msg)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emails", type=int, default=300)
+    parser.add_argument("--rtt-ms", type=float, default=5, help="Delay before every stub reply")
+    parser.add_argument("--max-messages", type=int, default=100, help="Messages per pooled connection")
+    parser.add_argument("--no-tls", action="store_true", help="Plain SMTP instead of implicit TLS")
+    args = parser.parse_args()
+    tls = not args.no_tls
+
+    with tempfile.TemporaryDirectory() as directory:
+        server = StubServer(args.rtt_ms / 1000, server_context(directory) if tls else None)
+    port = server.server_address[1]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    messages = [message(i) for i in range(args.emails)]
+
+    start = time.perf_counter()
+    for msg in messages:
+        send_unpooled(port, tls, msg)
+    took = time.perf_counter() - start
+    print(f"per email   {args.emails / took:8.1f} emails/s, {server.stats['connections']} connections")
+
+    server.stats["connections"] = 0
+    pool = SmtpPool(
+        host="127.0.0.1", port=port, username="bench@example.com", password="password",
+        use_ssl=tls, context=client_context(), max_messages=args.max_messages
+    )
+    start = time.perf_counter()
+    for msg in messages:
+        pool.send_message(msg)
+    took = time.perf_counter() - start
+    print(f"pooled      {args.emails / took:8.1f} emails/s, {server.stats['connections']} connections")
+
+    # make sure an idle connection is pooled, then have the server drop it
+    pool.send_message(messages[0])
+    server.drop_all()
+    time.sleep(0.1)
+    dropped = pool.stats["dropped"]
+    pool.send_message(messages[1])
+    pool.close()
+    server.shutdown()
+    print(f"reconnect   {pool.stats['dropped'] - dropped} dropped connection replaced, message sent ({pool.stats})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Load test: /health latency while a burst of large uploads is in progress.
+
+Measures /health latency on its own first, then again while --uploads
+concurrent uploads of --size-mb each hit /files/upload. With hashing,
+encryption and disk I/O on the executor pools the p99 should stay flat;
+uploads beyond the in-flight byte budget come back as 503 + Retry-After.
+
+    python -m app.scripts.load_test_uploads --host http://127.0.0.1:8000 --uploads 20
+"""
+
+import argparse
+import os
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(int(len(ordered) * pct / 100), len(ordered) - 1)
+    return ordered[index]
+
+
+def get_token(host):
+    name = f"load-{uuid.uuid4().hex[:8]}"
+    requests.post(f"{host}/auth/register", json={"email": f"{name}@example.com", "password": name, "username": name})
+    r = requests.post(f"{host}/auth/login", data={"username": f"{name}@example.com", "password": name})
+    return r.json()["access_token"]
+
+
+def poll_health(host, stop, samples):
+    session = requests.Session()
+    while not stop.is_set():
+        start = time.perf_counter()
+        session.get(f"{host}/health")
+        samples.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.01)
+
+
+def measure_health(host, seconds):
+    samples, stop = [], threading.Event()
+    poller = threading.Thread(target=poll_health, args=(host, stop, samples))
+    poller.start()
+    time.sleep(seconds)
+    stop.set()
+    poller.join()
+    return samples
+
+
+def upload(host, token, payload):
+    r = requests.post(
+        f"{host}/files/upload",
+        files={"file": ("load.bin", payload)},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    return r.status_code
+
+
+def report(label, samples):
+    print(
+        f"{label:<16} n={len(samples):<5} p50={statistics.median(samples):7.2f}ms "
+        f"p99={percentile(samples, 99):7.2f}ms max={max(samples):7.2f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upload burst vs /health latency")
+    parser.add_argument("--host", default="http://127.0.0.1:8000")
+    parser.add_argument("--uploads", type=int, default=20)
+    parser.add_argument("--size-mb", type=float, default=10)
+    parser.add_argument("--baseline-seconds", type=float, default=3)
+    args = parser.parse_args()
+
+    token = get_token(args.host)
+    payload = os.urandom(int(args.size_mb * 1024 * 1024))
+
+    report("idle /health", measure_health(args.host, args.baseline_seconds))
+
+    samples, stop = [], threading.Event()
+    poller = threading.Thread(target=poll_health, args=(args.host, stop, samples))
+    poller.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.uploads) as pool:
+        codes = list(pool.map(lambda _: upload(args.host, token, payload), range(args.uploads)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    poller.join()
+
+    report("burst /health", samples)
+    print(f"uploads: {codes.count(200)} ok, {codes.count(503)} busy (503), "
+          f"{len(codes) - codes.count(200) - codes.count(503)} other, {elapsed:.1f}s total")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,27 +8,28 @@ Yes i know its shit
 
 """
 
-import os
+import json
 
-from datetime import datetime, timedelta
-from celery import shared_task
+from datetime import datetime
+from celery import shared_task, group
+from celery.utils.time import get_exponential_backoff_interval
 from sqlalchemy.orm import Session
 from dotenv import load_dotenv
 
 from app.models.tasks import Task, TaskHistory
 from app.utils.celery_instance import celery_app
 from app.models.database import SessionLocal
-from app.utils.email import send_completion_email
+from app.utils.email import send_completion_email, send_reminder_batch
 from app.utils.logger import SingletonLogger
-from app.models.file import FileModel
 from typing import Optional
 from app.dependencies.constants import (
     TASK_STATUS_RUNNING,
     TASK_STATUS_COMPLETED,
     TASK_STATUS_FAILED,
-    FILE_STORAGE_DIR,
+    REMINDER_MAX_RETRIES,
 )
-from app.utils.discord import send_discord_notification
+from app.Encryption_Services import keyRotation
+from app.FileManager import duplicateReport, reconcile, retention, scrubber, multipartManager
 
 logger = SingletonLogger().get_logger()
 
@@ -53,140 +54,199 @@ def log_task_history(
 
 
 @celery_app.task(name="app.tasks.tasks.file_cleanup")
-def file_cleanup(task_id: int, receiver_email: Optional[str])-> None:
+def file_cleanup(task_id: int, receiver_email: Optional[str], dry_run: bool = False) -> Optional[dict]:
     """
-    Delete files older than 1 day and update task status.
+    Remove the task owner's files whose retention has expired and update task status.
+
+    Expired rows are found through the files.expires_at index, so the run
+    costs what is expiring, not what is stored; the stats of the run are
+    written as JSON to TaskHistory.details.
     """
-    task: Optional[Task] = None
+    user_id: Optional[str] = None
 
     try:
         with SessionLocal() as db:
             task = db.query(Task).filter(Task.id == task_id).first()
 
             if not task:
-                task.sc
                 logger.warning(f"No task found with ID {task_id}")
-                return
+                return None
             # Mark task as running
             task.status = TASK_STATUS_RUNNING
+            user_id = task.user_id
             db.commit()
 
-            threshold = datetime.now() - timedelta(days=1)
-            deleted_count = 0
-
-            for file in os.listdir(FILE_STORAGE_DIR):
-                filepath = os.path.join(FILE_STORAGE_DIR, file)
-                if os.path.isfile(filepath) and datetime.fromtimestamp(os.path.getmtime(filepath)) < threshold:
-                    os.remove(filepath)
-                    deleted_count += 1
-
-            logger.info(f"Deleted {deleted_count} old files.")
+        # only the files of the user who scheduled the task
+        stats = retention.expireFiles(dry_run=dry_run, user_id=user_id)
 
+        with SessionLocal() as db:
             # Mark task completed
-            task.status = TASK_STATUS_COMPLETED
+            db.query(Task).filter(Task.id == task_id).update({Task.status: TASK_STATUS_COMPLETED})
             db.commit()
-            
 
-
-            details_msg = f"Deleted {deleted_count} files"
             if receiver_email:
                 send_completion_email(task_id, receiver_email)
-                send_discord_notification()
                 logger.info(f"Sent task completion email to {receiver_email}")
-                details_msg += f", email sent to {receiver_email}"
             else:
                 logger.warning(f"Task {task_id} has no receiver_email. No email sent.")
-                details_msg += ", no email sent"
+            stats["email_sent_to"] = receiver_email
 
-            log_task_history(db, task_type="file_cleanup", status="COMPLETED", details=details_msg)
+            log_task_history(
+                db,
+                task_type="file_cleanup",
+                status="COMPLETED",
+                details=json.dumps(stats),
+                user_id=user_id,
+                executed_time=datetime.now()
+            )
+        return stats
 
     except Exception as e:
         logger.exception(f"File cleanup failed for task_id={task_id}: {e}")
 
-        if task:
+        if user_id is not None:
             try:
                 with SessionLocal() as db:
-                    task.status = TASK_STATUS_FAILED
-                    db.merge(task)
+                    db.query(Task).filter(Task.id == task_id).update({Task.status: TASK_STATUS_FAILED})
                     db.commit()
-                    log_task_history(db, task_type="file_cleanup", status="FAILED", details=str(e), user_id=task.user_id)
+                    log_task_history(
+                        db,
+                        task_type="file_cleanup",
+                        status="FAILED",
+                        details=str(e),
+                        user_id=user_id,
+                        executed_time=datetime.now()
+                    )
             except Exception as db_error:
                 logger.error(f"Failed to update task status after failure: {db_error}")
+        return None
+
+
+def _send_reminders(task, task_ids: list) -> dict:
+    with SessionLocal() as db:
+        result = send_reminder_batch(db, task_ids)
+    # only the tasks whose send hit an SMTP error are retried, with the backoff send_email_task uses
+    if result["retry"]:
+        retries = task.request.retries or 0
+        if retries < REMINDER_MAX_RETRIES:
+            countdown = get_exponential_backoff_interval(factor=1, retries=retries, maximum=600, full_jitter=True)
+            # always as send_reminders, a send_reminder retry would need a single id
+            send_reminders.apply_async(args=[result["retry"]], countdown=countdown, retries=retries + 1)
+            logger.info(f"Retrying reminders {result['retry']} in {countdown}s (retry {retries + 1})")
+        else:
+            logger.error(f"Giving up on reminders {result['retry']} after {REMINDER_MAX_RETRIES} retries")
+    return result
+
+
+@celery_app.task(name="app.tasks.tasks.send_reminders", bind=True)
+def send_reminders(self, task_ids: list) -> dict:
+    """
+    Send the reminder emails of a chunk of co-due tasks in one go.
 
+    The dispatcher groups the reminders it claims together into chunks of
+    REMINDER_BATCH_SIZE, see app/utils/email.py send_reminder_batch.
+    """
+    return _send_reminders(self, task_ids)
 
 
-
-@celery_app.task(name="app.tasks.tasks.send_reminder")
+@celery_app.task(name="app.tasks.tasks.send_reminder", bind=True)
 def send_reminder(
-    task_id: int,
+    self,
+    task_id: str,
     receiver_email: str,
-    file_id: int
-    ) -> None:
-
+    file_id: Optional[str]
+    ) -> dict:
     """
     Send reminder email for a scheduled task.
+
+    Kept for messages published one task at a time; receiver_email and
+    file_id are read from the task row like in send_reminders.
     """
-    task: Optional[Task] = None
-    file: Optional[FileModel] = None
-    
+    return _send_reminders(self, [task_id])
 
-    try:
-        with SessionLocal() as db:
-            task = db.query(Task).filter(Task.id == task_id).first()
-            file = db.query(FileModel).filter(FileModel.id == file_id).first()
 
-            if not task or file:
-                logger.warning(f"No task/file found with ID {task_id} and or {file_id}")
-                #either way a task can be created without a file or it saving garbage
-                file = None
-                return
-            
+@celery_app.task(name="app.tasks.tasks.rotate_keys")
+def rotate_keys(job_id: str) -> int:
+    """
+    Fan a key rotation job out as one rotate_user_key task per unfinished user.
 
-            task.status = TASK_STATUS_RUNNING
-            db.commit()
+    Also used to resume a job: users that already completed are not dispatched again.
+    """
+    with SessionLocal() as db:
+        user_ids = keyRotation.unfinishedUsers(db, job_id)
+        keyRotation.refreshJob(db, job_id)
 
-            reminder_time = task.schedule_time
-            if reminder_time:
-                logger.info(
-                    f"[Reminder] Task scheduled for {reminder_time} | Type: {task.task_type}"
-                )
-            else:
-                logger.warning("Task has no schedule_time set.")
+    if user_ids:
+        group(rotate_user_key.s(job_id, user_id) for user_id in user_ids).apply_async()
+    logger.info(f"Key rotation job {job_id}: dispatched {len(user_ids)} users")
+    return len(user_ids)
 
-            
-            send_completion_email(task_id, receiver_email,file_id)
 
-            #this is where we send the notification, but it should not just send this. I need to add better information
-            logger.info(f"Sent reminder email to {receiver_email}")
+@celery_app.task(name="app.tasks.tasks.rotate_user_key")
+def rotate_user_key(job_id: str, user_id: str) -> str:
+    """Rotate one user's key, then update the job's overall status."""
+    with SessionLocal() as db:
+        result = keyRotation.rotateUser(db, job_id, user_id)
+        keyRotation.refreshJob(db, job_id)
+    return result
 
-            db.commit()
-            log_task_history(
-                db,
-                task_type="Send Reminder",
-                status=task.status,
-                details=f"Reminder email sent to {receiver_email}",
-                user_id=task.user_id,
-                executed_time=reminder_time
-            )
 
-    except Exception as e:
-        logger.exception(f"Reminder task failed for ID {task_id}: {e}")
-        if task:
-            try:
-                with SessionLocal() as db:
-                    task.status = TASK_STATUS_FAILED
-                    db.merge(task)
-                    db.commit()
-                    log_task_history(
-                        db,
-                        task_type="send_reminder",
-                        status="FAILED",
-                        details=str(e),
-                        user_id=task.user_id, 
-                        executed_time=datetime.now()
-                    )
-            except Exception as db_error:
-                logger.error(f"Failed to update task status after reminder failure: {db_error}")
+@celery_app.task(name="app.tasks.tasks.scrub_files")
+def scrub_files(run_id: str) -> dict:
+    """
+    Verify stored files (GCM tags and plaintext hashes) for a scrub run, rate limited.
+
+    Resumes from the run's checkpoint, so re-sending it after a worker crash
+    carries on where the run stopped.
+    """
+    with SessionLocal() as db:
+        run = scrubber.runScrub(db, run_id)
+        if run is None:
+            logger.warning(f"Scrub run {run_id} not found")
+            return {}
+        return {"status": run.status, "files_checked": run.files_checked, "files_failed": run.files_failed}
 
 
-__all__ = ["shared_task", "send_reminder", "file_cleanup"]
+@celery_app.task(name="app.tasks.tasks.reconcile_storage")
+def reconcile_storage(run_id: Optional[str] = None, fix: bool = False) -> dict:
+    """
+    Find (and with fix, delete) stored files without rows and rows without stored files.
+
+    Without run_id a new run is started; with one, that run resumes from its checkpoint.
+    """
+    with SessionLocal() as db:
+        if run_id is None:
+            run_id = reconcile.createRun(db, fix).id
+        run = reconcile.runReconcile(db, run_id)
+        if run is None:
+            logger.warning(f"Reconcile run {run_id} not found")
+            return {}
+        return reconcile.runReport(db, run_id, limit=0)
+
+
+@celery_app.task(name="app.tasks.tasks.expire_upload_sessions")
+def expire_upload_sessions() -> dict:
+    """Abort multipart uploads abandoned for UPLOAD_SESSION_MAX_AGE_HOURS and delete their staged files."""
+    with SessionLocal() as db:
+        stats = multipartManager.expireSessions(db)
+    logger.info(f"Expired {stats['aborted']} multipart uploads, {stats['bytes_freed']} staged bytes freed")
+    return stats
+
+
+@celery_app.task(name="app.tasks.tasks.duplicate_report")
+def duplicate_report(
+    user_id: Optional[str] = None,
+    limit: int = duplicateReport.DEFAULT_PAGE_SIZE,
+    offset: int = 0
+) -> dict:
+    """Duplicate groups of user_id (all users when None) from stored hashes; no file is read."""
+    with SessionLocal() as db:
+        report = duplicateReport.duplicateReport(db, user_id, limit, offset)
+    logger.info(
+        f"Duplicate report for {user_id or 'all users'}: {report['groups']} groups, "
+        f"{report['reclaimable_bytes']} bytes reclaimable"
+    )
+    return report
+
+
+__all__ = ["shared_task", "send_reminder", "send_reminders", "file_cleanup", "rotate_keys", "rotate_user_key", "scrub_files", "reconcile_storage", "expire_upload_sessions", "duplicate_report"]
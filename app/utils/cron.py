@@ -0,0 +1,137 @@
+"""
+Cron expressions for recurring task schedules.
+
+Standard five fields, evaluated in UTC:
+
+    minute  hour  day-of-month  month  day-of-week
+    0-59    0-23  1-31          1-12   0-7 (0 and 7 are Sunday)
+
+Each field takes ``*``, values, ranges ``a-b``, steps ``*/n`` or ``a-b/n``
+and comma separated lists of those; months and weekdays also take names
+(``jan``, ``mon``). ``@yearly``, ``@monthly``, ``@weekly``, ``@daily`` and
+``@hourly`` are accepted as shorthands. As in Vixie cron, when both the day of
+month and the day of week are restricted a day matching either one fires.
+
+An expression is parsed once into sorted tuples of allowed values
+(compile_cron caches the result per expression string), and next_after()
+jumps field by field to the next match instead of stepping minute by minute.
+"""
+
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+MACROS = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *",
+}
+MONTH_NAMES = {name: number for number, name in enumerate(
+    ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"), start=1
+)}
+DAY_NAMES = {name: number for number, name in enumerate(("sun", "mon", "tue", "wed", "thu", "fri", "sat"))}
+
+# an expression that matches nothing within this many years (say 30 2 *) never fires
+_SEARCH_YEARS = 8
+
+
+def _parse_field(text: str, low: int, high: int, names: dict | None = None) -> tuple[int, ...]:
+    def value(token: str) -> int:
+        token = token.lower()
+        if names and token in names:
+            return names[token]
+        if not token.isdigit():
+            raise ValueError(f"invalid value {token!r}")
+        return int(token)
+
+    allowed = set()
+    for part in text.split(","):
+        part, _, step = part.partition("/")
+        step = int(step) if step else 1
+        if step < 1:
+            raise ValueError(f"invalid step in {text!r}")
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = (value(bound) for bound in part.split("-", 1))
+        else:
+            start = value(part)
+            # "5/15" means every 15 from 5
+            end = high if step > 1 else start
+        if not low <= start <= end <= high:
+            raise ValueError(f"{text!r} is outside {low}-{high}")
+        allowed.update(range(start, end + 1, step))
+    return tuple(sorted(allowed))
+
+
+class CronExpression:
+    """A parsed cron expression; use compile_cron() to get a cached one."""
+
+    def __init__(self, expression: str):
+        self.expression = expression.strip()
+        fields = MACROS.get(self.expression.lower(), self.expression).split()
+        if len(fields) != 5:
+            raise ValueError("a cron expression has 5 fields: minute hour day-of-month month day-of-week")
+        minute, hour, day, month, weekday = fields
+        self.minutes = _parse_field(minute, 0, 59)
+        self.hours = _parse_field(hour, 0, 23)
+        self.days = _parse_field(day, 1, 31)
+        self.months = _parse_field(month, 1, 12, MONTH_NAMES)
+        # cron counts Sunday as 0 (or 7), datetime.weekday() as 6
+        self.weekdays = frozenset((d - 1) % 7 for d in _parse_field(weekday, 0, 7, DAY_NAMES))
+        # like Vixie cron, "*/2" counts as unrestricted for the day-of-month / day-of-week rule
+        self._any_day = day.startswith("*")
+        self._any_weekday = weekday.startswith("*")
+        # the tuples are for bisecting to the next value, the sets for membership
+        self._minute_set, self._hour_set = frozenset(self.minutes), frozenset(self.hours)
+        self._day_set, self._month_set = frozenset(self.days), frozenset(self.months)
+        # fail now rather than on the first next_after() for dates that don't exist (30 2 *)
+        self.next_after(datetime(2000, 1, 1))
+
+    def __repr__(self) -> str:
+        return f"CronExpression({self.expression!r})"
+
+    def _day_matches(self, when: datetime) -> bool:
+        in_days = when.day in self._day_set
+        in_weekdays = when.weekday() in self.weekdays
+        if self._any_day or self._any_weekday:
+            return in_days and in_weekdays
+        return in_days or in_weekdays
+
+    def next_after(self, after: datetime) -> datetime:
+        """The first time strictly after `after` (naive UTC) the expression fires."""
+        when = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = when.year + _SEARCH_YEARS
+        while when.year <= limit:
+            if when.month not in self._month_set:
+                i = bisect_left(self.months, when.month)
+                if i == len(self.months):
+                    when = datetime(when.year + 1, self.months[0], 1)
+                else:
+                    when = datetime(when.year, self.months[i], 1)
+                continue
+            if not self._day_matches(when):
+                when = datetime(when.year, when.month, when.day) + timedelta(days=1)
+                continue
+            if when.hour not in self._hour_set:
+                i = bisect_left(self.hours, when.hour)
+                day = datetime(when.year, when.month, when.day)
+                when = day + timedelta(days=1) if i == len(self.hours) else day + timedelta(hours=self.hours[i])
+                continue
+            if when.minute not in self._minute_set:
+                i = bisect_left(self.minutes, when.minute)
+                hour = when.replace(minute=0)
+                when = hour + timedelta(hours=1) if i == len(self.minutes) else hour.replace(minute=self.minutes[i])
+                continue
+            return when
+        raise ValueError(f"cron expression {self.expression!r} never fires")
+
+
+@lru_cache(maxsize=4096)
+def compile_cron(expression: str) -> CronExpression:
+    """Parse expression once; raises ValueError when it is invalid."""
+    return CronExpression(expression)
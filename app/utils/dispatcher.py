@@ -0,0 +1,320 @@
+"""
+Dispatcher that sends Task rows to the broker when they fall due.
+
+Tasks used to be published at scheduling time with an ETA, which left every
+future task sitting in Redis and prefetched into worker memory until it was
+due (and redelivered once its ETA ran past the broker's visibility timeout).
+Now the tasks table is the schedule: scheduling only inserts the row, and this
+process polls the (status, schedule_time) index for rows that are due,
+claims a batch and publishes just those.
+
+Claiming is one statement:
+
+    UPDATE tasks SET status = 'queued', dispatched_at = now
+    WHERE id IN (SELECT id FROM tasks
+                 WHERE status = 'scheduled' AND schedule_time <= now
+                 ORDER BY schedule_time LIMIT n
+                 FOR UPDATE SKIP LOCKED)
+    RETURNING ...
+
+On Postgres, SKIP LOCKED lets several dispatchers run side by side without
+claiming the same row or waiting on each other. SQLite has no row locks but
+only ever runs one writer, so the same UPDATE without the lock clause is just
+as safe there. The batch is published before the claim commits, so a
+dispatcher dying in between leaves its rows scheduled for the next one
+(a task may then be sent twice, it is never lost).
+
+Tasks due within DISPATCH_HORIZON_SECONDS are also kept on an in-memory
+TimingWheel (ids and due times only) and claimed by id the tick they fall
+due, instead of waiting for the next poll. Every replica keeps its own wheel;
+the claim makes sure only one of them sends a task.
+
+Each poll first turns the occurrences of recurring schedules due within the
+horizon into Task rows (app/utils/recurring.py), so they are loaded onto the
+wheel and sent like any other task.
+
+Run it with ``python -m app.utils.dispatcher``.
+"""
+
+import signal
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.config import DISPATCH_POLL_SECONDS, DISPATCH_HORIZON_SECONDS, DISPATCH_TICK_SECONDS
+from app.models.database import SessionLocal
+from app.models.tasks import Task
+from app.utils.celery_instance import celery_app
+from app.utils.logger import SingletonLogger
+from app.utils.recurring import materialize_due
+from app.utils.timing_wheel import TimingWheel
+from app.dependencies.constants import (
+    DISPATCH_BATCH_SIZE,
+    DISPATCH_HORIZON_MAX_TASKS,
+    REMINDER_BATCH_SIZE,
+    TASK_STATUS_SCHEDULED,
+    TASK_STATUS_QUEUED,
+    TASK_TYPE_REMINDER,
+    TASK_TYPE_FILE_CLEANUP,
+)
+
+logger = SingletonLogger().get_logger()
+
+# dialects whose row locks support SKIP LOCKED
+_SKIP_LOCKED_DIALECTS = {"postgresql", "mysql", "mariadb", "oracle"}
+_CREATED_OVERLAP = timedelta(seconds=5)
+
+
+def _claim(db: Session, due, now: datetime) -> list:
+    if db.bind.dialect.name in _SKIP_LOCKED_DIALECTS:
+        due = due.with_for_update(skip_locked=True)
+    rows = db.execute(
+        update(Task)
+        # no status check out here: it would let the planner walk the status index instead of the ids
+        .where(Task.id.in_(due.scalar_subquery()))
+        .values(status=TASK_STATUS_QUEUED, dispatched_at=now)
+        .returning(Task.id, Task.task_type, Task.schedule_time, Task.receiver_email, Task.file_id)
+        .execution_options(synchronize_session=False)
+    ).all()
+    return sorted(rows, key=lambda row: row.schedule_time)
+
+
+def claim_due(db: Session, now: datetime, batch_size: int = DISPATCH_BATCH_SIZE) -> list:
+    """
+    Mark up to batch_size due tasks as queued and return them, oldest first.
+
+    Not committed: the caller commits once the tasks are published.
+    """
+    due = select(Task.id).where(
+        Task.status == TASK_STATUS_SCHEDULED,
+        Task.schedule_time <= now
+    ).order_by(Task.schedule_time).limit(batch_size)
+    return _claim(db, due, now)
+
+
+def claim_ids(db: Session, task_ids: list, now: datetime) -> list:
+    """Like claim_due for the given tasks; ids another dispatcher claimed or that were cancelled are left out."""
+    status = Task.status
+    if db.bind.dialect.name == "sqlite":
+        # without statistics SQLite prefers the status index over a list of ids and walks every
+        # scheduled task; an expression can't use an index, so this leaves it the id index
+        status = Task.status + ""
+    due = select(Task.id).where(Task.id.in_(task_ids), status == TASK_STATUS_SCHEDULED)
+    return _claim(db, due, now)
+
+
+def load_horizon(
+        db: Session,
+        wheel: TimingWheel,
+        until: datetime,
+        loaded_until: datetime | None = None,
+        created_after: datetime | None = None,
+        limit: int = DISPATCH_HORIZON_MAX_TASKS
+    ) -> datetime | None:
+    """
+    Put the scheduled tasks due by until on the wheel, reading only ids and due times.
+
+    Only what the wheel can be missing is read: tasks due after loaded_until
+    (where the last load stopped) and tasks created after created_after that
+    are due before it. With loaded_until None everything due by until is read,
+    which is how the wheel is rehydrated after a restart. At most limit tasks
+    are added.
+
+    Returns:
+        datetime: how far the wheel is now loaded, short of until when limit was reached
+    """
+    if limit <= 0:
+        return loaded_until
+    columns = select(Task.id, Task.schedule_time).where(Task.status == TASK_STATUS_SCHEDULED)
+
+    edge = columns.where(Task.schedule_time <= until)
+    if loaded_until is not None:
+        edge = edge.where(Task.schedule_time > loaded_until)
+    rows = db.execute(edge.order_by(Task.schedule_time).limit(limit)).all()
+    if len(rows) == limit:
+        # tasks sharing the last due time past the limit are left to the due poll
+        until = rows[-1].schedule_time
+    if loaded_until is not None and created_after is not None:
+        rows += db.execute(
+            columns.where(Task.created_at > created_after, Task.schedule_time <= loaded_until).limit(limit)
+        ).all()
+
+    added = 0
+    for task_id, schedule_time in rows:
+        if task_id not in wheel and added < limit:
+            wheel.insert(task_id, _timestamp(schedule_time))
+            added += 1
+    return until
+
+
+def _timestamp(when: datetime) -> float:
+    # schedule_time is naive UTC
+    return when.replace(tzinfo=timezone.utc).timestamp()
+
+
+def publish_task(task, producer=None) -> None:
+    """Send one claimed task to the Celery task that runs its type."""
+    if task.task_type == TASK_TYPE_REMINDER:
+        celery_app.send_task(
+            "app.tasks.tasks.send_reminder",
+            args=[str(task.id), task.receiver_email, task.file_id],
+            producer=producer
+        )
+    elif task.task_type == TASK_TYPE_FILE_CLEANUP:
+        celery_app.send_task(
+            "app.tasks.tasks.file_cleanup",
+            args=[str(task.id), task.receiver_email],
+            producer=producer
+        )
+    else:
+        logger.warning("Task %s has unknown type %s, not dispatched", task.id, task.task_type)
+
+
+def publish_batch(tasks: list) -> None:
+    """
+    Publish tasks over one broker connection instead of one per message.
+
+    Reminders are sent as send_reminders messages of up to REMINDER_BATCH_SIZE
+    tasks each, so co-due reminders share a worker's session and SMTP connection.
+    """
+    reminders = [str(task.id) for task in tasks if task.task_type == TASK_TYPE_REMINDER]
+    with celery_app.producer_or_acquire() as producer:
+        for start in range(0, len(reminders), REMINDER_BATCH_SIZE):
+            celery_app.send_task(
+                "app.tasks.tasks.send_reminders",
+                args=[reminders[start:start + REMINDER_BATCH_SIZE]],
+                producer=producer
+            )
+        for task in tasks:
+            if task.task_type != TASK_TYPE_REMINDER:
+                publish_task(task, producer)
+
+
+def dispatch_due(
+        db: Session,
+        now: datetime | None = None,
+        batch_size: int = DISPATCH_BATCH_SIZE,
+        publish=publish_batch,
+        task_ids: list | None = None
+    ) -> list:
+    """
+    Claim one batch of due tasks (or the given task_ids), publish it and commit the claim.
+
+    Returns:
+        list: the dispatched tasks (id, task_type, schedule_time, receiver_email, file_id)
+    """
+    now = now or datetime.utcnow()
+    try:
+        tasks = claim_due(db, now, batch_size) if task_ids is None else claim_ids(db, task_ids, now)
+        if tasks:
+            publish(tasks)
+        db.commit()
+    except Exception:
+        # rows go back to scheduled, the next round retries them
+        db.rollback()
+        raise
+    return tasks
+
+
+def run_dispatcher(
+        poll_seconds: float = DISPATCH_POLL_SECONDS,
+        batch_size: int = DISPATCH_BATCH_SIZE,
+        session_factory=SessionLocal,
+        stop: threading.Event | None = None,
+        publish=publish_batch,
+        horizon_seconds: float = DISPATCH_HORIZON_SECONDS,
+        tick_seconds: float = DISPATCH_TICK_SECONDS,
+        clock=time.time
+    ) -> dict:
+    """
+    Dispatch due tasks until stop is set.
+
+    Every poll_seconds the dispatcher claims what is already due (full
+    batches are followed by the next one straight away, so a backlog drains at
+    publish speed) and loads the tasks due within horizon_seconds onto a
+    TimingWheel. Between polls it sleeps tick to tick and claims each task as
+    its tick comes, so near-term tasks go out within a tick of their
+    schedule_time rather than up to a poll late. The wheel starts empty and is
+    rehydrated from the table by the first poll. A horizon of 0 turns it off.
+
+    Returns:
+        dict: dispatched, materialized (recurring task occurrences), rounds, errors and
+        max_lag_seconds (schedule_time to publish)
+    """
+    stop = stop or threading.Event()
+    stats = {"dispatched": 0, "materialized": 0, "rounds": 0, "errors": 0, "max_lag_seconds": 0.0}
+    wheel = TimingWheel(tick=tick_seconds, start=clock()) if horizon_seconds > 0 else None
+    loaded_until, created_after = None, None
+    next_poll = clock()
+    logger.info(
+        "Dispatcher started: polling every %.1fs, %d tasks per round, %.0fs horizon",
+        poll_seconds, batch_size, horizon_seconds
+    )
+
+    def dispatched(tasks):
+        if tasks:
+            lag = (datetime.utcnow() - tasks[0].schedule_time).total_seconds()
+            stats["dispatched"] += len(tasks)
+            stats["max_lag_seconds"] = max(stats["max_lag_seconds"], lag)
+            logger.info("Dispatched %d due tasks, oldest %.3fs late", len(tasks), lag)
+
+    while not stop.is_set():
+        try:
+            if clock() >= next_poll:
+                with session_factory() as db:
+                    now = datetime.utcnow()
+                    try:
+                        # before the due claim, so a catch-up run goes out this round
+                        stats["materialized"] += materialize_due(db, now + timedelta(seconds=horizon_seconds), now)
+                    except Exception as e:
+                        # recurring schedules failing must not hold up tasks already scheduled
+                        stats["errors"] += 1
+                        logger.exception("Materializing recurring tasks failed: %s", e)
+                    tasks = dispatch_due(db, now, batch_size, publish)
+                    if wheel is not None:
+                        loaded_until = load_horizon(
+                            db, wheel, now + timedelta(seconds=horizon_seconds),
+                            loaded_until, created_after,
+                            DISPATCH_HORIZON_MAX_TASKS - len(wheel)
+                        )
+                        # rows commit out of created_at order and API hosts' clocks drift, so look back a little
+                        created_after = now - _CREATED_OVERLAP
+                stats["rounds"] += 1
+                dispatched(tasks)
+                next_poll = clock() + (0 if len(tasks) == batch_size else poll_seconds)
+
+            if wheel is not None:
+                fired = [task_id for task_id, _ in wheel.advance(clock())]
+                # ids the due poll got first are skipped by the claim; ids whose publish fails stay
+                # scheduled and are left to it
+                if fired:
+                    with session_factory() as db:
+                        for start in range(0, len(fired), batch_size):
+                            dispatched(dispatch_due(db, publish=publish, task_ids=fired[start:start + batch_size]))
+        except Exception as e:
+            stats["errors"] += 1
+            logger.exception("Dispatch round failed: %s", e)
+            next_poll = clock() + poll_seconds
+
+        wake = next_poll if wheel is None or not len(wheel) else min(next_poll, wheel.next_tick_at())
+        stop.wait(max(wake - clock(), 0))
+
+    logger.info(
+        "Dispatcher stopped: %d tasks dispatched in %d rounds, %d errors",
+        stats["dispatched"], stats["rounds"], stats["errors"]
+    )
+    return stats
+
+
+def main():
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    run_dispatcher(stop=stop)
+
+
+if __name__ == "__main__":
+    main()
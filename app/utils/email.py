@@ -4,24 +4,28 @@ Includes reminder and completion email functionality.
 """
 
 import os
-import ssl
 import smtplib
+from datetime import datetime
 from email.message import EmailMessage
 
 from dotenv import load_dotenv
+from sqlalchemy import select, update, insert
 from sqlalchemy.orm import Session
 
 from app.utils.celery_instance import celery_app
 from app.models.database import SessionLocal
 from app.utils.logger import SingletonLogger
+from app.utils.smtp_pool import get_smtp_pool
 
 from app.Encryption_Services.encryptionService import EncryptionService
-from app.models.tasks import Task
+from app.models.tasks import Task, TaskHistory
 from app.models.file import FileModel
+from app.FileManager import compression
 from app.dependencies.constants import (
     TASK_STATUS_SCHEDULED,
     TASK_STATUS_COMPLETED,
     TASK_STATUS_FAILED,
+    TASK_STATUS_RUNNING,
 )
 
 logger = SingletonLogger().get_logger()
@@ -30,14 +34,82 @@ logger = SingletonLogger().get_logger()
 load_dotenv()
 EMAIL_ADDRESS = os.getenv("EMAIL")
 EMAIL_PASSWORD = os.getenv("PASSWORD")
-SMTP_PORT = 465
-SMTP_SERVER = "smtp.gmail.com"
 
 if not EMAIL_ADDRESS or not EMAIL_PASSWORD:
     logger.critical("EMAIL or PASSWORD environment variable is missing")
     raise ValueError("Missing EMAIL or PASSWORD in .env file")
 
 
+def decrypt_attachment(db: Session, file: FileModel | None, encryptionservice: EncryptionService) -> bytes | None:
+    """The plaintext of file to attach to an email, None when there is no file."""
+    if not file or not file.filename:
+        return None
+    nonce_bytes = bytes.fromhex(file.nonce)
+    decrypted_bytes = encryptionservice.decrypt(
+        file_path=file.file_path,
+        user_id=file.user_id,
+        db=db,
+        nonce=nonce_bytes,
+        wrapped_key=file.wrapped_key,
+        key_version=file.key_version,
+    )
+    if not isinstance(decrypted_bytes, (bytes, bytearray)):
+        raise ValueError("Decryption did not return bytes")
+    return compression.decompress(file.codec, decrypted_bytes)
+
+
+def build_email(
+    task: Task,
+    email_type: str,
+    receiver_email: str,
+    file: FileModel | None = None,
+    attachment: bytes | None = None,
+) -> EmailMessage | None:
+    """The reminder or completion email for task, None for an unknown email_type."""
+    # Determine email content based on type
+    if email_type == TASK_STATUS_COMPLETED:
+        subject = f"Task '{task.title}' Completed"
+        body = (
+            f"Dear recipient,\n\n"
+            f"You have a task scheduled .\n\n"
+            f"Task ID: {task.id}\n"
+            f"Title: {task.title}\n"
+            f"Scheduled Time: {task.schedule_time}\n\n"
+            f"Please find the processed file attached (if applicable).\n\n"
+            f"Best regards,\nThe Team"
+        )
+    elif email_type == TASK_STATUS_SCHEDULED:
+        subject = f"Reminder: Task '{task.title}' Due"
+        body = (
+            f"Dear recipient,\n\n"
+            f"This is a reminder for your upcoming task.\n\n"
+            f"Task ID: {task.id}\n"
+            f"Title: {task.title}\n"
+            f"Scheduled Time: {task.schedule_time}\n\n"
+            f"Please ensure everything is ready.\n\n"
+            f"Best regards,\nThe Team"
+        )
+    else:
+        return None
+
+    # Create email message
+    msg = EmailMessage()
+    msg["From"] = EMAIL_ADDRESS
+    msg["To"] = receiver_email
+    msg["Subject"] = subject
+    msg.set_content(body)
+
+    # Attach decrypted file if available
+    if attachment and file:
+        msg.add_attachment(
+            attachment,
+            maintype="application",
+            subtype="octet-stream",
+            filename=file.filename,
+        )
+    return msg
+
+
 @celery_app.task(
     name="app.utils.email.send_email_task",
     bind=True,
@@ -76,65 +148,15 @@ def send_email_task(
         # Fetch and decrypt file only if file_id is provided (completion emails)
         if file_id is not None:
             file = db.query(FileModel).filter(FileModel.id == file_id).first()
-            if file and file.filename:
-                nonce_bytes = bytes.fromhex(file.nonce)
-                decrypted_bytes = encryptionservice.decrypt(
-                    file_path=file.file_path,
-                    user_id=file.user_id,
-                    db=db,
-                    nonce=nonce_bytes,
-                )
-                if not isinstance(decrypted_bytes, (bytes, bytearray)):
-                    raise ValueError("Decryption did not return bytes")
+            decrypted_bytes = decrypt_attachment(db, file, encryptionservice)
 
-        # Determine email content based on type
-        if email_type == TASK_STATUS_COMPLETED:
-            subject = f"Task '{task.title}' Completed"
-            body = (
-                f"Dear recipient,\n\n"
-                f"You have a task scheduled .\n\n"
-                f"Task ID: {task.id}\n"
-                f"Title: {task.title}\n"
-                f"Scheduled Time: {task.schedule_time}\n\n"
-                f"Please find the processed file attached (if applicable).\n\n"
-                f"Best regards,\nThe Team"
-            )
-        elif email_type == TASK_STATUS_SCHEDULED:
-            subject = f"Reminder: Task '{task.title}' Due"
-            body = (
-                f"Dear recipient,\n\n"
-                f"This is a reminder for your upcoming task.\n\n"
-                f"Task ID: {task.id}\n"
-                f"Title: {task.title}\n"
-                f"Scheduled Time: {task.schedule_time}\n\n"
-                f"Please ensure everything is ready.\n\n"
-                f"Best regards,\nThe Team"
-            )
-        else:
+        msg = build_email(task, email_type, receiver_email, file, decrypted_bytes)
+        if msg is None:
             logger.error("Invalid email_type: %s for task %d", email_type, task_id)
             return "Invalid Email Type"
 
-        # Create email message
-        msg = EmailMessage()
-        msg["From"] = EMAIL_ADDRESS
-        msg["To"] = receiver_email
-        msg["Subject"] = subject
-        msg.set_content(body)
-
-        # Attach decrypted file if available
-        if decrypted_bytes and file:
-            msg.add_attachment(
-                decrypted_bytes,
-                maintype="application",
-                subtype="octet-stream",
-                filename=file.filename,
-            )
-
-        # Send email
-        context = ssl.create_default_context()
-        with smtplib.SMTP_SSL(SMTP_SERVER, SMTP_PORT, context=context) as server:
-            server.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-            server.send_message(msg)
+        # Send email over this worker's pooled, already logged-in connection
+        get_smtp_pool(EMAIL_ADDRESS, EMAIL_PASSWORD).send_message(msg)
 
         logger.info("Email sent successfully to %s for task %d (%s)", receiver_email, task_id, email_type)
 
@@ -166,6 +188,94 @@ def send_email_task(
         db.close()
 
 
+def send_reminder_batch(db: Session, task_ids: list) -> dict:
+    """
+    Send the reminder emails of task_ids with one session and one SMTP connection.
+
+    The tasks and their files are loaded with one IN query each, and the
+    statuses and TaskHistory rows are written in bulk at the end. Every task
+    still succeeds or fails on its own. A task whose send raised an
+    SMTPException is marked failed and returned under "retry", so the caller
+    can retry just those, as send_email_task's autoretry does.
+
+    Returns:
+        dict: ids that were "sent", "failed" or should be retried ("retry"), and those "missing"
+    """
+    tasks = db.execute(select(Task).where(Task.id.in_(task_ids))).scalars().all()
+    found = {task.id for task in tasks}
+    missing = [task_id for task_id in task_ids if task_id not in found]
+    if missing:
+        logger.warning("Reminder tasks not found: %s", ", ".join(missing))
+
+    file_ids = {task.file_id for task in tasks if task.file_id}
+    files = {}
+    if file_ids:
+        files = {file.id: file for file in db.execute(select(FileModel).where(FileModel.id.in_(file_ids))).scalars()}
+
+    if tasks:
+        db.execute(
+            update(Task).where(Task.id.in_(found)).values(status=TASK_STATUS_RUNNING)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+
+    pool = get_smtp_pool(EMAIL_ADDRESS, EMAIL_PASSWORD)
+    encryptionservice = EncryptionService()
+    sent, failed, retry, history = [], [], [], []
+    for task in tasks:
+        if not task.receiver_email:
+            logger.warning("Task %s has no receiver email", task.id)
+            failed.append(task.id)
+            history.append((task, "FAILED", "No Email Provided"))
+            continue
+        try:
+            file = files.get(task.file_id)
+            # the same email send_reminder sent one task at a time (send_completion_email)
+            msg = build_email(
+                task, TASK_STATUS_COMPLETED, task.receiver_email, file, decrypt_attachment(db, file, encryptionservice)
+            )
+            pool.send_message(msg)
+            sent.append(task.id)
+            history.append((task, "COMPLETED", f"Reminder email sent to {task.receiver_email}"))
+        except smtplib.SMTPException as smtp_err:
+            logger.error("SMTP error while sending reminder for task %s: %s", task.id, smtp_err)
+            retry.append(task.id)
+            history.append((task, "FAILED", str(smtp_err)))
+        except Exception as exc:
+            logger.exception("Reminder failed for task %s: %s", task.id, exc)
+            failed.append(task.id)
+            history.append((task, "FAILED", str(exc)))
+
+    try:
+        for status, ids in ((TASK_STATUS_COMPLETED, sent), (TASK_STATUS_FAILED, failed + retry)):
+            if ids:
+                db.execute(
+                    update(Task).where(Task.id.in_(ids)).values(status=status)
+                    .execution_options(synchronize_session=False)
+                )
+        if history:
+            executed_at = datetime.utcnow()
+            db.execute(insert(TaskHistory), [
+                {
+                    "task_type": "send_reminder",
+                    "status": status,
+                    "details": details,
+                    "user_id": task.user_id,
+                    "executed_at": executed_at,
+                }
+                for task, status, details in history
+            ])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    logger.info(
+        "Reminder batch of %d: %d sent, %d failed, %d to retry",
+        len(task_ids), len(sent), len(failed), len(retry)
+    )
+    return {"sent": sent, "failed": failed, "retry": retry, "missing": missing}
+
+
 # Helper functions to schedule emails
 def schedule_reminder(task_id: int, receiver_email: str):
     """Schedule an email reminder for the specified task (no file attached)."""
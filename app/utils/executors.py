@@ -0,0 +1,193 @@
+"""
+Bounded executors for blocking work started from async routes.
+
+Hashing, AES-GCM, disk writes and the sync SQLAlchemy session would stall the
+event loop if called directly from an ``async def`` route, so they are pushed
+onto one of two thread pools:
+
+    crypto  - CPU heavy work (hashlib and cryptography release the GIL on large buffers)
+    disk    - blocking I/O: file access and sync database calls
+
+Uploads additionally reserve their size from a global in-flight byte budget.
+When the budget is exhausted new uploads queue, and after
+UPLOAD_QUEUE_TIMEOUT_SECONDS they are turned away with 503 + Retry-After
+instead of piling up in memory.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException, status
+
+from app.config import (
+    CRYPTO_WORKERS,
+    DISK_WORKERS,
+    UPLOAD_INFLIGHT_BUDGET_MB,
+    UPLOAD_QUEUE_TIMEOUT_SECONDS,
+)
+from app.utils.logger import SingletonLogger
+
+logger = SingletonLogger().get_logger()
+
+CRYPTO = "crypto"
+DISK = "disk"
+
+_DONE = object()
+
+
+class BlockingPool:
+    """Thread pool that records queue depth and how long jobs wait to start."""
+
+    def __init__(self, kind: str, workers: int):
+        self.kind = kind
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{kind}-pool")
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _wrap(self, fn, args, kwargs, submitted: float):
+        def job():
+            waited = time.perf_counter() - submitted
+            with self._lock:
+                self.queued -= 1
+                self.running += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.running -= 1
+                    self.completed += 1
+        return job
+
+    async def run(self, fn, *args, **kwargs):
+        with self._lock:
+            self.queued += 1
+        job = self._wrap(fn, args, kwargs, time.perf_counter())
+        return await asyncio.get_running_loop().run_in_executor(self._executor, job)
+
+    def stats(self) -> dict:
+        with self._lock:
+            avg_wait = self.wait_total / self.completed if self.completed else 0.0
+            return {
+                "workers": self.workers,
+                "queue_depth": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "avg_wait_ms": round(avg_wait * 1000, 3),
+                "max_wait_ms": round(self.wait_max * 1000, 3),
+            }
+
+
+class ByteBudget:
+    """
+    Global cap on bytes being processed at once.
+
+    Works from any event loop: waiters park on a future of their own loop and are
+    woken thread-safely whenever bytes are released.
+    """
+
+    def __init__(self, limit_bytes: int, wait_timeout: float):
+        self.limit = limit_bytes
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._waiters: list[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    def _try_take(self, nbytes: int) -> bool:
+        # a single request larger than the whole budget is let through once nothing else is running
+        if self.in_flight + nbytes <= self.limit or self.in_flight == 0:
+            self.in_flight += nbytes
+            return True
+        return False
+
+    async def _acquire(self, nbytes: int) -> None:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.wait_timeout
+        while True:
+            with self._lock:
+                if self._try_take(nbytes):
+                    return
+                waiter = loop.create_future()
+                self._waiters.append((loop, waiter))
+                self.waiting += 1
+            try:
+                await asyncio.wait_for(waiter, max(deadline - loop.time(), 0))
+            except asyncio.TimeoutError:
+                with self._lock:
+                    self.rejected += 1
+                logger.warning("Upload budget exhausted (%d bytes in flight), rejecting %d bytes", self.in_flight, nbytes)
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Server is busy processing uploads, retry shortly",
+                    headers={"Retry-After": str(max(int(self.wait_timeout), 1))},
+                )
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+                    if (loop, waiter) in self._waiters:
+                        self._waiters.remove((loop, waiter))
+
+    def _release(self, nbytes: int) -> None:
+        with self._lock:
+            self.in_flight -= nbytes
+            waiters, self._waiters = self._waiters, []
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(lambda w=waiter: w.done() or w.set_result(None))
+
+    @asynccontextmanager
+    async def reserve(self, nbytes: int):
+        """Hold nbytes of the budget for the duration of the block (queues, then 503s)."""
+        await self._acquire(nbytes)
+        try:
+            yield
+        finally:
+            self._release(nbytes)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "limit_bytes": self.limit,
+                "in_flight_bytes": self.in_flight,
+                "waiting": self.waiting,
+                "rejected": self.rejected,
+            }
+
+
+_pools = {
+    CRYPTO: BlockingPool(CRYPTO, CRYPTO_WORKERS),
+    DISK: BlockingPool(DISK, DISK_WORKERS),
+}
+upload_budget = ByteBudget(UPLOAD_INFLIGHT_BUDGET_MB * 1024 * 1024, UPLOAD_QUEUE_TIMEOUT_SECONDS)
+
+
+async def run_blocking(kind: str, fn, *args, **kwargs):
+    """Run fn(*args, **kwargs) on the pool for ``kind`` and await the result."""
+    return await _pools[kind].run(fn, *args, **kwargs)
+
+
+async def iterate_blocking(kind: str, iterator):
+    """Async wrapper over a blocking iterator, each next() runs on the ``kind`` pool."""
+    iterator = iter(iterator)
+    while True:
+        item = await run_blocking(kind, next, iterator, _DONE)
+        if item is _DONE:
+            return
+        yield item
+
+
+def executor_stats() -> dict:
+    """Queue depth / wait time per pool plus the upload byte budget."""
+    stats = {kind: pool.stats() for kind, pool in _pools.items()}
+    stats["upload_budget"] = upload_budget.stats()
+    return stats
@@ -0,0 +1,199 @@
+"""
+Recurring task schedules.
+
+A recurring task is one RecurringSchedule row holding a cron expression
+(app/utils/cron.py) and next_run_at, the next occurrence that has no Task row
+yet. Each dispatcher poll calls materialize_due() with its horizon: every
+enabled schedule whose next_run_at falls inside it gets a Task row per
+occurrence up to the horizon, and next_run_at moves past them. From there the
+occurrences are ordinary scheduled tasks, fired by the timing wheel on time
+and cancellable one by one.
+
+Moving next_run_at is a compare-and-set on its old value in the same
+transaction as the Task inserts, so two dispatchers working on the same
+schedule (or one retrying after a crash) can't create an occurrence twice.
+
+Occurrences more than RECURRING_MISFIRE_GRACE_SECONDS in the past when they
+are reached (the dispatcher was down, or starts_at was in the past) are
+missed, and the schedule's catch_up policy decides what runs:
+
+    skip    nothing, the schedule carries on from the next occurrence
+    once    a single task now, however many were missed
+    all     a task for every missed occurrence, at most RECURRING_MAX_CATCH_UP
+"""
+
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from sqlalchemy import select, update, insert
+from sqlalchemy.orm import Session
+
+from app.config import RECURRING_MISFIRE_GRACE_SECONDS
+from app.models.tasks import Task, RecurringSchedule
+from app.schemas.tasks import RecurringTaskCreate
+from app.utils.cron import compile_cron
+from app.utils.logger import SingletonLogger
+from app.dependencies.constants import (
+    RECURRING_BATCH_SIZE,
+    RECURRING_MAX_CATCH_UP,
+    RECURRING_CATCH_UP_ONCE,
+    RECURRING_CATCH_UP_ALL,
+    TASK_STATUS_SCHEDULED,
+    TASK_STATUS_CANCELLED,
+)
+
+logger = SingletonLogger().get_logger()
+
+_SKIP_LOCKED_DIALECTS = {"postgresql", "mysql", "mariadb", "oracle"}
+# next_after() is strictly after, this makes it "at or after"
+_JUST_BEFORE = timedelta(microseconds=1)
+
+
+def create_schedule(db: Session, user_id: str, data: RecurringTaskCreate, now: datetime | None = None) -> RecurringSchedule:
+    """Store a recurring task; its first occurrence is the first one at or after starts_at (default now)."""
+    now = now or datetime.utcnow()
+    start = data.starts_at or now
+    schedule = RecurringSchedule(
+        id=str(uuid4()),
+        user_id=user_id,
+        task_type=data.task_type.value,
+        title=data.title,
+        receiver_email=data.receiver_email,
+        cron=data.cron,
+        catch_up=data.catch_up.value,
+        next_run_at=compile_cron(data.cron).next_after(start - _JUST_BEFORE),
+        ends_at=data.ends_at,
+        enabled=True,
+    )
+    if data.ends_at is not None and schedule.next_run_at > data.ends_at:
+        raise ValueError("the schedule has no occurrence before ends_at")
+    db.add(schedule)
+    db.commit()
+    db.refresh(schedule)
+    logger.info("Recurring task %s (%s) created for user %s, first run at %s",
+                schedule.id, schedule.cron, user_id, schedule.next_run_at)
+    return schedule
+
+
+def disable_schedule(db: Session, schedule: RecurringSchedule) -> int:
+    """Stop a schedule and cancel its occurrences that haven't been sent yet; returns how many."""
+    schedule.enabled = False
+    cancelled = db.execute(
+        update(Task)
+        .where(Task.schedule_id == schedule.id, Task.status == TASK_STATUS_SCHEDULED)
+        .values(status=TASK_STATUS_CANCELLED)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    db.refresh(schedule)
+    return cancelled
+
+
+def plan_runs(schedule: RecurringSchedule, now: datetime, until: datetime, grace: float) -> tuple[list, datetime | None]:
+    """
+    The occurrences of schedule to create from next_run_at up to until.
+
+    Returns:
+        tuple: (schedule times of the tasks to create, the new next_run_at or None once past ends_at)
+    """
+    cron = compile_cron(schedule.cron)
+    ends_at = schedule.ends_at or datetime.max
+    runs = []
+    when = schedule.next_run_at
+    cutoff = now - timedelta(seconds=grace)
+
+    if when < cutoff:
+        # missed: the policy decides what runs for them, the loop below starts at the first live occurrence
+        if schedule.catch_up == RECURRING_CATCH_UP_ALL:
+            while when < cutoff and when <= ends_at and len(runs) < RECURRING_MAX_CATCH_UP:
+                runs.append(when)
+                when = cron.next_after(when)
+            if when < cutoff and when <= ends_at:
+                logger.warning("Recurring task %s missed more than %d runs, the rest are skipped",
+                               schedule.id, RECURRING_MAX_CATCH_UP)
+        if when < cutoff:
+            when = cron.next_after(cutoff - _JUST_BEFORE)
+        if schedule.catch_up == RECURRING_CATCH_UP_ONCE and when > now:
+            # unless an occurrence inside the grace period is about to run anyway
+            runs.append(now)
+        logger.info("Recurring task %s missed its runs since %s, catch up %s: %d tasks",
+                    schedule.id, schedule.next_run_at, schedule.catch_up, len(runs))
+
+    while when <= until and when <= ends_at:
+        runs.append(when)
+        when = cron.next_after(when)
+    return runs, (when if when <= ends_at else None)
+
+
+def materialize_due(
+        db: Session,
+        until: datetime,
+        now: datetime | None = None,
+        batch_size: int = RECURRING_BATCH_SIZE,
+        grace: float = RECURRING_MISFIRE_GRACE_SECONDS
+    ) -> int:
+    """
+    Create the Task rows of every occurrence due by until and move the schedules' next_run_at past them.
+
+    Commits once per batch of schedules.
+
+    Returns:
+        int: tasks created
+    """
+    now = now or datetime.utcnow()
+    created = 0
+    while True:
+        due = select(RecurringSchedule).where(
+            RecurringSchedule.enabled.is_(True),
+            RecurringSchedule.next_run_at <= until
+        ).order_by(RecurringSchedule.next_run_at).limit(batch_size)
+        if db.bind.dialect.name in _SKIP_LOCKED_DIALECTS:
+            due = due.with_for_update(skip_locked=True)
+        schedules = db.execute(due).scalars().all()
+        if not schedules:
+            return created
+
+        rows = []
+        try:
+            for schedule in schedules:
+                runs, next_run_at = plan_runs(schedule, now, until, grace)
+                advanced = db.execute(
+                    update(RecurringSchedule)
+                    .where(
+                        RecurringSchedule.id == schedule.id,
+                        RecurringSchedule.next_run_at == schedule.next_run_at,
+                        RecurringSchedule.enabled.is_(True)
+                    )
+                    .values(
+                        next_run_at=next_run_at,
+                        last_run_at=runs[-1] if runs else schedule.last_run_at,
+                        enabled=next_run_at is not None
+                    )
+                    .execution_options(synchronize_session=False)
+                ).rowcount
+                if advanced != 1:
+                    # another dispatcher got there first
+                    continue
+                rows += [
+                    {
+                        "id": str(uuid4()),
+                        "user_id": schedule.user_id,
+                        "task_type": schedule.task_type,
+                        "schedule_time": run,
+                        "status": TASK_STATUS_SCHEDULED,
+                        "title": schedule.title,
+                        "receiver_email": schedule.receiver_email,
+                        "schedule_id": schedule.id,
+                    }
+                    for run in runs
+                ]
+            if rows:
+                db.execute(insert(Task), rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        db.expire_all()
+        created += len(rows)
+        if len(schedules) < batch_size:
+            return created
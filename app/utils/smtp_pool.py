@@ -0,0 +1,202 @@
+"""
+Pool of logged-in SMTP connections, one pool per worker process.
+
+Opening smtplib.SMTP_SSL for every email costs a TCP connect, a TLS
+handshake and an AUTH round trip before the first byte of the message, and
+providers rate limit new connections long before they limit messages. The
+pool keeps connections open between tasks and hands them out again:
+
+    - a connection idle for more than SMTP_IDLE_CHECK_SECONDS gets a NOOP
+      before reuse, and is replaced if that fails
+    - after SMTP_MAX_MESSAGES_PER_CONNECTION messages a connection is closed
+      and a new one opened, as providers cap messages per session
+    - a send that fails with SMTPServerDisconnected on a reused connection
+      (the server dropped it while idle) is retried once on a new one
+    - at most SMTP_POOL_SIZE idle connections are kept
+
+Connections must not cross a fork, so get_smtp_pool() builds a new pool the
+first time it is called in each process (Celery prefork children included).
+"""
+
+import atexit
+import os
+import smtplib
+import ssl
+import threading
+import time
+
+from app.config import (
+    SMTP_SERVER,
+    SMTP_PORT,
+    SMTP_USE_SSL,
+    SMTP_TIMEOUT_SECONDS,
+    SMTP_POOL_SIZE,
+    SMTP_MAX_MESSAGES_PER_CONNECTION,
+    SMTP_IDLE_CHECK_SECONDS,
+)
+from app.utils.logger import SingletonLogger
+
+logger = SingletonLogger().get_logger()
+
+
+class PooledConnection:
+    """An open, logged-in SMTP session and how much it has been used."""
+
+    def __init__(self, smtp: smtplib.SMTP):
+        self.smtp = smtp
+        self.sent = 0
+        self.last_used = time.monotonic()
+
+    def close(self) -> None:
+        try:
+            self.smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            # already gone, just drop the socket
+            self.smtp.close()
+
+
+class SmtpPool:
+    """Hands out logged-in SMTP connections, reusing them across sends."""
+
+    def __init__(
+            self,
+            host: str = SMTP_SERVER,
+            port: int = SMTP_PORT,
+            username: str | None = None,
+            password: str | None = None,
+            use_ssl: bool = SMTP_USE_SSL,
+            context: ssl.SSLContext | None = None,
+            size: int = SMTP_POOL_SIZE,
+            max_messages: int = SMTP_MAX_MESSAGES_PER_CONNECTION,
+            idle_check_seconds: float = SMTP_IDLE_CHECK_SECONDS,
+            timeout: float = SMTP_TIMEOUT_SECONDS
+        ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_ssl = use_ssl
+        self.context = context or ssl.create_default_context()
+        self.size = size
+        self.max_messages = max_messages
+        self.idle_check_seconds = idle_check_seconds
+        self.timeout = timeout
+        self._idle: list[PooledConnection] = []
+        self._lock = threading.Lock()
+        self.stats = {"connects": 0, "reused": 0, "noops": 0, "dropped": 0, "sent": 0}
+
+    def _connect(self) -> PooledConnection:
+        if self.use_ssl:
+            smtp = smtplib.SMTP_SSL(self.host, self.port, context=self.context, timeout=self.timeout)
+        else:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.username:
+                smtp.login(self.username, self.password)
+        except Exception:
+            smtp.close()
+            raise
+        self.stats["connects"] += 1
+        return PooledConnection(smtp)
+
+    def _healthy(self, conn: PooledConnection) -> bool:
+        if time.monotonic() - conn.last_used < self.idle_check_seconds:
+            return True
+        self.stats["noops"] += 1
+        try:
+            return conn.smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def acquire(self) -> tuple[PooledConnection, bool]:
+        """A healthy connection, and whether it was reused (False means just opened)."""
+        while True:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                return self._connect(), False
+            if self._healthy(conn):
+                self.stats["reused"] += 1
+                return conn, True
+            self.stats["dropped"] += 1
+            conn.close()
+
+    def release(self, conn: PooledConnection) -> None:
+        """Give a connection back for reuse, or close it once it has sent max_messages."""
+        conn.last_used = time.monotonic()
+        if conn.sent >= self.max_messages:
+            conn.close()
+            return
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def discard(self, conn: PooledConnection) -> None:
+        """Close a connection that failed instead of returning it."""
+        self.stats["dropped"] += 1
+        conn.close()
+
+    def send_message(self, msg) -> None:
+        """
+        Send msg over a pooled connection.
+
+        A reused connection the server has dropped is replaced and the send
+        retried once. Other errors propagate for the caller's retry policy to
+        handle; the connection is kept when the server only refused the
+        message, and closed otherwise.
+        """
+        conn, reused = self.acquire()
+        try:
+            conn.smtp.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            self.discard(conn)
+            if not reused:
+                raise
+            logger.info("SMTP connection to %s dropped while idle, reconnecting", self.host)
+            conn = self._connect()
+            try:
+                conn.smtp.send_message(msg)
+            except Exception:
+                self.discard(conn)
+                raise
+        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError):
+            # refused by the server, which smtplib has already reset: the session itself is fine
+            self.release(conn)
+            raise
+        except Exception:
+            self.discard(conn)
+            raise
+        conn.sent += 1
+        self.stats["sent"] += 1
+        self.release(conn)
+
+    def close(self) -> None:
+        """Close every idle connection."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+_pool: SmtpPool | None = None
+_pool_pid: int | None = None
+_pool_lock = threading.Lock()
+
+
+def get_smtp_pool(username: str | None = None, password: str | None = None) -> SmtpPool:
+    """The pool of this process, created (for these credentials) on first use."""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            # a pool inherited through fork shares its sockets with the parent, leave it alone
+            _pool = SmtpPool(username=username, password=password)
+            _pool_pid = os.getpid()
+        return _pool
+
+
+@atexit.register
+def _close_pool() -> None:
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.close()
@@ -1,17 +1,20 @@
 """
-Contains only the task scheduling function.
+Contains the task scheduling functions, one at a time or in batches.
 """
 
+from collections import Counter
 from typing import Optional
 from uuid import uuid4
 from fastapi import UploadFile
+from pydantic import ValidationError
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from app.models.tasks import Task
 from app.schemas.tasks import TaskCreate, TaskStatus, TaskResponse
-from app.utils.celery_instance import celery_app
 from app.utils.logger import SingletonLogger
-from app.dependencies.constants import TASK_TYPE_REMINDER, TASK_TYPE_FILE_CLEANUP, TASK_STATUS_SCHEDULED
+from app.dependencies.constants import TASK_STATUS_SCHEDULED, TASK_BATCH_REJECTED
 from app.utils.discord import send_discord_notification
+from app.utils.executors import run_blocking, DISK
 
 from app.FileManager.fileManager import fileManager
 
@@ -19,6 +22,13 @@ from app.FileManager.fileManager import fileManager
 logger = SingletonLogger().get_logger()
 
 
+def _insert_task(db: Session, new_task: Task) -> Task:
+    db.add(new_task)
+    db.commit()
+    db.refresh(new_task)
+    return new_task
+
+
 async def schedule_task(
     db: Session,
     user_id: str,
@@ -27,7 +37,7 @@ async def schedule_task(
     webhook_url: str,
     file: Optional[UploadFile] = None)->TaskResponse:
     """
-    Schedule a new task in the database and (if reminder) send via Celery.
+    Schedule a new task in the database, the dispatcher sends it to Celery when it is due.
 
     Args:
         db (Session): SQLAlchemy DB session
@@ -46,7 +56,8 @@ async def schedule_task(
     if file is not None and file.filename:
         # await on the async upload file to finsh
         fm = fileManager(db=db)
-        uploaded_file = await fm.uploadFile(user_id=user_id, file=file)
+        # the attachment is read when the task runs, keep it for its retention counted from then
+        uploaded_file = await fm.uploadFile(user_id=user_id, file=file, retain_from=task_data.schedule_time)
         file_id = uploaded_file['id'] 
 
     new_task = Task(
@@ -60,9 +71,8 @@ async def schedule_task(
         file_id=file_id
     )
 
-    db.add(new_task)
-    db.commit()
-    db.refresh(new_task)
+    # sync session, webhook and broker calls all block, keep them off the event loop
+    new_task = await run_blocking(DISK, _insert_task, db, new_task)
 
     logger.info(
         "New task scheduled: %s (ID: %s) for user %s at %s, receiver: %s",
@@ -72,25 +82,94 @@ async def schedule_task(
         new_task.schedule_time,
         new_task.receiver_email,
     )
-    send_discord_notification(
+    await run_blocking(
+        DISK,
+        send_discord_notification,
         webhook_url=task_data.webhook_url, 
         status=TASK_STATUS_SCHEDULED,
         task_name=task_data.title,
         message=f"Task :{task_data.title} ID:{new_task.id} Scheduled for {new_task.schedule_time}"
         )
 
-    #todo make 
-    if task_data.task_type == TASK_TYPE_REMINDER:
-        celery_app.send_task(
-            name="app.tasks.tasks.send_reminder",
-            args=[str(new_task.id),file_id, receiver_email],
-            eta=new_task.schedule_time,
-            
-            )
-    elif task_data.task_type == TASK_TYPE_FILE_CLEANUP:
-        celery_app.send_task(
-            name="app.tasks.tasks.file_cleanup",
-            args=[str(new_task.id), receiver_email],
-            eta=new_task.schedule_time
-        )
+    # nothing is sent to the broker here: app/utils/dispatcher.py publishes the task once it is due
     return TaskResponse.model_validate(new_task)
+
+
+def _batch_error(e: ValueError) -> str:
+    if isinstance(e, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(part) for part in error['loc']) or 'task'}: {error['msg']}" for error in e.errors()
+        )
+    return str(e)
+
+
+def _insert_task_batch(db: Session, user_id: str, items: list) -> tuple[dict, Counter]:
+    rows, results, webhooks = [], [], Counter()
+    for index, item in enumerate(items):
+        try:
+            # NDJSON lines come in raw, pydantic parses and validates them in one go
+            if isinstance(item, (str, bytes)):
+                task_data = TaskCreate.model_validate_json(item)
+            else:
+                task_data = TaskCreate.model_validate(item)
+        except ValueError as e:
+            results.append({"index": index, "status": TASK_BATCH_REJECTED, "error": _batch_error(e)})
+            continue
+        task_id = str(uuid4())
+        rows.append({
+            "id": task_id,
+            "user_id": user_id,
+            "task_type": task_data.task_type.value,
+            "schedule_time": task_data.schedule_time,
+            "status": TaskStatus.SCHEDULED.value,
+            "receiver_email": task_data.receiver_email,
+            "title": task_data.title,
+        })
+        results.append({"index": index, "status": TASK_STATUS_SCHEDULED, "id": task_id})
+        if task_data.webhook_url:
+            webhooks[task_data.webhook_url] += 1
+
+    if rows:
+        try:
+            # one executemany in one transaction, no per-row refresh
+            db.execute(insert(Task), rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+    return {"scheduled": len(rows), "rejected": len(results) - len(rows), "results": results}, webhooks
+
+
+async def schedule_task_batch(db: Session, user_id: str, items: list) -> dict:
+    """
+    Schedule many tasks at once, the dispatcher sends each to Celery when it is due.
+
+    Every item is validated with TaskCreate on its own; invalid ones are
+    reported back and the valid ones are inserted together in one
+    transaction. Attachments aren't supported here. Each webhook_url gets one
+    notification for the batch instead of one per task.
+
+    Args:
+        db (Session): SQLAlchemy DB session
+        user_id (str): ID of the user
+        items (list): task specs, as dicts or raw JSON strings (NDJSON lines)
+
+    Returns:
+        dict: scheduled and rejected counts and a result per item, in request order
+    """
+    summary, webhooks = await run_blocking(DISK, _insert_task_batch, db, user_id, items)
+    logger.info(
+        "Batch of %d tasks for user %s: %d scheduled, %d rejected",
+        len(items), user_id, summary["scheduled"], summary["rejected"]
+    )
+    for webhook_url, count in webhooks.items():
+        await run_blocking(
+            DISK,
+            send_discord_notification,
+            webhook_url=webhook_url,
+            status=TASK_STATUS_SCHEDULED,
+            task_name="batch",
+            message=f"{count} tasks scheduled in one batch"
+        )
+    # as with schedule_task, app/utils/dispatcher.py publishes each task once it is due
+    return summary
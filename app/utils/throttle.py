@@ -0,0 +1,38 @@
+"""
+Token bucket rate limiting for background jobs that must not compete with
+API traffic for the disk (integrity scrubbing, cleanup).
+"""
+
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Allow at most rate units per second on average, with bursts up to burst.
+
+    consume() blocks until the units are available; a rate of 0 or less
+    disables limiting.
+    """
+
+    def __init__(self, rate: float, burst: float | None = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else rate
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited = 0.0
+
+    def consume(self, amount: float) -> None:
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # going into debt lets a single request larger than the burst through, paid back by sleeping
+            self._tokens -= amount
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if delay:
+            self.waited += delay
+            time.sleep(delay)
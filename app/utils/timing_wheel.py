@@ -0,0 +1,135 @@
+"""
+Hierarchical timing wheel holding task ids until their due time.
+
+Time is cut into ticks of ``tick`` seconds. Level 0 has ``slots`` slots of
+one tick each, level 1 has ``slots`` slots of ``slots`` ticks each, and so on,
+so four levels of 64 slots at 10 ms cover about 46 hours. An entry goes into
+the lowest level whose range reaches its due tick. Whenever the current tick
+crosses a slot boundary of a higher level, that slot's entries are moved
+("cascaded") down a level, until they reach level 0 and fire on their tick.
+
+Every operation is O(1): insert appends to a slot, cancel drops the id from
+the due-time map, and advance does a constant amount of work per tick plus
+per entry moved or fired. A cancelled id is left in its slot and skipped when
+the slot is reached. A rescheduled id keeps its stale entry too, and that
+entry follows the id's current due time, so an id never fires twice.
+
+Slots only hold the task id and the map holds its due time, so a horizon of
+100k tasks fits in a few MB. The wheel is not thread-safe; its owner drives it
+from one loop by calling advance() with the current time.
+"""
+
+
+class TimingWheel:
+    """Task ids bucketed by due time (unix seconds), fired by advance()."""
+
+    def __init__(self, tick: float = 0.01, slots: int = 64, levels: int = 4, start: float = 0.0):
+        if slots < 2 or slots & (slots - 1):
+            raise ValueError("slots must be a power of two")
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self._bits = slots.bit_length() - 1
+        self._mask = slots - 1
+        self._current = self._tick_of(start)
+        self._wheels = [[[] for _ in range(slots)] for _ in range(levels)]
+        self._due: dict[str, float] = {}
+        # inserted at or before the current tick, fired by the next advance()
+        self._ready: list[str] = []
+
+    def _tick_of(self, when: float) -> int:
+        return int(when // self.tick)
+
+    def _due_tick(self, due: float) -> int:
+        # rounded up, so nothing fires before its due time (at most a tick after it)
+        return -int(-due // self.tick)
+
+    @property
+    def span(self) -> float:
+        """How far ahead of the current tick an entry can be placed, in seconds."""
+        return (self.slots ** self.levels) * self.tick
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def __contains__(self, task_id: str) -> bool:
+        return task_id in self._due
+
+    def _place(self, task_id: str, due_tick: int) -> None:
+        if due_tick <= self._current:
+            self._ready.append(task_id)
+            return
+        for level in range(self.levels):
+            shift = self._bits * level
+            if (due_tick >> shift) - (self._current >> shift) < self.slots:
+                self._wheels[level][(due_tick >> shift) & self._mask].append(task_id)
+                return
+        raise ValueError(f"due time is more than {self.span:.0f}s ahead of the wheel")
+
+    def insert(self, task_id: str, due: float) -> None:
+        """Fire task_id at due; inserting an id already held moves it to the new due time."""
+        previous = self._due.get(task_id)
+        self._due[task_id] = due
+        try:
+            self._place(task_id, self._due_tick(due))
+        except ValueError:
+            if previous is None:
+                del self._due[task_id]
+            else:
+                self._due[task_id] = previous
+            raise
+
+    def cancel(self, task_id: str) -> bool:
+        """Forget task_id; its slot entry is skipped when reached. False if it wasn't held."""
+        return self._due.pop(task_id, None) is not None
+
+    def next_tick_at(self) -> float:
+        """When the tick after the current one starts, what the owner should sleep until."""
+        return (self._current + 1) * self.tick
+
+    def _expire(self, entries: list[str], fired: list) -> None:
+        for task_id in entries:
+            due = self._due.get(task_id)
+            if due is None:
+                # cancelled, or already fired through another entry
+                continue
+            if self._due_tick(due) <= self._current:
+                del self._due[task_id]
+                fired.append((task_id, due))
+            else:
+                # stale entry of a rescheduled id, or one cascading down a level
+                self._place(task_id, self._due_tick(due))
+
+    def advance(self, now: float) -> list[tuple[str, float]]:
+        """
+        Move the wheel up to now and return what fell due, as (task_id, due) in tick order.
+
+        An entry fires on the first tick starting at or after its due time;
+        within one tick the order is arbitrary.
+        """
+        fired = []
+        ready, self._ready = self._ready, []
+        self._expire(ready, fired)
+
+        target = self._tick_of(now)
+        if not self._due:
+            # nothing left to fire, skip ahead and drop the dead entries of cancelled ids
+            if target > self._current:
+                self._current = target
+                self._wheels = [[[] for _ in range(self.slots)] for _ in range(self.levels)]
+            return fired
+        while self._current < target:
+            self._current += 1
+            # higher levels first, an entry may cascade all the way down to this tick's slot
+            for level in range(self.levels - 1, 0, -1):
+                shift = self._bits * level
+                if self._current & ((1 << shift) - 1) == 0:
+                    slot = (self._current >> shift) & self._mask
+                    entries, self._wheels[level][slot] = self._wheels[level][slot], []
+                    self._expire(entries, fired)
+            slot = self._current & self._mask
+            entries, self._wheels[0][slot] = self._wheels[0][slot], []
+            self._expire(entries, fired)
+            if not self._due:
+                return fired + self.advance(now)
+        return fired
@@ -4,5 +4,6 @@ cd /home/admin/Task-Automation-API
 source venv/bin/activate
 uvicorn main:app --host 0.0.0.0 --port 8000 &
 celery -A worker worker --loglevel=info --pool=solo &
+python -m app.utils.dispatcher &
 wait
 
@@ -0,0 +1,68 @@
+import os
+import shutil
+import tempfile
+
+# set before anything imports app.config: the tests get their own database and storage
+# root, never whatever the environment points at
+_tmp = tempfile.mkdtemp(prefix="task-automation-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'test.db')}"
+os.environ["FILE_STORAGE_DIR"] = os.path.join(_tmp, "uploads")
+os.environ["STORAGE_BACKEND"] = "local"
+os.environ["CELERY_BROKER_URL"] = "memory://"
+os.environ.setdefault("EMAIL", "tests@example.com")
+os.environ.setdefault("PASSWORD", "password")
+
+import pytest  # noqa: E402
+
+# the Celery app first: app.tasks.tasks imports app.utils.email, which imports the app back
+from app.utils.celery_instance import celery_app  # noqa: E402,F401
+from app.models.database import Base, SessionLocal, engine  # noqa: E402
+# every model, so create_all makes all the tables
+from app.models import file, key_rotation, reconcile, scrub, tasks, user  # noqa: E402,F401
+from app.models.user import UserModel  # noqa: E402
+from app.FileManager import storagePath  # noqa: E402
+from app.Encryption_Services.keyGenerator import key_cache  # noqa: E402
+
+
+@pytest.fixture
+def storage_root():
+    os.makedirs(storagePath.STORAGE_ROOT, exist_ok=True)
+    yield storagePath.STORAGE_ROOT
+    shutil.rmtree(storagePath.STORAGE_ROOT, ignore_errors=True)
+
+
+@pytest.fixture
+def db(storage_root):
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    yield session
+    session.close()
+    Base.metadata.drop_all(bind=engine)
+    key_cache.invalidate()
+
+
+@pytest.fixture
+def user(db):
+    account = UserModel(email="owner@example.com", username="owner")
+    db.add(account)
+    db.commit()
+    db.refresh(account)
+    # detached, so later commits don't expire it and requests can read it from any thread
+    db.expunge(account)
+    return account
+
+
+@pytest.fixture
+def client(db, user):
+    """TestClient for the API, every request authenticated as user."""
+    from fastapi.testclient import TestClient
+    import main
+    from app.dependencies.auth_utils import get_current_user
+
+    main.app.dependency_overrides[get_current_user] = lambda: user
+    yield TestClient(main.app)
+    main.app.dependency_overrides.clear()
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_tmp, ignore_errors=True)
@@ -0,0 +1,99 @@
+import os
+from datetime import datetime
+from uuid import uuid4
+
+from app.models.file import FileModel, BlobModel
+from app.FileManager import blobStore
+from app.FileManager.storageBackend import getStorage, keyFor
+
+
+def upload(client, name: str, body: bytes) -> str:
+    response = client.post("/files/upload", files={"file": (name, body)})
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def blob_of(db, file_id: str) -> BlobModel:
+    db.expire_all()
+    return db.get(BlobModel, db.get(FileModel, file_id).blob_id)
+
+
+def stored(path: str) -> bool:
+    return getStorage().stat(keyFor(path)) is not None
+
+
+def test_identical_uploads_share_a_blob_until_the_last_is_deleted(client, db):
+    body = os.urandom(10_000)
+    first = upload(client, "a.bin", body)
+    second = upload(client, "b.bin", body)
+    other = upload(client, "c.bin", os.urandom(10_000))
+
+    blob = blob_of(db, first)
+    assert blob.id == blob_of(db, second).id != blob_of(db, other).id
+    assert blob.ref_count == 2
+    assert db.query(BlobModel).count() == 2
+    blob_id, path = blob.id, blob.file_path
+
+    assert client.delete(f"/files/{first}").status_code == 200
+    db.expire_all()
+    assert db.get(BlobModel, blob_id).ref_count == 1
+    assert stored(path)
+    assert client.get(f"/files/download/{second}").content == body
+
+    assert client.delete(f"/files/{second}").status_code == 200
+    db.expire_all()
+    assert db.get(BlobModel, blob_id) is None
+    assert not stored(path)
+    assert client.get(f"/files/download/{other}").status_code == 200
+
+
+def test_release_files_counts_every_reference_in_the_batch(client, db, user, storage_root):
+    shared = [upload(client, f"{i}.bin", b"shared content" * 500) for i in range(3)]
+    kept = upload(client, "kept.bin", b"kept content" * 500)
+    # stored before dedup, owns its file outright
+    legacy_path = os.path.join(storage_root, "legacy.bin")
+    with open(legacy_path, "wb") as f:
+        f.write(b"ciphertext")
+    db.add(FileModel(
+        id=str(uuid4()), user_id=user.id, filename="legacy.bin", file_path=legacy_path, nonce="00",
+        created_at=datetime.utcnow()
+    ))
+    db.commit()
+    blob = blob_of(db, shared[0])
+    blob_id, shared_path = blob.id, blob.file_path
+
+    files = db.query(FileModel).filter(FileModel.id.in_(shared[:2]) | (FileModel.blob_id.is_(None))).all()
+    assert blobStore.releaseFiles(db, files) == [legacy_path]
+    db.expire_all()
+    assert db.get(BlobModel, blob_id).ref_count == 1
+    assert stored(shared_path) and not os.path.exists(legacy_path)
+
+    removed = blobStore.releaseFiles(db, [db.get(FileModel, shared[2])])
+    assert removed == [shared_path]
+    assert db.get(BlobModel, blob_id) is None
+    assert not stored(shared_path)
+    assert db.query(FileModel.id).all() == [(kept,)]
+
+
+def test_claim_adopts_the_blob_a_concurrent_upload_created(db, user, monkeypatch):
+    existing, created = blobStore.claimBlob(db, user.id, "hash", "first.bin", b"\x00", 10)
+    db.commit()
+    assert created and existing.ref_count == 1
+
+    # the other upload's insert lands between our lookup and our insert
+    lookups = []
+    add_reference = blobStore.addReference
+
+    def racing_add_reference(*args):
+        lookups.append(args)
+        return None if len(lookups) == 1 else add_reference(*args)
+
+    monkeypatch.setattr(blobStore, "addReference", racing_add_reference)
+    blob, created = blobStore.claimBlob(db, user.id, "hash", "second.bin", b"\x00", 10)
+    db.commit()
+
+    assert not created
+    assert len(lookups) == 2
+    assert blob.id == existing.id and blob.file_path == "first.bin"
+    assert blob.ref_count == 2
+    assert db.query(BlobModel).count() == 1
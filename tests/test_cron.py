@@ -0,0 +1,62 @@
+from datetime import datetime
+
+import pytest
+
+from app.utils.cron import compile_cron
+
+
+@pytest.mark.parametrize("expression, after, expected", [
+    ("*/15 * * * *", datetime(2026, 10, 1, 10, 7, 30), datetime(2026, 10, 1, 10, 15)),
+    # strictly after
+    ("*/15 * * * *", datetime(2026, 10, 1, 10, 15), datetime(2026, 10, 1, 10, 30)),
+    ("*/15 * * * *", datetime(2026, 10, 1, 23, 45), datetime(2026, 10, 2, 0, 0)),
+    ("5/15 * * * *", datetime(2026, 10, 1, 10, 36), datetime(2026, 10, 1, 10, 50)),
+    ("0 9-17/4 * * *", datetime(2026, 10, 1, 13, 0), datetime(2026, 10, 1, 17, 0)),
+    ("0 9-17/4 * * *", datetime(2026, 10, 1, 17, 0), datetime(2026, 10, 2, 9, 0)),
+    ("0 0 1 1 *", datetime(2026, 12, 31, 23, 59), datetime(2027, 1, 1, 0, 0)),
+    # months without a 31st are skipped
+    ("0 0 31 * *", datetime(2026, 4, 1), datetime(2026, 5, 31)),
+    # only leap years have a 29th of February
+    ("0 0 29 2 *", datetime(2025, 3, 1), datetime(2028, 2, 29)),
+    # day of month and day of week both restricted: either one matches (Thursday the 1st, Monday the 5th)
+    ("0 9 1 * mon", datetime(2026, 9, 30, 12, 0), datetime(2026, 10, 1, 9, 0)),
+    ("0 9 1 * mon", datetime(2026, 10, 1, 9, 0), datetime(2026, 10, 5, 9, 0)),
+    # a starred day of month doesn't count as a restriction: both have to match
+    ("0 9 */2 * mon", datetime(2026, 10, 1, 9, 0), datetime(2026, 10, 5, 9, 0)),
+    ("0 9 */2 * mon", datetime(2026, 10, 5, 9, 0), datetime(2026, 10, 19, 9, 0)),
+    ("0 12 * jan-mar fri", datetime(2026, 4, 1), datetime(2027, 1, 1, 12, 0)),
+    ("@hourly", datetime(2026, 10, 1, 10, 0, 59), datetime(2026, 10, 1, 11, 0)),
+])
+def test_next_after(expression, after, expected):
+    assert compile_cron(expression).next_after(after) == expected
+
+
+def test_sunday_is_0_and_7():
+    after = datetime(2026, 10, 1)
+    sunday = datetime(2026, 10, 4)
+    assert compile_cron("0 0 * * 0").next_after(after) == sunday
+    assert compile_cron("0 0 * * 7").next_after(after) == sunday
+    assert compile_cron("0 0 * * sun").next_after(after) == sunday
+    assert compile_cron("@weekly").next_after(after) == sunday
+
+
+@pytest.mark.parametrize("expression", [
+    "* * * *",
+    "60 * * * *",
+    "* 24 * * *",
+    "* * 0 * *",
+    "*/0 * * * *",
+    "5-1 * * * *",
+    "x * * * *",
+    "* * * foo *",
+    # never fires
+    "0 0 30 2 *",
+    "0 0 31 4,6,9,11 *",
+])
+def test_invalid_expressions(expression):
+    with pytest.raises(ValueError):
+        compile_cron(expression)
+
+
+def test_compiled_once_per_expression():
+    assert compile_cron("0 * * * *") is compile_cron("0 * * * *")
@@ -0,0 +1,127 @@
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import pytest
+
+from app.models.database import SessionLocal
+from app.models.tasks import Task
+from app.utils import dispatcher
+from app.dependencies.constants import TASK_STATUS_SCHEDULED, TASK_STATUS_QUEUED, TASK_STATUS_CANCELLED
+
+
+def add_tasks(db, user, offsets: list, status: str = TASK_STATUS_SCHEDULED) -> list:
+    """One reminder per offset, due that many seconds from now."""
+    now = datetime.utcnow()
+    tasks = [
+        Task(
+            id=str(uuid4()), user_id=user.id, task_type="reminder", status=status,
+            schedule_time=now + timedelta(seconds=offset), receiver_email="r@example.com"
+        )
+        for offset in offsets
+    ]
+    db.add_all(tasks)
+    db.commit()
+    return [task.id for task in tasks]
+
+
+def statuses(db, ids: list) -> list:
+    db.expire_all()
+    return [db.get(Task, task_id).status for task_id in ids]
+
+
+def test_claim_due_takes_due_tasks_oldest_first(db, user):
+    due = add_tasks(db, user, [-30, -10, -20])
+    later = add_tasks(db, user, [60])
+    cancelled = add_tasks(db, user, [-40], status=TASK_STATUS_CANCELLED)
+
+    first = dispatcher.dispatch_due(db, batch_size=2, publish=lambda tasks: None)
+    second = dispatcher.dispatch_due(db, batch_size=2, publish=lambda tasks: None)
+
+    assert [task.id for task in first] == [due[0], due[2]]
+    assert [task.id for task in second] == [due[1]]
+    assert dispatcher.dispatch_due(db, publish=lambda tasks: None) == []
+    assert statuses(db, due) == [TASK_STATUS_QUEUED] * 3
+    assert statuses(db, later + cancelled) == [TASK_STATUS_SCHEDULED, TASK_STATUS_CANCELLED]
+
+
+def test_claim_ids_skips_tasks_already_claimed_or_cancelled(db, user):
+    ids = add_tasks(db, user, [-10, -5])
+    cancelled = add_tasks(db, user, [-5], status=TASK_STATUS_CANCELLED)
+    assert [t.id for t in dispatcher.dispatch_due(db, batch_size=1, publish=lambda tasks: None)] == ids[:1]
+
+    claimed = dispatcher.dispatch_due(db, publish=lambda tasks: None, task_ids=ids + cancelled)
+
+    assert [task.id for task in claimed] == ids[1:]
+
+
+def test_failed_publish_leaves_the_tasks_scheduled(db, user):
+    ids = add_tasks(db, user, [-10, -5])
+
+    def broker_down(tasks):
+        raise ConnectionError("broker unreachable")
+
+    with pytest.raises(ConnectionError):
+        dispatcher.dispatch_due(db, publish=broker_down)
+
+    assert statuses(db, ids) == [TASK_STATUS_SCHEDULED] * 2
+    assert [task.id for task in dispatcher.dispatch_due(db, publish=lambda tasks: None)] == ids
+
+
+def test_concurrent_claims_never_share_a_task(db, user):
+    ids = add_tasks(db, user, [-i for i in range(200)])
+    published = Counter()
+    lock = threading.Lock()
+
+    def publish(tasks):
+        with lock:
+            published.update(task.id for task in tasks)
+
+    def worker():
+        with SessionLocal() as session:
+            while dispatcher.dispatch_due(session, batch_size=7, publish=publish):
+                pass
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert set(published) == set(ids)
+    assert max(published.values()) == 1
+
+
+def test_replicas_send_each_wheel_task_once(db, user):
+    # due within the horizon, so every replica loads them onto its wheel and claims them the tick they fall due
+    ids = add_tasks(db, user, [0.3 + i * 0.01 for i in range(50)])
+    published = Counter()
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def publish(tasks):
+        with lock:
+            published.update(task.id for task in tasks)
+            if sum(published.values()) >= len(ids):
+                stop.set()
+
+    replicas = [
+        threading.Thread(target=dispatcher.run_dispatcher, kwargs={
+            "poll_seconds": 10, "stop": stop, "publish": publish, "horizon_seconds": 5, "tick_seconds": 0.01
+        })
+        for _ in range(3)
+    ]
+    for replica in replicas:
+        replica.start()
+    stop.wait(10)
+    # let a replica that lost a race finish its round before counting
+    time.sleep(0.2)
+    stop.set()
+    for replica in replicas:
+        replica.join()
+
+    assert set(published) == set(ids)
+    assert max(published.values()) == 1
+    assert statuses(db, ids) == [TASK_STATUS_QUEUED] * len(ids)
@@ -0,0 +1,158 @@
+import os
+
+import pytest
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from app.Encryption_Services.encryptionService import (
+    SegmentedEncryptor,
+    SegmentedReader,
+    encrypted_size,
+    HEADER,
+    TAG_SIZE,
+)
+from app.FileManager.storageBackend import LocalBackend
+
+SEGMENT = 1024
+USER = "user-1"
+
+
+@pytest.fixture
+def cipher():
+    return AESGCM(AESGCM.generate_key(bit_length=256))
+
+
+def encrypt(root: str, cipher, plaintext: bytes, chunk: int = 700) -> str:
+    encryptor = SegmentedEncryptor(cipher, USER, segment_size=SEGMENT)
+    path = os.path.join(root, "file.bin")
+    with open(path, "wb") as f:
+        for offset in range(0, len(plaintext), chunk):
+            f.write(encryptor.update(plaintext[offset:offset + chunk]))
+        f.write(encryptor.finalize())
+    return path
+
+
+def reader(root: str, path: str, cipher) -> SegmentedReader:
+    with open(path, "rb") as f:
+        header = f.read(HEADER.size)
+    return SegmentedReader(path, cipher, USER, header, storage=LocalBackend(root))
+
+
+def decrypt(root, path, cipher, start=0, end=None) -> bytes:
+    return b"".join(reader(root, path, cipher).iter_range(start, end))
+
+
+def truncate(path: str, size: int) -> None:
+    with open(path, "r+b") as f:
+        f.truncate(size)
+
+
+@pytest.mark.parametrize("size", [0, 1, SEGMENT - 1, SEGMENT, SEGMENT + 1, 5 * SEGMENT + 17])
+def test_round_trip(storage_root, cipher, size):
+    plaintext = os.urandom(size)
+    path = encrypt(storage_root, cipher, plaintext)
+
+    assert os.path.getsize(path) == encrypted_size(size, SEGMENT)
+    assert reader(storage_root, path, cipher).size == size
+    assert decrypt(storage_root, path, cipher) == plaintext
+
+
+def test_range_decryption(storage_root, cipher):
+    plaintext = os.urandom(5 * SEGMENT + 17)
+    path = encrypt(storage_root, cipher, plaintext)
+
+    for start, end in [(0, 0), (10, 20), (SEGMENT - 1, SEGMENT), (SEGMENT, 2 * SEGMENT - 1),
+                       (3 * SEGMENT + 5, None), (len(plaintext) - 1, len(plaintext) + 100)]:
+        expected = plaintext[start:] if end is None else plaintext[start:end + 1]
+        assert decrypt(storage_root, path, cipher, start, end) == expected
+    assert decrypt(storage_root, path, cipher, 30, 10) == b""
+
+
+@pytest.mark.parametrize("offset", [HEADER.size + 3, HEADER.size + SEGMENT + TAG_SIZE + 3, -1])
+def test_tampered_segment_fails(storage_root, cipher, offset):
+    path = encrypt(storage_root, cipher, os.urandom(3 * SEGMENT + 5))
+    with open(path, "r+b") as f:
+        f.seek(offset, os.SEEK_END if offset < 0 else os.SEEK_SET)
+        byte = f.read(1)
+        f.seek(-1, os.SEEK_CUR)
+        f.write(bytes([byte[0] ^ 1]))
+
+    with pytest.raises(InvalidTag):
+        decrypt(storage_root, path, cipher)
+
+
+def test_tampered_header_fails(storage_root, cipher):
+    path = encrypt(storage_root, cipher, os.urandom(100))
+    with open(path, "r+b") as f:
+        f.seek(HEADER.size - 1)
+        byte = f.read(1)
+        f.seek(HEADER.size - 1)
+        f.write(bytes([byte[0] ^ 1]))
+
+    with pytest.raises(InvalidTag):
+        decrypt(storage_root, path, cipher)
+
+
+def test_swapped_segments_fail(storage_root, cipher):
+    path = encrypt(storage_root, cipher, os.urandom(3 * SEGMENT))
+    stored = SEGMENT + TAG_SIZE
+    with open(path, "r+b") as f:
+        f.seek(HEADER.size)
+        first, second = f.read(stored), f.read(stored)
+        f.seek(HEADER.size)
+        f.write(second + first)
+
+    with pytest.raises(InvalidTag):
+        decrypt(storage_root, path, cipher, 0, SEGMENT - 1)
+
+
+def test_dropped_final_segment_fails(storage_root, cipher):
+    # cut exactly on a segment boundary: what is left is well formed, but its last segment isn't flagged last
+    path = encrypt(storage_root, cipher, os.urandom(3 * SEGMENT + 5))
+    truncate(path, HEADER.size + 3 * (SEGMENT + TAG_SIZE))
+
+    with pytest.raises(InvalidTag):
+        decrypt(storage_root, path, cipher)
+
+
+@pytest.mark.parametrize("plaintext_size", [0, 3 * SEGMENT + 5])
+def test_truncated_to_header_fails(storage_root, cipher, plaintext_size):
+    path = encrypt(storage_root, cipher, os.urandom(plaintext_size))
+    truncate(path, HEADER.size)
+
+    with pytest.raises(ValueError):
+        reader(storage_root, path, cipher)
+
+
+def test_truncated_inside_tag_fails(storage_root, cipher):
+    path = encrypt(storage_root, cipher, os.urandom(2 * SEGMENT))
+    truncate(path, HEADER.size + SEGMENT + TAG_SIZE + TAG_SIZE - 1)
+
+    with pytest.raises(ValueError):
+        reader(storage_root, path, cipher)
+
+
+def test_empty_file_is_authenticated(storage_root, cipher):
+    path = encrypt(storage_root, cipher, b"")
+    with open(path, "r+b") as f:
+        f.seek(-1, os.SEEK_END)
+        byte = f.read(1)
+        f.seek(-1, os.SEEK_END)
+        f.write(bytes([byte[0] ^ 1]))
+
+    with pytest.raises(InvalidTag):
+        decrypt(storage_root, path, cipher)
+
+
+def test_range_only_authenticates_the_segments_it_reads(storage_root, cipher):
+    plaintext = os.urandom(3 * SEGMENT + 5)
+    path = encrypt(storage_root, cipher, plaintext)
+    with open(path, "r+b") as f:
+        f.seek(HEADER.size + 3)
+        byte = f.read(1)
+        f.seek(HEADER.size + 3)
+        f.write(bytes([byte[0] ^ 1]))
+
+    assert decrypt(storage_root, path, cipher, 2 * SEGMENT, 2 * SEGMENT + 99) == plaintext[2 * SEGMENT:2 * SEGMENT + 100]
+    with pytest.raises(InvalidTag):
+        decrypt(storage_root, path, cipher, SEGMENT - 1, SEGMENT)
@@ -0,0 +1,164 @@
+import hashlib
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.file import FileModel, UploadSession
+from app.FileManager import multipartManager as multipart
+from app.Encryption_Services.encryptionService import SEGMENT_SIZE, encrypted_size
+
+PART = 2 * SEGMENT_SIZE
+
+
+@pytest.fixture(autouse=True)
+def small_parts(monkeypatch):
+    monkeypatch.setattr(multipart, "PART_SIZE", PART)
+
+
+def start(client, body: bytes, file_hash: str | None = None) -> dict:
+    response = client.post("/files/uploads", json={
+        "filename": "big.bin", "total_size": len(body), "file_hash": file_hash or hashlib.sha256(body).hexdigest()
+    })
+    assert response.status_code == 200
+    return response.json()
+
+
+def put_part(client, upload_id: str, body: bytes, number: int, data: bytes | None = None):
+    if data is None:
+        data = body[(number - 1) * PART:number * PART]
+    return client.put(f"/files/uploads/{upload_id}/parts/{number}", content=data)
+
+
+def staged_path(db, upload_id: str) -> str:
+    db.expire_all()
+    return db.get(UploadSession, upload_id).file_path
+
+
+def test_failure_to_record_the_file_aborts_the_session(client, db, monkeypatch):
+    body = os.urandom(3 * PART)
+    upload = start(client, body)
+    for number in (1, 2, 3):
+        assert put_part(client, upload["upload_id"], body, number).status_code == 200
+    staged = staged_path(db, upload["upload_id"])
+
+    def conflict(*args, **kwargs):
+        raise RuntimeError("duplicate key value violates unique constraint")
+
+    monkeypatch.setattr("app.FileManager.fileManager.claimBlob", conflict)
+    with pytest.raises(RuntimeError):
+        client.post(f"/files/uploads/{upload['upload_id']}/complete")
+
+    status = client.get(f"/files/uploads/{upload['upload_id']}").json()
+    assert status["status"] == "aborted"
+    assert status["parts"] == []
+    assert not os.path.exists(staged) and not os.path.exists(staged[:-len(".part")])
+    assert db.query(FileModel).count() == 0
+    # neither stuck for the client nor for the sweep
+    assert client.post(f"/files/uploads/{upload['upload_id']}/complete").status_code == 409
+    assert client.delete(f"/files/uploads/{upload['upload_id']}").status_code == 409
+
+
+def test_parts_in_any_order_and_resent(client, db):
+    body = os.urandom(3 * PART - 100)
+    upload = start(client, body)
+    assert upload["part_count"] == 3
+    for number in (3, 1, 2, 2):
+        response = put_part(client, upload["upload_id"], body, number)
+        assert response.status_code == 200
+        assert response.json()["sha256"] == hashlib.sha256(body[(number - 1) * PART:number * PART]).hexdigest()
+
+    response = client.post(f"/files/uploads/{upload['upload_id']}/complete")
+
+    assert response.status_code == 200
+    assert client.get(f"/files/download/{response.json()['id']}").content == body
+    assert client.get(f"/files/uploads/{upload['upload_id']}").json()["status"] == "completed"
+
+
+def test_parts_of_the_wrong_size_or_number_are_refused(client):
+    body = os.urandom(2 * PART + 10)
+    upload = start(client, body)
+    upload_id = upload["upload_id"]
+
+    assert put_part(client, upload_id, body, 1, body[:PART + 1]).status_code == 413
+    assert put_part(client, upload_id, body, 1, body[:PART - 1]).status_code == 400
+    assert put_part(client, upload_id, body, 3, body[2 * PART:] + b"x").status_code == 413
+    assert put_part(client, upload_id, body, 0).status_code == 400
+    assert put_part(client, upload_id, body, 4, b"").status_code == 400
+    assert client.get(f"/files/uploads/{upload_id}").json()["parts"] == []
+
+    assert put_part(client, upload_id, body, 1).status_code == 200
+    response = client.post(f"/files/uploads/{upload_id}/complete")
+    assert response.status_code == 409
+    assert response.json()["detail"]["missing_parts"] == [2, 3]
+    # still open, the upload can be finished
+    for number in (2, 3):
+        assert put_part(client, upload_id, body, number).status_code == 200
+    assert client.post(f"/files/uploads/{upload_id}/complete").status_code == 200
+
+
+def test_hash_mismatches_are_refused(client, db):
+    body = os.urandom(2 * PART)
+    upload = start(client, body, file_hash=hashlib.sha256(b"something else").hexdigest())
+    upload_id = upload["upload_id"]
+
+    response = client.put(
+        f"/files/uploads/{upload_id}/parts/1", content=body[:PART], headers={"X-Content-SHA256": "0" * 64}
+    )
+    assert response.status_code == 400
+    assert client.get(f"/files/uploads/{upload_id}").json()["parts"] == []
+
+    for number in (1, 2):
+        assert put_part(client, upload_id, body, number).status_code == 200
+    response = client.post(f"/files/uploads/{upload_id}/complete")
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "File hash does not match"
+    assert client.get(f"/files/uploads/{upload_id}").json()["status"] == "open"
+    assert os.path.exists(staged_path(db, upload_id))
+    assert db.query(FileModel).count() == 0
+
+
+def test_concurrent_complete_succeeds_once(client, db, monkeypatch):
+    body = os.urandom(2 * PART)
+    upload = start(client, body)
+    upload_id = upload["upload_id"]
+    for number in (1, 2):
+        assert put_part(client, upload_id, body, number).status_code == 200
+
+    racing = []
+    hash_staged = multipart.multipartManager._hashStaged
+
+    def slow_hash(reader, algorithm):
+        # a second complete (and an abort) arrive while the first is still hashing
+        if not racing:
+            racing.append(client.post(f"/files/uploads/{upload_id}/complete").status_code)
+            racing.append(client.delete(f"/files/uploads/{upload_id}").status_code)
+        return hash_staged(reader, algorithm)
+
+    monkeypatch.setattr(multipart.multipartManager, "_hashStaged", staticmethod(slow_hash))
+    response = client.post(f"/files/uploads/{upload_id}/complete")
+
+    assert response.status_code == 200
+    assert racing == [409, 409]
+    assert db.query(FileModel).count() == 1
+    assert client.get(f"/files/download/{response.json()['id']}").content == body
+
+
+def test_abandoned_sessions_expire(client, db):
+    body = os.urandom(PART)
+    abandoned = start(client, body)
+    finished = start(client, body)
+    assert put_part(client, finished["upload_id"], body, 1).status_code == 200
+    assert client.post(f"/files/uploads/{finished['upload_id']}/complete").status_code == 200
+    staged = staged_path(db, abandoned["upload_id"])
+
+    assert multipart.expireSessions(db, max_age_hours=1) == {"aborted": 0, "bytes_freed": 0}
+    later = datetime.utcnow() + timedelta(hours=2)
+    stats = multipart.expireSessions(db, max_age_hours=1, now=later)
+
+    assert stats == {"aborted": 1, "bytes_freed": encrypted_size(len(body))}
+    assert not os.path.exists(staged)
+    assert client.get(f"/files/uploads/{abandoned['upload_id']}").json()["status"] == "aborted"
+    assert client.get(f"/files/uploads/{finished['upload_id']}").json()["status"] == "completed"
+    assert multipart.expireSessions(db, max_age_hours=1, now=later) == {"aborted": 0, "bytes_freed": 0}
@@ -0,0 +1,70 @@
+import os
+import time
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from app.models.file import FileModel, BlobModel
+from app.FileManager import reconcile, storagePath
+from app.FileManager.storageBackend import LocalBackend
+
+OLD = time.time() - 2 * 24 * 3600
+
+
+def stored_file(path: str) -> str:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"ciphertext")
+    os.utime(path, (OLD, OLD))
+    return path
+
+
+def file_row(db, user, path: str, with_blob: bool = True) -> str:
+    blob = None
+    if with_blob:
+        blob = BlobModel(
+            id=str(uuid4()), user_id=user.id, content_hash=uuid4().hex, file_path=path, nonce="00", ref_count=1
+        )
+        db.add(blob)
+    row = FileModel(
+        id=str(uuid4()), user_id=user.id, filename=os.path.basename(path), file_path=path, nonce="00",
+        blob_id=blob.id if blob else None, created_at=datetime.utcnow() - timedelta(days=2)
+    )
+    db.add(row)
+    db.commit()
+    return row.id
+
+
+def test_fix_keeps_files_moved_by_an_interrupted_migration(db, user, storage_root):
+    # moved to its shard, but the batch's path update never committed
+    flat = os.path.join(storage_root, "moved.bin")
+    sharded = stored_file(storagePath.pathFor("moved.bin", storage_root))
+    moved = file_row(db, user, flat)
+
+    in_place = file_row(db, user, stored_file(storagePath.pathFor("kept.bin", storage_root)))
+    not_migrated = file_row(db, user, stored_file(os.path.join(storage_root, "flat.bin")))
+    orphan = stored_file(storagePath.pathFor("orphan.bin", storage_root))
+    dangling = file_row(db, user, storagePath.pathFor("gone.bin", storage_root, create=False))
+
+    run = reconcile.runReconcile(db, reconcile.createRun(db, fix=True).id, storage=LocalBackend(storage_root))
+
+    assert run.status == "completed"
+    assert (run.orphaned_files, run.missing_files, run.fixed) == (1, 1, 2)
+    assert os.path.exists(sharded)
+    assert db.get(FileModel, moved) is not None
+    assert db.query(BlobModel).filter(BlobModel.file_path == flat).count() == 1
+    assert storagePath.resolve(flat) == sharded
+    assert db.get(FileModel, in_place) is not None and db.get(FileModel, not_migrated) is not None
+    assert not os.path.exists(orphan)
+    assert db.get(FileModel, dangling) is None
+
+
+def test_report_only_changes_nothing(db, user, storage_root):
+    orphan = stored_file(storagePath.pathFor("orphan.bin", storage_root))
+    dangling = file_row(db, user, storagePath.pathFor("gone.bin", storage_root, create=False), with_blob=False)
+
+    run = reconcile.runReconcile(db, reconcile.createRun(db).id, storage=LocalBackend(storage_root))
+
+    report = reconcile.runReport(db, run.id)
+    assert sorted((o["kind"], o["fixed"]) for o in report["orphans"]) == [("file", False), ("row", False)]
+    assert os.path.exists(orphan)
+    assert db.get(FileModel, dangling) is not None
@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.database import SessionLocal
+from app.models.tasks import Task, RecurringSchedule
+from app.schemas.tasks import RecurringTaskCreate
+from app.utils import recurring
+from app.dependencies.constants import RECURRING_MAX_CATCH_UP, TASK_STATUS_SCHEDULED, TASK_STATUS_CANCELLED
+
+NOW = datetime(2026, 10, 1, 12, 0, 30)
+
+
+def schedule(db, user, cron: str = "*/10 * * * *", **fields) -> RecurringSchedule:
+    data = RecurringTaskCreate(
+        task_type="reminder", cron=cron, title="standup", receiver_email="r@example.com", **fields
+    )
+    return recurring.create_schedule(db, user.id, data, now=NOW)
+
+
+def run_times(db, schedule_id: str) -> list:
+    return [t.schedule_time for t in db.query(Task).filter(Task.schedule_id == schedule_id).order_by(Task.schedule_time)]
+
+
+def test_first_run_is_at_or_after_starts_at(db, user):
+    assert schedule(db, user).next_run_at == datetime(2026, 10, 1, 12, 10)
+    assert schedule(db, user, starts_at=datetime(2026, 10, 1, 13, 20)).next_run_at == datetime(2026, 10, 1, 13, 20)
+    with pytest.raises(ValueError):
+        schedule(db, user, starts_at=NOW, ends_at=NOW + timedelta(minutes=5))
+
+
+def test_materialize_creates_each_occurrence_once(db, user):
+    recurring_id = schedule(db, user).id
+    until = NOW + timedelta(minutes=30)
+
+    assert recurring.materialize_due(db, until, NOW) == 3
+    assert recurring.materialize_due(db, until, NOW) == 0
+    assert recurring.materialize_due(db, until + timedelta(minutes=10), NOW) == 1
+
+    assert run_times(db, recurring_id) == [datetime(2026, 10, 1, 12, m) for m in (10, 20, 30)] + [
+        datetime(2026, 10, 1, 12, 40)
+    ]
+    assert db.get(RecurringSchedule, recurring_id).next_run_at == datetime(2026, 10, 1, 12, 50)
+
+
+def test_schedule_stops_at_ends_at(db, user):
+    recurring_id = schedule(db, user, ends_at=datetime(2026, 10, 1, 12, 25)).id
+
+    assert recurring.materialize_due(db, NOW + timedelta(hours=1), NOW) == 2
+
+    stored = db.get(RecurringSchedule, recurring_id)
+    assert (stored.enabled, stored.next_run_at, stored.last_run_at) == (False, None, datetime(2026, 10, 1, 12, 20))
+    assert recurring.materialize_due(db, NOW + timedelta(days=1), NOW) == 0
+
+
+@pytest.mark.parametrize("catch_up, expected", [
+    ("skip", []),
+    ("once", [NOW]),
+    ("all", [datetime(2026, 10, 1, 11, m) for m in (10, 20, 30, 40, 50)] + [datetime(2026, 10, 1, 12, 0)]),
+])
+def test_missed_runs_follow_the_catch_up_policy(db, user, catch_up, expected):
+    # created an hour ago, the dispatcher has been down since
+    recurring_id = schedule(db, user, catch_up=catch_up, starts_at=datetime(2026, 10, 1, 11, 5)).id
+
+    recurring.materialize_due(db, NOW + timedelta(minutes=5), NOW, grace=20)
+
+    assert run_times(db, recurring_id) == expected
+    assert db.get(RecurringSchedule, recurring_id).next_run_at == datetime(2026, 10, 1, 12, 10)
+
+
+def test_occurrence_inside_the_grace_period_still_runs(db, user):
+    recurring_id = schedule(db, user, catch_up="once", starts_at=datetime(2026, 10, 1, 12, 0)).id
+
+    recurring.materialize_due(db, NOW, NOW, grace=60)
+
+    # not missed, and "once" adds nothing on top of it
+    assert run_times(db, recurring_id) == [datetime(2026, 10, 1, 12, 0)]
+
+
+def test_catch_up_all_is_capped(db, user):
+    recurring_id = schedule(db, user, cron="* * * * *", catch_up="all", starts_at=NOW - timedelta(days=1)).id
+
+    recurring.materialize_due(db, NOW, NOW, grace=0)
+
+    runs = run_times(db, recurring_id)
+    assert len(runs) == RECURRING_MAX_CATCH_UP
+    assert runs[0] == datetime(2026, 9, 30, 12, 1)
+    assert db.get(RecurringSchedule, recurring_id).next_run_at == datetime(2026, 10, 1, 12, 1)
+
+
+def test_concurrent_materialize_creates_occurrences_once(db, user, monkeypatch):
+    recurring_id = schedule(db, user).id
+    until = NOW + timedelta(minutes=30)
+    plan_runs = recurring.plan_runs
+    raced = {}
+
+    def racing_plan_runs(*args):
+        # another dispatcher materializes the schedule after we read it, before our compare-and-set
+        if not raced:
+            raced["other"] = None
+            with SessionLocal() as other:
+                raced["other"] = recurring.materialize_due(other, until, NOW)
+        return plan_runs(*args)
+
+    monkeypatch.setattr(recurring, "plan_runs", racing_plan_runs)
+
+    assert recurring.materialize_due(db, until, NOW) == 0
+    assert raced == {"other": 3}
+    assert len(run_times(db, recurring_id)) == 3
+
+
+def test_disable_cancels_pending_occurrences(db, user):
+    stored = schedule(db, user)
+    recurring.materialize_due(db, NOW + timedelta(minutes=30), NOW)
+    db.query(Task).filter(Task.schedule_time == datetime(2026, 10, 1, 12, 10)).update({Task.status: "queued"})
+    db.commit()
+
+    assert recurring.disable_schedule(db, stored) == 2
+    assert recurring.materialize_due(db, NOW + timedelta(hours=1), NOW) == 0
+    statuses = [t.status for t in db.query(Task).order_by(Task.schedule_time)]
+    assert statuses == ["queued", TASK_STATUS_CANCELLED, TASK_STATUS_CANCELLED]
+    assert TASK_STATUS_SCHEDULED not in statuses
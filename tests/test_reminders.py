@@ -0,0 +1,104 @@
+import smtplib
+from datetime import datetime
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+
+from app.models.tasks import Task, TaskHistory
+from app.tasks import tasks as celery_tasks
+from app.utils import email
+from app.dependencies.constants import REMINDER_MAX_RETRIES, TASK_STATUS_COMPLETED, TASK_STATUS_FAILED
+
+
+class FakePool:
+    def __init__(self):
+        self.sent = []
+        # receiver -> exception its send raises
+        self.failures = {}
+
+    def send_message(self, msg):
+        if msg["To"] in self.failures:
+            raise self.failures[msg["To"]]
+        self.sent.append(msg)
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    fake = FakePool()
+    monkeypatch.setattr(email, "get_smtp_pool", lambda *args: fake)
+    return fake
+
+
+def reminder_tasks(db, user, receivers: list) -> list:
+    ids = []
+    for i, receiver in enumerate(receivers):
+        task = Task(
+            id=str(uuid4()), user_id=user.id, task_type="reminder", schedule_time=datetime.utcnow(),
+            status="scheduled", title=f"task {i}", receiver_email=receiver
+        )
+        db.add(task)
+        ids.append(task.id)
+    db.commit()
+    return ids
+
+
+def test_batch_sends_the_email_send_reminder_sent(db, user, pool):
+    task_ids = reminder_tasks(db, user, ["a@example.com"])
+
+    result = email.send_reminder_batch(db, task_ids)
+
+    assert result["sent"] == task_ids
+    [msg] = pool.sent
+    assert msg["To"] == "a@example.com"
+    assert msg["Subject"] == "Task 'task 0' Completed"
+
+
+def test_each_task_fails_on_its_own(db, user, pool):
+    ok, no_email, refused, broken, also_ok = reminder_tasks(
+        db, user, ["a@example.com", "", "refused@example.com", "broken@example.com", "b@example.com"]
+    )
+    pool.failures["refused@example.com"] = smtplib.SMTPRecipientsRefused({"refused@example.com": (550, b"no")})
+    pool.failures["broken@example.com"] = RuntimeError("connection reset")
+
+    result = email.send_reminder_batch(db, [ok, no_email, "gone", refused, broken, also_ok])
+
+    assert {key: set(ids) for key, ids in result.items()} == {
+        "sent": {ok, also_ok}, "failed": {no_email, broken}, "retry": {refused}, "missing": {"gone"}
+    }
+    assert sorted(msg["To"] for msg in pool.sent) == ["a@example.com", "b@example.com"]
+    db.expire_all()
+    assert {t.id: t.status for t in db.query(Task)} == {
+        ok: TASK_STATUS_COMPLETED, also_ok: TASK_STATUS_COMPLETED,
+        no_email: TASK_STATUS_FAILED, refused: TASK_STATUS_FAILED, broken: TASK_STATUS_FAILED,
+    }
+    assert sorted(h.status for h in db.query(TaskHistory)) == ["COMPLETED", "COMPLETED", "FAILED", "FAILED", "FAILED"]
+
+
+def test_batch_attaches_each_task_file(client, db, user, pool):
+    body = b"quarterly report\n" * 1000
+    file_id = client.post("/files/upload", files={"file": ("report.txt", body)}).json()["id"]
+    with_file, without_file = reminder_tasks(db, user, ["a@example.com", "b@example.com"])
+    db.get(Task, with_file).file_id = file_id
+    db.commit()
+
+    assert set(email.send_reminder_batch(db, [with_file, without_file])["sent"]) == {with_file, without_file}
+
+    attachments = {msg["To"]: [a.get_content() for a in msg.iter_attachments()] for msg in pool.sent}
+    assert attachments == {"a@example.com": [body], "b@example.com": []}
+
+
+@pytest.mark.parametrize("retries, requeued", [(0, True), (REMINDER_MAX_RETRIES, False)])
+def test_only_smtp_failures_are_retried(db, user, pool, monkeypatch, retries, requeued):
+    ok, refused, broken = reminder_tasks(db, user, ["a@example.com", "refused@example.com", "broken@example.com"])
+    pool.failures["refused@example.com"] = smtplib.SMTPServerDisconnected("gone away")
+    pool.failures["broken@example.com"] = RuntimeError("bad attachment")
+    queued = []
+    monkeypatch.setattr(celery_tasks.send_reminders, "apply_async", lambda **kwargs: queued.append(kwargs))
+
+    celery_tasks._send_reminders(SimpleNamespace(request=SimpleNamespace(retries=retries)), [ok, refused, broken])
+
+    if requeued:
+        assert [(q["args"], q["retries"]) for q in queued] == [([[refused]], retries + 1)]
+    else:
+        assert queued == []
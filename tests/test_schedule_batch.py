@@ -0,0 +1,116 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.tasks import Task
+from app.routers import tasks as tasks_router
+
+
+def task_spec(i: int = 0, **fields) -> dict:
+    spec = {
+        "task_type": "reminder",
+        "schedule_time": (datetime.utcnow() + timedelta(hours=1)).isoformat(),
+        "title": f"task {i}",
+        "receiver_email": f"r{i}@example.com",
+    }
+    spec.update(fields)
+    return spec
+
+
+@pytest.fixture
+def small_body(monkeypatch):
+    monkeypatch.setattr(tasks_router, "SCHEDULE_BATCH_MAX_BYTES", 1024)
+    return 1024
+
+
+def test_declared_oversized_body_is_refused(client, db, small_body):
+    body = json.dumps([task_spec(i) for i in range(20)]).encode()
+    assert len(body) > small_body
+
+    response = client.post("/tasks/schedule_batch", content=body, headers={"Content-Type": "application/json"})
+
+    assert response.status_code == 413
+    assert db.query(Task).count() == 0
+
+
+@pytest.mark.parametrize("content_type", ["application/json", "application/x-ndjson"])
+def test_streamed_body_is_cut_off_at_the_limit(client, db, small_body, content_type):
+    def chunks():
+        # no Content-Length, the limit has to hold while streaming
+        for i in range(20):
+            yield (json.dumps(task_spec(i)) + "\n").encode()
+
+    response = client.post("/tasks/schedule_batch", content=chunks(), headers={"Content-Type": content_type})
+
+    assert response.status_code == 413
+    assert db.query(Task).count() == 0
+
+
+@pytest.fixture
+def notifications(monkeypatch):
+    sent = []
+    monkeypatch.setattr("app.utils.task.send_discord_notification", lambda **kwargs: sent.append(kwargs))
+    return sent
+
+
+def test_each_item_is_validated_on_its_own(client, db, notifications):
+    items = [
+        task_spec(0, webhook_url="https://hooks.example.com/a"),
+        task_spec(1, schedule_time=(datetime.utcnow() - timedelta(minutes=1)).isoformat()),
+        task_spec(2, task_type="not a type"),
+        {"title": "no fields"},
+        "not an object",
+        task_spec(5, webhook_url="https://hooks.example.com/a"),
+        task_spec(6),
+    ]
+
+    response = client.post("/tasks/schedule_batch", json=items)
+
+    assert response.status_code == 200
+    summary = response.json()
+    assert (summary["scheduled"], summary["rejected"]) == (3, 4)
+    assert [r["index"] for r in summary["results"]] == list(range(len(items)))
+    assert [r["status"] for r in summary["results"]] == [
+        "scheduled", "rejected", "rejected", "rejected", "rejected", "scheduled", "scheduled"
+    ]
+    assert "schedule_time" in summary["results"][1]["error"]
+    stored = {task.id: task.title for task in db.query(Task)}
+    assert stored == {r["id"]: f"task {r['index']}" for r in summary["results"] if r["status"] == "scheduled"}
+    # one notification per webhook for the whole batch
+    assert [n["message"] for n in notifications] == ["2 tasks scheduled in one batch"]
+
+
+def test_ndjson_lines_are_validated_on_their_own(client, db, notifications):
+    body = "\n".join([json.dumps(task_spec(0)), "", "{not json", json.dumps(task_spec(2)), ""]).encode()
+
+    response = client.post("/tasks/schedule_batch", content=body, headers={"Content-Type": "application/x-ndjson"})
+
+    assert response.status_code == 200
+    assert [r["status"] for r in response.json()["results"]] == ["scheduled", "rejected", "scheduled"]
+    assert db.query(Task).count() == 2
+
+
+@pytest.mark.parametrize("body", [b"[{", b'{"title": "not an array"}'])
+def test_body_must_be_a_json_array(client, db, body):
+    response = client.post("/tasks/schedule_batch", content=body, headers={"Content-Type": "application/json"})
+
+    assert response.status_code == 400
+    assert db.query(Task).count() == 0
+
+
+@pytest.mark.parametrize("content_type", ["application/json", "application/x-ndjson"])
+def test_task_count_is_capped(client, db, monkeypatch, content_type):
+    monkeypatch.setattr(tasks_router, "SCHEDULE_BATCH_MAX_TASKS", 3)
+
+    def post(count: int):
+        items = [task_spec(i) for i in range(count)]
+        if content_type == "application/json":
+            body = json.dumps(items)
+        else:
+            body = "\n".join(json.dumps(item) for item in items)
+        return client.post("/tasks/schedule_batch", content=body.encode(), headers={"Content-Type": content_type})
+
+    assert post(4).status_code == 413
+    assert db.query(Task).count() == 0
+    assert post(3).json()["scheduled"] == 3
@@ -0,0 +1,53 @@
+import time
+from uuid import uuid4
+
+from app.models.database import SessionLocal
+from app.models.file import FileModel
+from app.models.scrub import ScrubRun
+from app.FileManager import scrubber
+
+
+def file_rows(db, user, count: int) -> None:
+    for i in range(count):
+        db.add(FileModel(id=f"{i:04d}-{uuid4()}", user_id=user.id, file_path=f"/nowhere/{i}", nonce="00"))
+    db.commit()
+
+
+def test_run_is_claimed_once(db, user, monkeypatch):
+    file_rows(db, user, 3)
+    monkeypatch.setattr(scrubber, "verifyFile", lambda *args: (None, None, 10))
+    run, created = scrubber.createRun(db)
+    assert created and scrubber.createRun(db) == (run, False)
+
+    # another worker holds it
+    db.query(ScrubRun).filter(ScrubRun.id == run.id).update({ScrubRun.status: "running"})
+    db.commit()
+    assert scrubber.runScrub(db, run.id).files_checked == 0
+    assert not scrubber.canResume(db, run.id)
+
+    db.query(ScrubRun).filter(ScrubRun.id == run.id).update({ScrubRun.status: "failed"})
+    db.commit()
+    run = scrubber.runScrub(db, run.id)
+    assert (run.status, run.files_checked, run.bytes_read) == ("completed", 3, 30)
+    assert scrubber.runScrub(db, run.id).files_checked == 3
+
+
+def test_long_batch_keeps_the_run_from_looking_stale(db, user, monkeypatch):
+    file_rows(db, user, 4)
+    monkeypatch.setattr(scrubber, "SCRUB_STALE_SECONDS", 1)
+    monkeypatch.setattr(scrubber, "SCRUB_HEARTBEAT_SECONDS", 0.2)
+    run, _ = scrubber.createRun(db)
+    resumable = []
+
+    def slow_file(*args):
+        # 4 files in one batch take twice the stale timeout
+        time.sleep(0.5)
+        with SessionLocal() as other_worker:
+            resumable.append(scrubber.canResume(other_worker, run.id))
+        return None, None, 10
+
+    monkeypatch.setattr(scrubber, "verifyFile", slow_file)
+    run = scrubber.runScrub(db, run.id)
+
+    assert run.status == "completed" and run.files_checked == 4
+    assert resumable == [False] * 4
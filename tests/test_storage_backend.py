@@ -0,0 +1,93 @@
+"""
+S3Backend round trips against moto's in-memory S3.
+
+    pip install pytest moto boto3
+    python -m pytest tests
+"""
+
+import os
+
+import pytest
+
+moto = pytest.importorskip("moto")
+boto3 = pytest.importorskip("boto3")
+
+from app.FileManager.storageBackend import StorageBackend, S3Backend, S3_PART_SIZE  # noqa: E402
+
+BUCKET = "test-files"
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    with moto.mock_aws():
+        boto3.client("s3", region_name="us-east-1").create_bucket(Bucket=BUCKET)
+        yield S3Backend(BUCKET, region="us-east-1", prefix="uploads")
+
+
+def test_backend_is_abstract():
+    with pytest.raises(TypeError):
+        StorageBackend()
+
+
+def test_put_and_ranged_get(s3):
+    data = os.urandom(100_000)
+    assert s3.putStream("ab/cd/small.bin", [data[:1000], data[1000:]]) == len(data)
+
+    assert s3.read("ab/cd/small.bin") == data
+    assert b"".join(s3.getRange("ab/cd/small.bin", 10, 19)) == data[10:20]
+    assert b"".join(s3.getRange("ab/cd/small.bin", 99_990)) == data[99_990:]
+    assert s3.read("ab/cd/small.bin", 500, 0) == b""
+    assert s3.stat("ab/cd/small.bin").size == len(data)
+    assert s3.stat("ab/cd/missing.bin") is None
+
+
+def test_multipart_put(s3):
+    data = os.urandom(2 * S3_PART_SIZE + 1234)
+    chunks = (data[i:i + 1024 * 1024] for i in range(0, len(data), 1024 * 1024))
+    assert s3.putStream("ab/cd/big.bin", chunks) == len(data)
+
+    assert s3.stat("ab/cd/big.bin").size == len(data)
+    assert b"".join(s3.getRange("ab/cd/big.bin", S3_PART_SIZE - 10, S3_PART_SIZE + 9)) == \
+        data[S3_PART_SIZE - 10:S3_PART_SIZE + 10]
+    assert s3.read("ab/cd/big.bin") == data
+
+
+def test_failed_multipart_put_is_aborted(s3):
+    def chunks():
+        yield os.urandom(S3_PART_SIZE + 1)
+        raise OSError("client went away")
+
+    with pytest.raises(OSError):
+        s3.putStream("ab/cd/broken.bin", chunks())
+
+    assert s3.stat("ab/cd/broken.bin") is None
+    assert not s3.client.list_multipart_uploads(Bucket=BUCKET).get("Uploads")
+
+
+def test_put_file(s3, tmp_path):
+    local = tmp_path / "staged.part"
+    local.write_bytes(b"staged bytes")
+    s3.putFile("ef/01/staged.bin", str(local))
+
+    assert not local.exists()
+    assert s3.read("ef/01/staged.bin") == b"staged bytes"
+
+
+def test_list_and_delete(s3):
+    # outside the backend's prefix, must never be listed or deleted
+    s3.client.put_object(Bucket=BUCKET, Key="other/x", Body=b"x")
+    for key in ("ab/01/a", "ab/02/b", "cd/01/c"):
+        s3.putStream(key, [key.encode()])
+
+    assert sorted(o.key for o in s3.list()) == ["ab/01/a", "ab/02/b", "cd/01/c"]
+    assert [o.key for o in s3.list("ab/")] == ["ab/01/a", "ab/02/b"]
+    assert [o.key for o in s3.listSorted(start_after="ab/01/a")] == ["ab/02/b", "cd/01/c"]
+    assert all(o.size == 7 for o in s3.list())
+
+    assert s3.delete("ab/01/a") is True
+    assert s3.delete("ab/01/a") is False
+    assert s3.deleteMany(["ab/02/b", "cd/01/c"]) == [True, True]
+    assert list(s3.list()) == []
+    assert [o["Key"] for o in s3.client.list_objects_v2(Bucket=BUCKET)["Contents"]] == ["other/x"]
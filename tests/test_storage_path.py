@@ -0,0 +1,74 @@
+import os
+from uuid import uuid4
+
+import pytest
+
+from app.models.file import FileModel, BlobModel
+from app.FileManager import storagePath
+
+
+def flat_file(db, user, root: str, name: str) -> str:
+    path = os.path.join(root, name)
+    with open(path, "wb") as f:
+        f.write(name.encode())
+    blob = BlobModel(id=str(uuid4()), user_id=user.id, content_hash=uuid4().hex, file_path=path, nonce="00", ref_count=1)
+    db.add(blob)
+    db.add(FileModel(id=str(uuid4()), user_id=user.id, filename=name, file_path=path, nonce="00", blob_id=blob.id))
+    db.commit()
+    return path
+
+
+def stored_paths(db) -> set[str]:
+    db.expire_all()
+    return {row.file_path for row in db.query(FileModel)} | {row.file_path for row in db.query(BlobModel)}
+
+
+def test_migration_moves_files_and_rows(db, user, storage_root):
+    names = [f"file_{i}.bin" for i in range(5)]
+    for name in names:
+        flat_file(db, user, storage_root, name)
+    partial = os.path.join(storage_root, "upload.bin.part")
+    open(partial, "wb").close()
+
+    stats = storagePath.migrateFlatFiles(db, storage_root, storage_root, batch_size=2)
+
+    assert (stats["moved"], stats["batches"], stats["repaired"]) == (5, 3, 0)
+    sharded = {storagePath.pathFor(name, storage_root, create=False) for name in names}
+    assert stored_paths(db) == sharded
+    assert all(os.path.exists(path) for path in sharded)
+    assert os.path.exists(partial)
+
+
+def test_rerun_repairs_rows_of_a_failed_batch(db, user, storage_root, monkeypatch):
+    names = [f"file_{i}.bin" for i in range(4)]
+    for name in names:
+        flat_file(db, user, storage_root, name)
+
+    real_move = storagePath._movePaths
+    calls = []
+
+    def failing_second_batch(session, moves):
+        calls.append(moves)
+        if len(calls) == 2:
+            raise RuntimeError("database went away")
+        real_move(session, moves)
+
+    monkeypatch.setattr(storagePath, "_movePaths", failing_second_batch)
+    with pytest.raises(RuntimeError):
+        storagePath.migrateFlatFiles(db, storage_root, storage_root, batch_size=2)
+    monkeypatch.setattr(storagePath, "_movePaths", real_move)
+    db.rollback()
+
+    # the failed batch's files were moved, their rows still point at the flat paths
+    stranded = {old for old, _ in calls[1]}
+    assert stranded <= stored_paths(db)
+    assert not any(os.path.exists(path) for path in stranded)
+
+    dry = storagePath.migrateFlatFiles(db, storage_root, storage_root, batch_size=2, dry_run=True)
+    assert dry["repaired"] == len(stranded)
+    assert stranded <= stored_paths(db)
+
+    stats = storagePath.migrateFlatFiles(db, storage_root, storage_root, batch_size=2)
+
+    assert stats["repaired"] == len(stranded)
+    assert stored_paths(db) == {storagePath.pathFor(name, storage_root, create=False) for name in names}
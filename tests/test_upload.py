@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+from app.Encryption_Services.encryptionService import SEGMENT_SIZE
+from app.dependencies.constants import MAX_UPLOAD_SIZE_MB
+from app.models.file import FileModel
+
+
+def test_oversized_upload_is_rejected_with_413(client, db):
+    body = b"x" * (MAX_UPLOAD_SIZE_MB * 1024 * 1024 + 1)
+
+    response = client.post("/files/upload", files={"file": ("big.txt", body)})
+
+    assert response.status_code == 413
+    assert str(MAX_UPLOAD_SIZE_MB) in response.json()["detail"]
+    assert db.query(FileModel).count() == 0
+
+
+def test_upload_at_the_limit_is_stored(client, db):
+    body = b"x" * (MAX_UPLOAD_SIZE_MB * 1024 * 1024)
+
+    response = client.post("/files/upload", files={"file": ("limit.txt", body)})
+
+    assert response.status_code == 200
+    assert client.get(f"/files/download/{response.json()['id']}").content == body
+
+
+@pytest.mark.parametrize("filename, body", [
+    ("random.bin", os.urandom(3 * SEGMENT_SIZE + 17)),
+    # compressed before encryption, ranges go through the decompressing reader
+    ("text.txt", b"".join(b"line %d of a compressible upload\n" % i for i in range(20_000))),
+])
+def test_ranged_download(client, filename, body):
+    file_id = client.post("/files/upload", files={"file": (filename, body)}).json()["id"]
+    size = len(body)
+
+    for header, start, end in [
+        ("bytes=0-0", 0, 0),
+        (f"bytes={SEGMENT_SIZE - 10}-{SEGMENT_SIZE + 9}", SEGMENT_SIZE - 10, SEGMENT_SIZE + 9),
+        (f"bytes={size - 100}-", size - 100, size - 1),
+        ("bytes=-50", size - 50, size - 1),
+        (f"bytes=10-{size + 1000}", 10, size - 1),
+    ]:
+        response = client.get(f"/files/download/{file_id}", headers={"Range": header})
+        assert response.status_code == 206
+        assert response.headers["Content-Range"] == f"bytes {start}-{end}/{size}"
+        assert response.content == body[start:end + 1]
+
+    response = client.get(f"/files/download/{file_id}", headers={"Range": f"bytes={size}-"})
+    assert response.status_code == 416
+    assert response.headers["Content-Range"] == f"bytes */{size}"